@@ -0,0 +1,27 @@
+# --- Built-in Admin Account ---
+# A hardcoded admin user outside Supabase Auth. Its bcrypt hash comes from ADMIN_PASSWORD_HASH;
+# when that is unset, the default password's hash is computed once per process, on the first
+# admin login attempt, instead of on every Streamlit rerun (bcrypt is deliberately slow).
+import functools
+import os
+
+import bcrypt
+
+ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@sso.com")
+# Default password for initial setup convenience only. In production, always set ADMIN_PASSWORD_HASH
+# to a strong, generated hash.
+DEFAULT_ADMIN_PASSWORD = "adminpass"
+
+
+@functools.lru_cache(maxsize=1)
+def get_admin_password_hash():
+    """Returns the admin's bcrypt hash as bytes."""
+    configured_hash = os.environ.get("ADMIN_PASSWORD_HASH")
+    if configured_hash:
+        return configured_hash.encode('utf-8')
+    return bcrypt.hashpw(DEFAULT_ADMIN_PASSWORD.encode('utf-8'), bcrypt.gensalt())
+
+
+def is_admin_login(email, password):
+    """True if email and password are the built-in admin's credentials."""
+    return email == ADMIN_EMAIL and bcrypt.checkpw(password.encode('utf-8'), get_admin_password_hash())
@@ -0,0 +1,306 @@
+# --- Background Analysis Jobs ---
+# Runs the review pipeline (extraction -> AI analysis -> DOCX -> save) on a process-wide
+# thread pool instead of inside the Streamlit button handler. Job state and progress are
+# persisted in a small SQLite database, so a rerun or a closed browser tab no longer loses
+# the work: the page just polls the job by its ID.
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import config
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+ACTIVE_JOB_STATUSES = (JOB_STATUS_QUEUED, JOB_STATUS_RUNNING)
+
+_JSON_COLUMNS = ('messages', 'partial_candidates', 'result')
+# Per-job lists that grow while the job runs; each entry is appended as its own row
+EVENT_MESSAGE = "message"
+EVENT_PARTIAL_CANDIDATE = "partial_candidate"
+_EVENT_LISTS = {EVENT_MESSAGE: 'messages', EVENT_PARTIAL_CANDIDATE: 'partial_candidates'}
+
+
+class JobStore:
+    """SQLite-backed persistence for analysis jobs. Safe to use from several threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._job_locks = {}
+        self._job_locks_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_uid TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    stage TEXT,
+                    jd_filename TEXT,
+                    cv_count INTEGER,
+                    messages TEXT NOT NULL DEFAULT '[]',
+                    partial_candidates TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS analysis_jobs_user_created_idx ON analysis_jobs (user_uid, created_at DESC)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_job_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS analysis_job_events_job_idx ON analysis_job_events (job_id, id)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return contextlib.closing(conn)
+
+    def create(self, user_uid, jd_filename, cv_count):
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO analysis_jobs (id, user_uid, status, stage, jd_filename, cv_count, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_uid, JOB_STATUS_QUEUED, "Waiting for a free worker", jd_filename, cv_count, now, now)
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        for column in _JSON_COLUMNS:
+            if column in fields:
+                fields[column] = json.dumps(fields[column], ensure_ascii=False)
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(f"UPDATE analysis_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def append_event(self, job_id, kind, payload):
+        """Appends one entry (EVENT_MESSAGE or EVENT_PARTIAL_CANDIDATE) to a job's list, without rewriting the others."""
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO analysis_job_events (job_id, kind, payload) VALUES (?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False))
+            )
+            conn.execute("UPDATE analysis_jobs SET updated_at = ? WHERE id = ?", (datetime.now().isoformat(), job_id))
+
+    @contextlib.contextmanager
+    def job_lock(self, job_id):
+        """Holds a per-job lock for read-modify-write updates of one job (e.g. saving its report once)."""
+        with self._job_locks_lock:
+            lock, holders = self._job_locks.get(job_id, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._job_locks[job_id] = (lock, holders + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._job_locks_lock:
+                lock, holders = self._job_locks[job_id]
+                if holders == 1:
+                    del self._job_locks[job_id]
+                else:
+                    self._job_locks[job_id] = (lock, holders - 1)
+
+    def _row_to_job(self, row):
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            if job.get(column) is not None:
+                job[column] = json.loads(job[column])
+        # Databases created before reports were rendered on demand still have a DOCX column
+        job.pop('docx', None)
+        return job
+
+    def get(self, job_id):
+        """Returns the job as a dict (JSON columns decoded, appended events added to their lists), or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            events = conn.execute("SELECT kind, payload FROM analysis_job_events WHERE job_id = ? ORDER BY id", (job_id,)).fetchall()
+        job = self._row_to_job(row)
+        for event in events:
+            job[_EVENT_LISTS[event['kind']]].append(json.loads(event['payload']))
+        return job
+
+    def list_for_user(self, user_uid, limit=10):
+        """Returns the most recent jobs of a user (without results)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, status, progress, stage, jd_filename, cv_count, error, created_at, updated_at FROM analysis_jobs WHERE user_uid = ? ORDER BY created_at DESC LIMIT ?",
+                (user_uid, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def fail_interrupted_jobs(self):
+        """Marks jobs left queued/running by a previous server process as failed."""
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (JOB_STATUS_FAILED, "Interrupted by a server restart. Please start the review again.", datetime.now().isoformat(), *ACTIVE_JOB_STATUSES)
+            )
+
+    def delete_user(self, user_uid):
+        """Deletes every job of the user, results included. Returns the number deleted."""
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute("DELETE FROM analysis_job_events WHERE job_id IN (SELECT id FROM analysis_jobs WHERE user_uid = ?)", (user_uid,))
+            return conn.execute("DELETE FROM analysis_jobs WHERE user_uid = ?", (user_uid,)).rowcount
+
+    def purge_older_than(self, max_age_seconds):
+        cutoff = datetime.fromtimestamp(time.time() - max_age_seconds).isoformat()
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(
+                "DELETE FROM analysis_job_events WHERE job_id IN (SELECT id FROM analysis_jobs WHERE created_at < ? AND status NOT IN (?, ?))",
+                (cutoff, *ACTIVE_JOB_STATUSES)
+            )
+            conn.execute("DELETE FROM analysis_jobs WHERE created_at < ? AND status NOT IN (?, ?)", (cutoff, *ACTIVE_JOB_STATUSES))
+
+
+class JobReporter:
+    """
+    Stand-in for the `st` module while a pipeline runs in the background: user-facing
+    messages (error/warning/info/success/code) and spinner stages are recorded on the job
+    instead of being drawn on a page, and the polling page replays them.
+    """
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def _add_message(self, level, text):
+        self.store.append_event(self.job_id, EVENT_MESSAGE, {"level": level, "text": str(text)})
+
+    def error(self, text):
+        self._add_message("error", text)
+
+    def warning(self, text):
+        self._add_message("warning", text)
+
+    def info(self, text):
+        self._add_message("info", text)
+
+    def success(self, text):
+        self._add_message("success", text)
+
+    def code(self, text):
+        self._add_message("code", text)
+
+    @contextlib.contextmanager
+    def spinner(self, text):
+        self.store.update(self.job_id, stage=text)
+        yield
+
+    def set_progress(self, progress, stage):
+        self.store.update(self.job_id, progress=progress, stage=stage)
+
+    def add_partial_candidate(self, candidate):
+        """Records a candidate evaluation as soon as it is available (used as the streaming callback)."""
+        self.store.append_event(self.job_id, EVENT_PARTIAL_CANDIDATE, candidate)
+
+
+class LoggingReporter:
+    """
+    Stand-in for the `st` module where nothing can be drawn, such as a download button's data
+    callable, which Streamlit runs off the script thread: messages go to the log.
+    """
+
+    _LOG_LEVELS = {"error": logging.ERROR, "warning": logging.WARNING, "info": logging.INFO, "success": logging.INFO, "code": logging.DEBUG}
+
+    def __init__(self, context):
+        self.context = context
+
+    def _log(self, level, text):
+        logger.log(self._LOG_LEVELS[level], "%s: %s", self.context, text)
+
+    def error(self, text):
+        self._log("error", text)
+
+    def warning(self, text):
+        self._log("warning", text)
+
+    def info(self, text):
+        self._log("info", text)
+
+    def success(self, text):
+        self._log("success", text)
+
+    def code(self, text):
+        self._log("code", text)
+
+    @contextlib.contextmanager
+    def spinner(self, text):
+        yield
+
+
+class AnalysisJobRunner:
+    """Process-wide pool of background threads running analysis pipelines."""
+
+    def __init__(self, store, max_workers):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+
+    def submit(self, user_uid, jd_filename, cv_count, pipeline_fn, *args, **kwargs):
+        """
+        Queues pipeline_fn(reporter, *args, **kwargs) and returns the new job ID.
+        pipeline_fn must return a JSON-serializable result dict.
+        """
+        job_id = self.store.create(user_uid, jd_filename, cv_count)
+        self._executor.submit(self._run_job, job_id, pipeline_fn, args, kwargs)
+        logger.info("Queued job %s for user %s.", job_id, user_uid)
+        return job_id
+
+    def _run_job(self, job_id, pipeline_fn, args, kwargs):
+        reporter = JobReporter(self.store, job_id)
+        self.store.update(job_id, status=JOB_STATUS_RUNNING, stage="Starting")
+        started = time.perf_counter()
+        try:
+            result = pipeline_fn(reporter, *args, **kwargs)
+            if result is None or "error" in result:
+                error_message = (result or {}).get("error", "The analysis pipeline did not return a result.")
+                self.store.update(job_id, status=JOB_STATUS_FAILED, error=error_message, stage="Failed")
+                logger.error("Job %s failed: %s", job_id, error_message)
+                return
+            self.store.update(job_id, status=JOB_STATUS_DONE, progress=1.0, stage="Completed", result=result)
+            logger.info("Job %s completed in %.1fs.", job_id, time.perf_counter() - started)
+        except Exception as e:
+            self.store.update(job_id, status=JOB_STATUS_FAILED, error=str(e), stage="Failed")
+            logger.error("Job %s crashed: %s", job_id, e)
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Returns the process-wide AnalysisJobRunner, creating it (and its job store) on first use."""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                store = JobStore(config.JOB_STORE_PATH)
+                store.fail_interrupted_jobs()
+                store.purge_older_than(config.JOB_RETENTION_SECONDS)
+                _job_runner = AnalysisJobRunner(store, config.ANALYSIS_JOB_WORKERS)
+    return _job_runner
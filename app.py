@@ -2,25 +2,47 @@ import streamlit as st
 import os
 import io
 import json
+import logging
 import re
-import bcrypt
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 import time
 
 # --- Supabase Imports ---
-from supabase import create_client, Client
-from supabase.lib.client_options import ClientOptions
 # from postgrest.exceptions import APIResponseException # Removed as per discussion to avoid ImportError
 
 # --- AI & Document Processing Imports ---
-from openai import OpenAI
-import pandas as pd
-from PyPDF2 import PdfReader
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.section import WD_SECTION_START
-from docx.enum.table import WD_ALIGN_VERTICAL
+# pandas, python-docx/PyPDF2 (document_processing) and openai take over a second to import, so
+# they are imported inside the functions that use them: the login page never loads them, and
+# later reruns find them already in sys.modules.
+
+# --- Local Module Imports ---
+import config
+from extraction_cache import get_extraction_cache
+from worker_pool import get_worker_pool
+from token_budget import apply_prompt_budget, count_tokens
+from result_cache import get_analysis_result_cache, get_docx_report_cache, make_fingerprint
+from json_stream import StreamingArrayItemParser
+from prerank import prerank_candidates
+from vector_index import get_candidate_index
+from dedup import collapse_duplicate_cvs, get_fingerprint_store
+from skills_matcher import SKILLS_TAXONOMY_VERSION, build_criteria_matrix
+from analysis_jobs import get_job_runner, LoggingReporter, ACTIVE_JOB_STATUSES, JOB_STATUS_DONE, JOB_STATUS_FAILED
+from openai_limiter import get_openai_rate_limiter
+from clients import get_client_health, create_session_supabase_client, get_supabase_service_client, get_openai_client, get_async_openai_client, run_coroutine
+from admin_credentials import is_admin_login
+from profiler import get_profiler, caller_name, CAPTURE_ANY_PAGE, SPAN_PAGE, SPAN_OPENAI
+from user_deletion import DELETION_STEPS, STEP_LABELS, UserDeletionInProgress, delete_user_cascade, get_user_deletion_store
+from logging_config import configure_logging
+from metrics import (
+    start_metrics_server, track_stage, track_admin_query, record_token_usage, AI_JSON_DECODE_FAILURES, REVIEW_DURATION_SECONDS, REVIEWS_TOTAL,
+    STAGE_EXTRACTION, STAGE_DEDUP, STAGE_CANDIDATE_INDEX, STAGE_PRERANK, STAGE_AI_ANALYSIS, STAGE_DOCX_RENDER, STAGE_STORAGE_UPLOAD, STAGE_SAVE_REPORT
+)
+
+configure_logging()
+start_metrics_server()
+# Streamlit runs this file as __main__, so its logger is named explicitly
+logger = logging.getLogger("app")
 
 # --- Streamlit Page Configuration (MUST BE THE FIRST ST COMMAND) ---
 # Set layout to wide to allow custom centering without Streamlit's default narrow column
@@ -338,61 +360,50 @@ SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") # ADDED
 # --- Supabase Initialization Function ---
 def initialize_supabase_app():
     """
-    Initializes the Supabase client and stores it in session state.
+    Initializes the session's Supabase client and stores it in session state, together with the
+    process-wide service role client. Both use the shared connection pool in clients.py, so a new
+    session opens no new connections.
     This function is called only once per app run or when 'supabase_client' is not in session state.
     """
-    print("DEBUG: Attempting to initialize Supabase client...")
+    logger.debug("Attempting to initialize Supabase client...")
     try:
         if not SUPABASE_URL or not SUPABASE_KEY or not SUPABASE_SERVICE_ROLE_KEY: # MODIFIED: Check for service key too
-            print("ERROR: Supabase URL, Key, or Service Role Key not found in environment variables.")
+            logger.error("Supabase URL, Key, or Service Role Key not found in environment variables.")
             st.error("Supabase URL, Key, or Service Role Key not found in environment variables. Please configure them.")
             st.stop()
 
-        supabase_client_instance = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(postgrest_client_timeout=10))
+        supabase_client_instance = create_session_supabase_client()
         st.session_state['supabase_client'] = supabase_client_instance
-        print("DEBUG: Supabase client initialized successfully and stored in session state.")
-        print(f"DEBUG: Session state 'supabase_client' is now: {type(st.session_state['supabase_client'])}")
+        logger.debug("Supabase client initialized successfully and stored in session state.")
+        logger.debug("Session state 'supabase_client' is now: %s", type(st.session_state['supabase_client']))
 
-        # ADDED: Initialize service role client
-        supabase_service_role_client_instance = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=ClientOptions(postgrest_client_timeout=10))
-        st.session_state['supabase_service_role_client'] = supabase_service_role_client_instance
-        print("DEBUG: Supabase service role client initialized successfully and stored in session state.")
-        print(f"DEBUG: Session state 'supabase_service_role_client' is now: {type(st.session_state['supabase_service_role_client'])}")
+        # ADDED: Service role client (shared by all sessions)
+        st.session_state['supabase_service_role_client'] = get_supabase_service_client()
+        logger.debug("Supabase service role client stored in session state.")
+        logger.debug("Session state 'supabase_service_role_client' is now: %s", type(st.session_state['supabase_service_role_client']))
 
     except Exception as e:
-        print(f"ERROR: Error during Supabase initialization: {e}")
+        logger.error("Error during Supabase initialization: %s", e)
         st.error(f"Error initializing Supabase: {e}. Please ensure your environment variables are correctly configured.")
         st.stop()
 
 # --- Ensure Supabase is initialized and client is available in session state ---
 if 'supabase_client' not in st.session_state or st.session_state['supabase_client'] is None:
-    print("DEBUG: 'supabase_client' not found in session state or is None. Calling initialize_supabase_app().")
+    logger.debug("'supabase_client' not found in session state or is None. Calling initialize_supabase_app().")
     initialize_supabase_app()
 else:
-    print("DEBUG: 'supabase_client' already exists in session state. Supabase previously initialized.")
+    logger.debug("'supabase_client' already exists in session state. Supabase previously initialized.")
 
 supabase = st.session_state['supabase_client']
 # Note: st.session_state['supabase_service_role_client'] is available directly via session state where needed.
 
-# --- Initialize OpenAI client ---
-try:
-    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    if not OPENAI_API_KEY:
-        st.error("OpenAI API key not found in environment variables. Please configure it.")
-        st.stop()
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    print("DEBUG: OpenAI client initialized successfully.")
-except Exception as e:
-    st.error(f"OpenAI client not initialized: {e}. Please check your OPENAI_API_KEY in environment variables.")
-    print(f"ERROR: OpenAI client initialization failed: {e}")
+# --- Check OpenAI configuration ---
+# The client itself is created on the first AI request and shared by the whole process (clients.py).
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
+    st.error("OpenAI API key not found in environment variables. Please configure it.")
     st.stop()
 
-# Admin Credentials (for a hardcoded admin user, outside Supabase Auth)
-ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@sso.com")
-# Default hash for "adminpass" if not set, for initial setup convenience.
-# In production, this should always be set via environment variable with a strong, generated hash.
-ADMIN_PASSWORD_HASH = os.environ.get("ADMIN_PASSWORD_HASH", bcrypt.hashpw("adminpass".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')) # MODIFIED: Default hash for "adminpass" if not set for initial setup
-
 
 # --- Streamlit Session State Initialization ---
 if 'logged_in' not in st.session_state:
@@ -407,8 +418,26 @@ if 'is_admin' not in st.session_state:
     st.session_state['is_admin'] = False
 if 'ai_review_result' not in st.session_state:
     st.session_state['ai_review_result'] = None
-if 'generated_docx_buffer' not in st.session_state:
-    st.session_state['generated_docx_buffer'] = None
+if 'token_budget_report' not in st.session_state:
+    st.session_state['token_budget_report'] = None
+if 'prerank_scores' not in st.session_state:
+    st.session_state['prerank_scores'] = None
+if 'duplicate_report' not in st.session_state:
+    st.session_state['duplicate_report'] = None
+if 'analysis_job_id' not in st.session_state:
+    st.session_state['analysis_job_id'] = None
+if 'poll_analysis_job' not in st.session_state:
+    st.session_state['poll_analysis_job'] = False
+if 'viewed_report' not in st.session_state:
+    st.session_state['viewed_report'] = None
+if 'review_reports_pager' not in st.session_state:
+    st.session_state['review_reports_pager'] = None
+if 'admin_reports_pager' not in st.session_state:
+    st.session_state['admin_reports_pager'] = None
+if 'loaded_analysis_job_id' not in st.session_state:
+    st.session_state['loaded_analysis_job_id'] = None
+if 'report_download_filename' not in st.session_state:
+    st.session_state['report_download_filename'] = None
 if 'review_triggered' not in st.session_state:
     st.session_state['review_triggered'] = False
 if 'current_page' not in st.session_state:
@@ -425,59 +454,231 @@ if 'new_user_uid_for_pw_reset' not in st.session_state:
     st.session_state['new_user_uid_for_pw_reset'] = ''
 
 # --- Helper Functions for Text Extraction ---
-def extract_text_from_pdf(uploaded_file_bytes_io):
-    """Extracts text from a PDF file using PyPDF2."""
-    try:
-        reader = PdfReader(uploaded_file_bytes_io)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-    except Exception as e:
-        st.error(f"Error extracting text from PDF: {e}")
-        print(f"ERROR (extract_text_from_pdf): {e}")
-        return None
+# Parsing itself lives in document_processing.py and runs on the shared worker pool;
+# these wrappers add the extraction cache and user-facing error reporting.
+def _get_file_extension(filename):
+    return os.path.splitext(filename)[1].lower()
+
+def _read_uploaded_bytes(uploaded_file_bytes_io):
+    return uploaded_file_bytes_io.getvalue() if hasattr(uploaded_file_bytes_io, 'getvalue') else uploaded_file_bytes_io.read()
+
+def extract_files_text(named_files, ui=st):
+    """
+    Extracts text from several files given as (filename, file_bytes) pairs.
+    Cached files are answered from the extraction cache; the rest are parsed in parallel on the shared worker pool.
+    Returns a list of texts in the same order as named_files (None for files that could not be processed).
+    """
+    import document_processing
+    extraction_cache = get_extraction_cache()
+    texts = [None] * len(named_files)
+    pending = []  # (index, filename, cache_key, file_bytes, file_extension)
+
+    for idx, (filename, file_bytes) in enumerate(named_files):
+        file_extension = _get_file_extension(filename)
+        if file_extension not in document_processing.SUPPORTED_EXTENSIONS:
+            ui.error(f"Unsupported file type: {file_extension}. Only PDF, DOCX, TXT are supported.")
+            logger.error("Unsupported file type %s for %s", file_extension, filename)
+            continue
+
+        cache_key = extraction_cache.make_key(file_bytes, file_extension, document_processing.EXTRACTOR_VERSION)
+        cached_text = extraction_cache.get(cache_key)
+        if cached_text is not None:
+            logger.debug("Extraction cache hit for %s.", filename)
+            texts[idx] = cached_text
+        else:
+            pending.append((idx, filename, cache_key, file_bytes, file_extension))
+
+    if not pending:
+        return texts
 
-def extract_text_from_docx(uploaded_file_bytes_io):
-    """Extracts text from a DOCX file using python-docx."""
     try:
-        document = Document(uploaded_file_bytes_io)
-        text = ""
-        for paragraph in document.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        results = get_worker_pool().map(
+            "extract",
+            document_processing.extract_text,
+            [(file_bytes, file_extension) for _, _, _, file_bytes, file_extension in pending],
+            timeout=config.WORKER_POOL_JOB_TIMEOUT_SECONDS
+        )
     except Exception as e:
-        st.error(f"Error extracting text from DOCX: {e}")
-        print(f"ERROR (extract_text_from_docx): {e}")
-        return None
+        ui.error(f"Error queuing files for text extraction: {e}")
+        logger.error("Could not submit extraction jobs: %s", e)
+        return texts
+
+    for (idx, filename, cache_key, _, _), result in zip(pending, results):
+        if isinstance(result, Exception):
+            ui.error(f"Error extracting text from {filename}: {result}")
+            logger.error("Extraction failed for %s: %s", filename, result)
+            continue
+        texts[idx] = result
+        extraction_cache.put(cache_key, result)
+    return texts
 
 def get_file_content(uploaded_file_bytes_io, filename):
-    """Determines file type based on extension and extracts text content."""
-    file_extension = os.path.splitext(filename)[1].lower()
-
-    if file_extension == '.pdf':
-        return extract_text_from_pdf(uploaded_file_bytes_io)
-    elif file_extension == '.docx':
-        return extract_text_from_docx(uploaded_file_bytes_io)
-    elif file_extension == '.txt':
-        return uploaded_file_bytes_io.read().decode('utf-8')
-    else:
-        st.error(f"Unsupported file type: {file_extension}. Only PDF, DOCX, TXT are supported.")
-        print(f"ERROR (get_file_content): Unsupported file type {file_extension} for {filename}")
-        return None
+    """
+    Determines file type based on extension and extracts text content.
+    Results are cached on disk by a hash of the file bytes, so identical uploads are only parsed once.
+    """
+    return extract_files_text([(filename, _read_uploaded_bytes(uploaded_file_bytes_io))])[0]
+
+# --- OpenAI Request Helpers ---
+# Every OpenAI request goes through the process-wide rate limiter, which enforces the
+# request/token-per-minute limits and concurrency cap and retries 429s and transient errors.
+def _estimate_request_tokens(messages):
+    return sum(count_tokens(message["content"]) for message in messages) + config.OPENAI_EXPECTED_COMPLETION_TOKENS
+
+def _new_ai_usage():
+    """Returns an empty per-analysis usage record (see get_comparative_ai_analysis)."""
+    return {"model": config.OPENAI_MODEL, "requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "seconds": 0.0}
+
+def _record_usage(usage, ai_usage=None):
+    """Counts a response's token usage in the metrics and, if given, adds it to an analysis's ai_usage record."""
+    record_token_usage(usage, config.OPENAI_MODEL)
+    if usage is None or ai_usage is None:
+        return
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    ai_usage['requests'] += 1
+    ai_usage['prompt_tokens'] += usage.prompt_tokens or 0
+    ai_usage['completion_tokens'] += usage.completion_tokens or 0
+    ai_usage['cached_tokens'] += getattr(prompt_details, "cached_tokens", None) or 0
+
+def create_chat_completion(messages, ai_usage=None, **kwargs):
+    """
+    Sends a chat completion request for the configured model through the rate limiter.
+    The profiler span includes rate-limit waits and retries (for streamed calls, until the stream opens).
+    Token usage is counted here (and added to ai_usage if given); streamed responses report it in
+    their last chunk, which the caller counts.
+    """
+    if kwargs.get("stream"):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+    with get_profiler().span(SPAN_OPENAI, caller_name()):
+        response = get_openai_rate_limiter().call(
+            lambda: get_openai_client().chat.completions.create(
+                model=config.OPENAI_MODEL,
+                messages=messages,
+                temperature=config.OPENAI_TEMPERATURE,
+                **kwargs
+            ),
+            _estimate_request_tokens(messages)
+        )
+    if not kwargs.get("stream"):
+        _record_usage(getattr(response, "usage", None), ai_usage)
+    return response
+
+async def create_chat_completion_async(async_client, messages, ai_usage=None, **kwargs):
+    """Async counterpart of create_chat_completion for an AsyncOpenAI client."""
+    with get_profiler().span(SPAN_OPENAI, caller_name()):
+        response = await get_openai_rate_limiter().call_async(
+            lambda: async_client.chat.completions.create(
+                model=config.OPENAI_MODEL,
+                messages=messages,
+                temperature=config.OPENAI_TEMPERATURE,
+                **kwargs
+            ),
+            _estimate_request_tokens(messages)
+        )
+    _record_usage(getattr(response, "usage", None), ai_usage)
+    return response
 
 # --- AI Function: Comparative Analysis ---
-def get_comparative_ai_analysis(jd_text, all_cv_data):
+# Bump PROMPT_VERSION whenever a prompt below changes, so cached results from the old prompts are not reused.
+PROMPT_VERSION = "2"
+
+def get_comparative_ai_analysis(jd_text, all_cv_data, analysis_mode="single", force_refresh=False, on_candidate=None, ui=st, analysis_info=None, criteria_mode="ai"):
     """
     Uses OpenAI to perform a comparative analysis of multiple CVs against a JD.
     Returns a complex JSON object containing a table of candidate evaluations,
     a table of criteria observations, additional observations text, and a final
     shortlist recommendation.
+    With analysis_mode="map_reduce" each CV is scored in its own concurrent call
+    (see get_map_reduce_ai_analysis); the returned JSON shape is the same.
+    criteria_mode controls the criteria table: "ai" lets the model build it, "context" gives the
+    model the local skills matcher's evidence to build it from, and "local" uses the skills
+    matcher's table directly so the model does not generate it at all.
+    Successful results are memoized by an input fingerprint; force_refresh bypasses the cache.
+    If on_candidate is given, it is called with each candidate evaluation as soon as it is
+    available, so the page can render rows before the whole analysis has finished.
+    User-facing messages go through ui (the st module, or a background job reporter). If an
+    analysis_info dict is passed it is filled with run details: 'token_budget_report', 'from_cache',
+    'ai_usage' (model, request count, prompt/completion/cached tokens and wall time in seconds,
+    saved with the report), 'failed_cvs' (filenames of CVs the map-reduce mode could not score;
+    such partial results are never cached) and, on a malformed AI reply, 'raw_response'.
     """
+    if analysis_info is None:
+        analysis_info = {}
+    analysis_info['from_cache'] = False
+    analysis_info['failed_cvs'] = []
+    ai_usage = analysis_info['ai_usage'] = _new_ai_usage()
+    started = time.perf_counter()
     if not jd_text or not all_cv_data:
-        print("DEBUG (get_comparative_ai_analysis): Missing JD or CV data.")
+        logger.debug("Missing JD or CV data.")
         return {"error": "Missing Job Description or Candidate CV content for comparative analysis."}
 
+    result_cache = get_analysis_result_cache()
+    cache_key = make_fingerprint(
+        prompt_version=PROMPT_VERSION,
+        model=config.OPENAI_MODEL,
+        temperature=config.OPENAI_TEMPERATURE,
+        analysis_mode=analysis_mode,
+        criteria_mode=criteria_mode,
+        skills_taxonomy_version=SKILLS_TAXONOMY_VERSION,
+        criteria_max_rows=config.CRITERIA_MAX_ROWS,
+        prompt_token_budget=config.PROMPT_TOKEN_BUDGET,
+        prompt_jd_share=config.PROMPT_JD_SHARE,
+        jd_text=jd_text,
+        cvs=[[cv_item['filename'], cv_item['text']] for cv_item in all_cv_data]
+    )
+    if not force_refresh:
+        cached_result = result_cache.get(cache_key)
+        if cached_result is not None:
+            logger.debug("Result cache hit (%s).", cache_key[:12])
+            analysis_info['token_budget_report'] = cached_result['token_budget_report']
+            analysis_info['from_cache'] = True
+            ai_usage['seconds'] = time.perf_counter() - started
+            ui.info("Showing the saved AI result for these exact documents. Tick 'Force refresh' to run the analysis again.")
+            return cached_result['comparative_data']
+
+    # The criteria table is built from the full texts, before any trimming to the prompt budget
+    criteria_rows, criteria_evidence = [], {}
+    if criteria_mode != "ai":
+        criteria_rows, criteria_evidence = build_criteria_matrix(
+            jd_text,
+            [(_candidate_name_from_filename(cv_item['filename']), cv_item['text']) for cv_item in all_cv_data],
+            config.CRITERIA_MAX_ROWS
+        )
+        if not criteria_rows:
+            logger.debug("JD names no known skills; the AI builds the criteria table.")
+            criteria_mode = "ai"
+    criteria_note = _criteria_prompt_note(criteria_mode, criteria_rows, criteria_evidence)
+
+    if analysis_mode == "map_reduce":
+        comparative_data = get_map_reduce_ai_analysis(jd_text, all_cv_data, on_candidate=on_candidate, ui=ui, analysis_info=analysis_info, criteria_note=criteria_note)
+    else:
+        comparative_data = get_single_call_ai_analysis(jd_text, all_cv_data, on_candidate=on_candidate, ui=ui, analysis_info=analysis_info, criteria_note=criteria_note)
+    ai_usage['seconds'] = time.perf_counter() - started
+    logger.info("AI analysis (%s) took %.1fs: %s prompt (%s cached) and %s completion tokens in %s request(s).",
+                analysis_mode, ai_usage['seconds'], ai_usage['prompt_tokens'], ai_usage['cached_tokens'], ai_usage['completion_tokens'], ai_usage['requests'])
+
+    if "error" not in comparative_data and criteria_mode == "local":
+        comparative_data["criteria_observations"] = criteria_rows
+
+    # A partial result would otherwise be served for every re-run of these documents
+    if "error" not in comparative_data and not analysis_info['failed_cvs']:
+        result_cache.put(cache_key, {
+            "comparative_data": comparative_data,
+            "token_budget_report": analysis_info.get('token_budget_report'),
+        })
+    return comparative_data
+
+def get_single_call_ai_analysis(jd_text, all_cv_data, on_candidate=None, ui=st, analysis_info=None, criteria_note=""):
+    """
+    Sends the JD and all CVs to OpenAI in a single request (the default analysis mode).
+    If on_candidate is given, the response is streamed and on_candidate(candidate_dict) is called
+    for each entry of "candidate_evaluations" as soon as it has been fully received.
+    criteria_note (see _criteria_prompt_note) is appended to the user prompt.
+    ui and analysis_info are as for get_comparative_ai_analysis.
+    """
+    if analysis_info is None:
+        analysis_info = {}
+    ai_response_content = ""
     # System prompt defines the AI's role and the required JSON output format
     system_prompt = """
     You are an expert Talent Acquisition professional in India. Your task is to perform a detailed comparative analysis of multiple candidate CVs against a given Job Description (JD).
@@ -522,6 +723,16 @@ def get_comparative_ai_analysis(jd_text, all_cv_data):
     The "Candidate Name" in "candidate_evaluations" and the dynamic column headers in "criteria_observations" should be derived from the provided filenames (e.g., "Gauri CV.pdf" -> "Gauri").
     """
 
+    # Fit the JD and CVs into the prompt token budget before building the prompt
+    jd_text, all_cv_data, token_usage_rows = apply_prompt_budget(
+        jd_text,
+        all_cv_data,
+        config.PROMPT_TOKEN_BUDGET,
+        count_tokens(system_prompt) + count_tokens(criteria_note) + PROMPT_SCAFFOLD_TOKENS + PROMPT_PER_CV_SCAFFOLD_TOKENS * len(all_cv_data),
+        config.PROMPT_JD_SHARE
+    )
+    analysis_info['token_budget_report'] = token_usage_rows
+
     user_prompt = f"""
     Here is the Job Description (JD):
     ---
@@ -533,160 +744,428 @@ def get_comparative_ai_analysis(jd_text, all_cv_data):
     # Append each CV's content to the user prompt
     for idx, cv_item in enumerate(all_cv_data):
         # Extract name without extension for table headers
-        candidate_name_for_prompt = os.path.splitext(cv_item['filename'])[0].replace(" CV", "").strip()
+        candidate_name_for_prompt = _candidate_name_from_filename(cv_item['filename'])
         user_prompt += f"\n--- Candidate {idx+1} (Name: {candidate_name_for_prompt}, Filename: {cv_item['filename']}) ---\n"
         user_prompt += f"{cv_item['text']}\n"
     user_prompt += "--- End of Candidate CVs ---"
+    user_prompt += criteria_note
     user_prompt += "\n\nPlease provide the comparative analysis in the specified JSON format."
 
     try:
-        with st.spinner("AI is analyzing the JD and CVs... This may take a moment."):
-            print("DEBUG (get_comparative_ai_analysis): Sending request to OpenAI API.")
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+        with ui.spinner("AI is analyzing the JD and CVs... This may take a moment."):
+            logger.debug("Sending request to OpenAI API.")
+            response = create_chat_completion(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.2,
-                response_format={"type": "json_object"}
+                ai_usage=analysis_info.get('ai_usage'),
+                response_format={"type": "json_object"},
+                stream=on_candidate is not None
             )
-        ai_response_content = response.choices[0].message.content
-        print(f"DEBUG (get_comparative_ai_analysis): Raw AI Response: {ai_response_content[:200]}...")
+            if on_candidate is None:
+                ai_response_content = response.choices[0].message.content
+            else:
+                # Streaming: hand each candidate evaluation to the caller as soon as its JSON object is complete
+                candidate_parser = StreamingArrayItemParser("candidate_evaluations")
+                response_chunks = []
+                for chunk in response:
+                    # With stream_options include_usage, the last chunk carries the usage and no choices
+                    _record_usage(getattr(chunk, "usage", None), analysis_info.get('ai_usage'))
+                    if not chunk.choices:
+                        continue
+                    delta_content = chunk.choices[0].delta.content
+                    if not delta_content:
+                        continue
+                    response_chunks.append(delta_content)
+                    for candidate in candidate_parser.feed(delta_content):
+                        on_candidate(candidate)
+                ai_response_content = "".join(response_chunks)
+        logger.debug("Raw AI Response: %s...", ai_response_content[:200])
         comparative_data = json.loads(ai_response_content)
 
-        if "candidate_evaluations" in comparative_data:
-            for candidate in comparative_data["candidate_evaluations"]:
-                if "Ranking" in candidate and isinstance(candidate["Ranking"], str):
-                    candidate["Ranking"] = re.sub(r'[\U0001F3C5-\U0001F3CA\U0001F947-\U0001F949]', '', candidate["Ranking"]).strip()
+        _strip_ranking_medals(comparative_data)
+
+        logger.debug("AI analysis successful.")
+        return comparative_data
+
+    except json.JSONDecodeError as e:
+        AI_JSON_DECODE_FAILURES.inc(step="single")
+        ui.error(f"Error: AI response was not valid JSON. Please try again or refine input. Error: {e}")
+        ui.code(ai_response_content)
+        analysis_info['raw_response'] = ai_response_content
+        logger.error("JSON Decode Error: %s, Response: %s", e, ai_response_content)
+        return {"error": f"AI response format error: {e}"}
+    except Exception as e:
+        ui.error(f"An unexpected error occurred during AI analysis: {e}")
+        logger.error("Unexpected Error during AI analysis: %s", e)
+        return {"error": f"AI processing failed: {e}"}
+
+# --- AI Function: Map-Reduce Comparative Analysis ---
+# Scores each CV against the JD in its own concurrent request (map), then builds the
+# criteria table, ranking and recommendation from the compact per-CV results (reduce).
+# Produces the same JSON shape as the single-call analysis above.
+MAP_SYSTEM_PROMPT = """
+You are an expert Talent Acquisition professional in India. Your task is to evaluate ONE candidate CV against a given Job Description (JD).
+
+Your output MUST be a single JSON object with the following structure:
+{
+  "Match %": "...",              // Numerical percentage as a string (e.g., "85%")
+  "Shortlist Probability": "...",// E.g., "High", "Moderate", "Low"
+  "Key Strengths": "...",        // Concise points, comma-separated or short phrase. Highlight relevant experience.
+  "Key Gaps": "...",             // Concise points, comma-separated or short phrase.
+  "Location Suitability": "...", // E.g., "Pune", "Delhi (flexible)", "Remote", "Not Specified"
+  "Comments": "...",             // Any other relevant observation for this candidate, including fit for Indian context.
+  "criteria": [                  // One entry for each key requirement of the JD (education, experience, skills, location, etc.)
+    {"Criteria": "Education (MBA HR)", "Assessment": "✅/❌/⚠️"}
+  ]
+}
+
+Ensure "Match %" is a string. Use ✅ for good fit, ❌ for not a fit, ⚠️ for partial fit.
+Name each criterion after the JD requirement itself (not the candidate), so results for different candidates can be compared.
+"""
+
+REDUCE_SYSTEM_PROMPT = """
+You are an expert Talent Acquisition professional in India. You are given a Job Description (JD) and the individual evaluations of several candidates against it.
+Your task is to compare the candidates with each other and produce the final comparative summary.
+
+Your output MUST be a single JSON object with the following structure:
+{
+  "rankings": [
+    {"Candidate ID": 1, "Candidate Name": "...", "Ranking": "..."} // One entry per candidate, with the "Candidate ID" of its evaluation. Ranking is a numerical rank string ("1" is best), NO MEDALS.
+  ],
+  "criteria_observations": [ // Common criteria across all candidates, merged from the per-candidate criteria
+    {
+      "Criteria": "Education (MBA HR)",
+      "Candidate 1 Name": "✅/❌/⚠️", // Column for each candidate using the exact candidate names provided
+      "Candidate 2 Name": "✅/❌/⚠️"
+    }
+  ],
+  "additional_observations_text": "...", // Comprehensive text for general observations not covered in tables.
+  "final_shortlist_recommendation": "..." // Concise text for the final recommendation, explicitly naming shortlisted candidates.
+}
+
+Merge criteria that mean the same thing into a single row. Use ✅ for good fit, ❌ for not a fit, ⚠️ for partial fit.
+Use the exact candidate names provided as column headers and in "rankings".
+"""
+
+# Added to the map prompt whenever the criteria table does not come from the per-CV "criteria" lists
+MAP_SKIP_CRITERIA_NOTE = '\n    The criteria comparison is built separately: return "criteria" as an empty array [].'
+
+# Tokens reserved for the fixed prompt text around the documents (instructions, separators, candidate headers)
+PROMPT_SCAFFOLD_TOKENS = 100
+PROMPT_PER_CV_SCAFFOLD_TOKENS = 30
+
+def _candidate_name_from_filename(filename):
+    """Derives the display name used for a candidate from their CV filename (e.g. "Gauri CV.pdf" -> "Gauri")."""
+    return os.path.splitext(filename)[0].replace(" CV", "").strip()
+
+def _criteria_prompt_note(criteria_mode, criteria_rows, criteria_evidence):
+    """Returns the prompt text telling the model how to handle "criteria_observations" for the given criteria_mode."""
+    if criteria_mode == "local":
+        return '\n\nThe criteria comparison table is computed separately. Return "criteria_observations" as an empty array [].'
+    if criteria_mode == "context":
+        return (
+            "\n\nA keyword scan of the CVs produced this criteria table (✅ skill named in the CV, ⚠️ only a related skill found, ❌ not found):\n"
+            f"{json.dumps(criteria_rows, ensure_ascii=False)}\n"
+            f"Terms found per candidate and criterion:\n{json.dumps(criteria_evidence, ensure_ascii=False)}\n"
+            'Use it as the basis of "criteria_observations": keep these rows, change a mark only where the CV clearly contradicts it, '
+            "and add rows for important JD requirements the scan does not cover."
+        )
+    return ""
+
+def _strip_ranking_medals(comparative_data):
+    """Removes any medal emoji the model may add to the "Ranking" values."""
+    if "candidate_evaluations" in comparative_data:
+        for candidate in comparative_data["candidate_evaluations"]:
+            if "Ranking" in candidate and isinstance(candidate["Ranking"], str):
+                candidate["Ranking"] = re.sub(r'[\U0001F3C5-\U0001F3CA\U0001F947-\U0001F949]', '', candidate["Ranking"]).strip()
+    return comparative_data
+
+def _rank_number(ranking):
+    """Parses a rank such as "2" or "#2" into an int, or None."""
+    match = re.search(r'\d+', str(ranking))
+    return int(match.group()) if match else None
+
+def _ranking_entry_index(ranking_entry, candidate_count, index_by_unique_name):
+    """
+    Returns the index of the evaluation a reduce 'rankings' entry refers to: its "Candidate ID" if
+    valid, else its "Candidate Name" if no other CV maps to that name, else None.
+    """
+    candidate_id = _rank_number(ranking_entry.get("Candidate ID"))
+    if candidate_id is not None and 1 <= candidate_id <= candidate_count:
+        return candidate_id - 1
+    return index_by_unique_name.get(ranking_entry.get("Candidate Name"))
+
+def _match_percent_value(candidate):
+    match = re.search(r'\d+(\.\d+)?', str(candidate.get("Match %", "")))
+    return float(match.group()) if match else -1.0
+
+async def _score_cv_against_jd(async_client, semaphore, jd_text, cv_item, on_candidate=None, skip_criteria=False, ai_usage=None):
+    """Map step: scores a single CV against the JD. Returns the parsed JSON or an {"error": ...} dict."""
+    candidate_name = _candidate_name_from_filename(cv_item['filename'])
+    user_prompt = f"""
+    Here is the Job Description (JD):
+    ---
+    {jd_text}
+    ---
+
+    Here is the Candidate CV (Name: {candidate_name}, Filename: {cv_item['filename']}):
+    ---
+    {cv_item['text']}
+    ---
+    {MAP_SKIP_CRITERIA_NOTE if skip_criteria else ""}
+    Please provide the evaluation in the specified JSON format.
+    """
+    async with semaphore:
+        try:
+            response = await create_chat_completion_async(
+                async_client,
+                [
+                    {"role": "system", "content": MAP_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                ai_usage=ai_usage,
+                response_format={"type": "json_object"}
+            )
+            reply_content = response.choices[0].message.content
+            evaluation = json.loads(reply_content)
+            if not isinstance(evaluation, dict):
+                # Valid JSON but not the evaluation object: fail this CV only, like unparseable JSON
+                raise json.JSONDecodeError(f"Expected a JSON object, got {type(evaluation).__name__}", reply_content, 0)
+        except json.JSONDecodeError as e:
+            AI_JSON_DECODE_FAILURES.inc(step="map")
+            logger.error("Scoring reply for %s was not valid JSON: %s", cv_item['filename'], e)
+            return {"error": f"AI response format error: {e}"}
+        except Exception as e:
+            logger.error("Scoring failed for %s: %s", cv_item['filename'], e)
+            return {"error": str(e)}
+    evaluation["Candidate Name"] = candidate_name
+    # Not a report column: lets the results table match the candidate to its pre-ranking
+    evaluation["CV File"] = cv_item['filename']
+    if on_candidate is not None:
+        # The ranking is only known after the reduce step
+        on_candidate({key: value for key, value in evaluation.items() if key != "criteria"})
+    return evaluation
+
+def _apply_map_step_budget(jd_text, all_cv_data):
+    """Applies the prompt token budget to each per-CV request. Returns the trimmed JD, trimmed CVs and usage rows."""
+    reserved_tokens = count_tokens(MAP_SYSTEM_PROMPT) + PROMPT_SCAFFOLD_TOKENS + PROMPT_PER_CV_SCAFFOLD_TOKENS
+    trimmed_jd_text = jd_text
+    trimmed_cv_data = []
+    token_usage_rows = []
+    for cv_item in all_cv_data:
+        # Every map request carries the JD plus one CV, so each request gets the full budget
+        trimmed_jd_text, trimmed_cv_items, usage_rows = apply_prompt_budget(
+            jd_text, [cv_item], config.PROMPT_TOKEN_BUDGET, reserved_tokens, config.PROMPT_JD_SHARE
+        )
+        trimmed_cv_data.extend(trimmed_cv_items)
+        if not token_usage_rows:
+            token_usage_rows.append(usage_rows[0])
+        token_usage_rows.append(usage_rows[1])
+    return trimmed_jd_text, trimmed_cv_data, token_usage_rows
+
+async def _run_map_step(jd_text, all_cv_data, on_candidate=None, skip_criteria=False, ai_usage=None):
+    """
+    Scores every CV concurrently. Runs on the shared event loop (see clients.run_coroutine), so
+    ai_usage is only updated from the loop's thread.
+    """
+    async_client = get_async_openai_client()
+    semaphore = asyncio.Semaphore(config.MAP_REDUCE_CONCURRENCY)
+    return await asyncio.gather(*[
+        _score_cv_against_jd(async_client, semaphore, jd_text, cv_item, on_candidate, skip_criteria, ai_usage) for cv_item in all_cv_data
+    ])
+
+def get_map_reduce_ai_analysis(jd_text, all_cv_data, on_candidate=None, ui=st, analysis_info=None, criteria_note=""):
+    """
+    Map-reduce variant of get_comparative_ai_analysis for large CV batches.
+    Each CV is scored against the JD concurrently, then one small reduce call ranks the
+    candidates and builds the criteria table from the per-CV results.
+    Returns the same JSON shape as get_comparative_ai_analysis.
+    on_candidate, if given, is called with each candidate's evaluation as soon as its scoring call finishes.
+    A non-empty criteria_note (see _criteria_prompt_note) replaces the per-CV criteria and is added to the reduce prompt.
+    ui and analysis_info are as for get_comparative_ai_analysis.
+    """
+    if analysis_info is None:
+        analysis_info = {}
+    ai_response_content = ""
+    jd_text, all_cv_data, token_usage_rows = _apply_map_step_budget(jd_text, all_cv_data)
+    analysis_info['token_budget_report'] = token_usage_rows
+    try:
+        with ui.spinner(f"AI is scoring {len(all_cv_data)} CV(s) against the JD..."):
+            logger.debug("Scoring %s CVs concurrently.", len(all_cv_data))
+            # on_candidate is called in this thread (it may update Streamlit elements), not on the event loop
+            per_cv_results = run_coroutine(
+                lambda emit: _run_map_step(jd_text, all_cv_data, emit, skip_criteria=bool(criteria_note), ai_usage=analysis_info.get('ai_usage')),
+                on_item=on_candidate
+            )
+
+        candidate_evaluations = []
+        analysis_info['failed_cvs'] = []
+        for cv_item, evaluation in zip(all_cv_data, per_cv_results):
+            if "error" in evaluation:
+                ui.warning(f"AI scoring failed for {cv_item['filename']}: {evaluation['error']}")
+                analysis_info['failed_cvs'].append(cv_item['filename'])
+                continue
+            candidate_evaluations.append(evaluation)
+
+        if not candidate_evaluations:
+            return {"error": "AI scoring failed for every CV."}
+
+        # Only the compact per-CV results go into the reduce call, never the CV text itself
+        reduce_input = [
+            {
+                "Candidate ID": idx + 1,
+                "Candidate Name": evaluation["Candidate Name"],
+                "Match %": evaluation.get("Match %", "N/A"),
+                "Shortlist Probability": evaluation.get("Shortlist Probability", "N/A"),
+                "Key Strengths": evaluation.get("Key Strengths", ""),
+                "Key Gaps": evaluation.get("Key Gaps", ""),
+                "Location Suitability": evaluation.get("Location Suitability", ""),
+                "criteria": evaluation.get("criteria", []),
+            }
+            for idx, evaluation in enumerate(candidate_evaluations)
+        ]
+        reduce_user_prompt = f"""
+    Here is the Job Description (JD):
+    ---
+    {jd_text}
+    ---
+
+    Here are the individual candidate evaluations (JSON):
+    {json.dumps(reduce_input, ensure_ascii=False)}
+    {criteria_note}
+
+    Please provide the comparative summary in the specified JSON format.
+    """
+
+        with ui.spinner("AI is comparing the candidates..."):
+            logger.debug("Sending reduce request to OpenAI API.")
+            response = create_chat_completion(
+                [
+                    {"role": "system", "content": REDUCE_SYSTEM_PROMPT},
+                    {"role": "user", "content": reduce_user_prompt}
+                ],
+                ai_usage=analysis_info.get('ai_usage'),
+                response_format={"type": "json_object"}
+            )
+        ai_response_content = response.choices[0].message.content
+        logger.debug("Raw AI Reduce Response: %s...", ai_response_content[:200])
+        reduce_data = json.loads(ai_response_content)
+
+        # Ranks are matched back by Candidate ID (index + 1), since two CVs can map to the same candidate name
+        name_counts = {}
+        for evaluation in candidate_evaluations:
+            name_counts[evaluation["Candidate Name"]] = name_counts.get(evaluation["Candidate Name"], 0) + 1
+        index_by_unique_name = {evaluation["Candidate Name"]: idx for idx, evaluation in enumerate(candidate_evaluations) if name_counts[evaluation["Candidate Name"]] == 1}
+        ranks = {}
+        for ranking_entry in reduce_data.get("rankings", []):
+            if not isinstance(ranking_entry, dict):
+                continue
+            idx = _ranking_entry_index(ranking_entry, len(candidate_evaluations), index_by_unique_name)
+            rank = _rank_number(ranking_entry.get("Ranking"))
+            if idx is not None and rank is not None and idx not in ranks:
+                ranks[idx] = rank
+
+        # Candidates the reduce step did not rank are ordered after the ranked ones by Match %
+        # (numbered after the highest rank returned, which may have gaps)
+        unranked = sorted(
+            [idx for idx in range(len(candidate_evaluations)) if idx not in ranks],
+            key=lambda idx: _match_percent_value(candidate_evaluations[idx]),
+            reverse=True
+        )
+        next_rank = max(ranks.values(), default=0) + 1
+        for idx in unranked:
+            ranks[idx] = next_rank
+            next_rank += 1
+
+        for idx, evaluation in enumerate(candidate_evaluations):
+            evaluation.pop("criteria", None)
+            evaluation["Ranking"] = str(ranks[idx])
+
+        comparative_data = {
+            "candidate_evaluations": candidate_evaluations,
+            "criteria_observations": reduce_data.get("criteria_observations", []),
+            "additional_observations_text": reduce_data.get("additional_observations_text", "No general observations provided."),
+            "final_shortlist_recommendation": reduce_data.get("final_shortlist_recommendation", "No final recommendation provided."),
+        }
+        _strip_ranking_medals(comparative_data)
+        comparative_data["candidate_evaluations"].sort(key=lambda candidate: int(candidate["Ranking"]) if candidate["Ranking"].isdigit() else len(candidate_evaluations) + 1)
+        if analysis_info['failed_cvs']:
+            # The DOCX and the results page show this, so the shortlist is not mistaken for a complete one
+            comparative_data["additional_observations_text"] = (
+                f"PARTIAL RESULT: AI scoring failed for {len(analysis_info['failed_cvs'])} CV(s), which are not part of this comparison: "
+                f"{', '.join(analysis_info['failed_cvs'])}.\n\n{comparative_data['additional_observations_text']}"
+            )
 
-        print("DEBUG (get_comparative_ai_analysis): AI analysis successful.")
+        logger.debug("Map-reduce AI analysis successful.")
         return comparative_data
 
     except json.JSONDecodeError as e:
-        st.error(f"Error: AI response was not valid JSON. Please try again or refine input. Error: {e}")
-        st.code(ai_response_content)
-        print(f"ERROR (get_comparative_ai_analysis): JSON Decode Error: {e}, Response: {ai_response_content}")
+        AI_JSON_DECODE_FAILURES.inc(step="reduce")
+        ui.error(f"Error: AI response was not valid JSON. Please try again or refine input. Error: {e}")
+        ui.code(ai_response_content)
+        analysis_info['raw_response'] = ai_response_content
+        logger.error("JSON Decode Error: %s, Response: %s", e, ai_response_content)
         return {"error": f"AI response format error: {e}"}
     except Exception as e:
-        st.error(f"An unexpected error occurred during AI analysis: {e}")
-        print(f"ERROR (get_comparative_ai_analysis): Unexpected Error during AI analysis: {e}")
+        ui.error(f"An unexpected error occurred during AI analysis: {e}")
+        logger.error("Unexpected Error during AI analysis: %s", e)
         return {"error": f"AI processing failed: {e}"}
 
 # --- DOCX Generation Function ---
-def generate_docx_report(comparative_data, jd_filename="Job Description", cv_filenames_str="Candidates"):
+def generate_docx_report(comparative_data, jd_filename="Job Description", cv_filenames_str="Candidates", ui=st):
     """
     Generates a DOCX report based on the comparative AI analysis data.
-    Includes two tables and text sections.
+    Includes two tables and text sections. Rendering runs on the shared worker pool.
     """
+    import document_processing
     try:
-        document = Document()
-
-        section = document.sections[0]
-        section.start_type = WD_SECTION_START.NEW_PAGE
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
-        section.top_margin = Inches(1)
-        section.bottom_margin = Inches(1)
-
-        document.add_heading("JD-CV Comparative Analysis Report", level=0)
-        document.add_paragraph().add_run("Generated by SSO Consultants AI").italic = True
-        document.add_paragraph().add_run(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}").small_caps = True
-        document.add_paragraph(f"Job Description: {jd_filename}\nCandidates: {cv_filenames_str}")
-        document.add_paragraph("\n")
-
-        candidate_evaluations_data = comparative_data.get("candidate_evaluations", [])
-        criteria_observations_data = comparative_data.get("criteria_observations", [])
-        additional_observations_text = comparative_data.get("additional_observations_text", "No general observations provided.")
-        final_shortlist_recommendation = comparative_data.get("final_shortlist_recommendation", "No final recommendation provided.")
-
-        if candidate_evaluations_data:
-            document.add_heading("🧾 Candidate Evaluation Table", level=1)
-            document.add_paragraph("Detailed assessment of each candidate against the Job Description:")
-
-            df_evaluations = pd.DataFrame(candidate_evaluations_data)
-
-            expected_cols_eval = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
-            for col in expected_cols_eval:
-                if col not in df_evaluations.columns:
-                    df_evaluations[col] = "N/A"
-            df_evaluations = df_evaluations[expected_cols_eval]
-
-            table_eval = document.add_table(rows=1, cols=len(df_evaluations.columns))
-            table_eval.style = 'Table Grid'
-
-            hdr_cells_eval = table_eval.rows[0].cells
-            for i, col_name in enumerate(df_evaluations.columns):
-                hdr_cells_eval[i].text = col_name
-                for paragraph in hdr_cells_eval[i].paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.size = Pt(9)
-                hdr_cells_eval[i].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-            for index, row in df_evaluations.iterrows():
-                row_cells = table_eval.add_row().cells
-                for i, cell_value in enumerate(row):
-                    row_cells[i].text = str(cell_value)
-                    for paragraph in row_cells[i].paragraphs:
-                        for run in paragraph.runs:
-                            run.font.size = Pt(9)
-
-            document.add_paragraph("\n")
-
-        if criteria_observations_data:
-            document.add_heading("✅ Additional Observations (Criteria Comparison)", level=1)
-
-            df_criteria = pd.DataFrame(criteria_observations_data)
-
-            table_criteria = document.add_table(rows=1, cols=len(df_criteria.columns))
-            table_criteria.style = 'Table Grid'
-
-            hdr_cells_criteria = table_criteria.rows[0].cells
-            for i, col_name in enumerate(df_criteria.columns):
-                hdr_cells_criteria[i].text = col_name
-                for paragraph in hdr_cells_criteria[i].paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.size = Pt(9)
-                hdr_cells_criteria[i].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-            for index, row in df_criteria.iterrows():
-                row_cells = table_criteria.add_row().cells
-                for i, cell_value in enumerate(row):
-                    row_cells[i].text = str(cell_value)
-                    for paragraph in row_cells[i].paragraphs:
-                        for run in paragraph.runs:
-                            run.font.size = Pt(9)
-
-            document.add_paragraph("\n")
-
-        if additional_observations_text and additional_observations_text.strip() not in ["No general observations provided.", ""]:
-            document.add_heading("General Observations", level=2)
-            document.add_paragraph(additional_observations_text)
-            document.add_paragraph("\n")
-
-        if final_shortlist_recommendation and final_shortlist_recommendation.strip() not in ["No final recommendation provided.", ""]:
-            document.add_heading("📌 Final Shortlist Recommendation", level=1)
-            final_rec_para = document.add_paragraph()
-            final_rec_para.add_run(final_shortlist_recommendation).bold = True
-            document.add_paragraph("\n")
-
-        doc_io = io.BytesIO()
-        document.save(doc_io)
-        doc_io.seek(0)
-        print("DEBUG (generate_docx_report): DOCX generated successfully.")
+        docx_bytes = get_worker_pool().submit(
+            "render_docx",
+            document_processing.render_docx_report,
+            comparative_data,
+            jd_filename,
+            cv_filenames_str
+        ).result(timeout=config.WORKER_POOL_JOB_TIMEOUT_SECONDS)
+        doc_io = io.BytesIO(docx_bytes)
+        logger.debug("DOCX generated successfully.")
         return doc_io
     except Exception as e:
-        st.error(f"Error generating DOCX report: {e}")
-        print(f"ERROR (generate_docx_report): {e}")
+        ui.error(f"Error generating DOCX report: {e}")
+        logger.error("%s", e)
+        return None
+
+def get_report_docx_bytes(comparative_data, jd_filename, cv_filenames, ui=st):
+    """
+    Returns the DOCX report for a comparative analysis as bytes, or None if rendering failed.
+    Rendered reports are memoized by a hash of the analysis and filenames, so a report is only
+    rendered the first time it is downloaded or saved.
+    """
+    import document_processing
+    cache_key = make_fingerprint(
+        renderer_version=document_processing.REPORT_RENDERER_VERSION,
+        comparative_data=comparative_data,
+        jd_filename=jd_filename,
+        cv_filenames=cv_filenames
+    )
+    docx_report_cache = get_docx_report_cache()
+    docx_bytes = docx_report_cache.get(cache_key)
+    if docx_bytes is not None:
+        logger.debug("DOCX cache hit (%s).", cache_key[:12])
+        return docx_bytes
+    docx_buffer = generate_docx_report(comparative_data, jd_filename, ", ".join(cv_filenames), ui=ui)
+    if docx_buffer is None:
         return None
+    docx_bytes = docx_buffer.getvalue()
+    docx_report_cache.put(cache_key, docx_bytes)
+    return docx_bytes
 
 # --- Supabase Authentication Functions ---
 def register_user(email, password, username):
     """Registers a new user in Supabase Auth and stores user profile in the 'users' table."""
     try:
-        print(f"DEBUG (register_user): Attempting to sign up user {email}")
+        logger.debug("Attempting to sign up user %s", email)
         response = supabase.auth.sign_up({"email": email, "password": password})
 
         if response.user:
@@ -705,17 +1184,17 @@ def register_user(email, password, username):
             # MODIFIED: Use service_role client for direct table access for user creation
             st.session_state['supabase_service_role_client'].table('users').insert(user_data).execute()
             st.success(f"Account created successfully for {username}! Please check your email to verify and then log in.")
-            print(f"DEBUG (register_user): User {username} created and profile saved.")
+            logger.info("User %s created and profile saved.", username)
             time.sleep(2)
             return True
         else:
             st.error(f"Registration failed: {response.session.user.message if response.session and response.session.user else 'Unknown error'}")
-            print(f"DEBUG (register_user): Supabase signup failed for {email}. Response: {response}")
+            logger.debug("Supabase signup failed for %s. Response: %s", email, response)
             return False
     except Exception as e: # Catching general Exception as APIResponseException import was removed
         error_message = str(e)
         st.error(f"Error creating account: {error_message}")
-        print(f"ERROR (register_user): {error_message}")
+        logger.error("%s", error_message)
         time.sleep(2)
         if "User already registered" in error_message or "duplicate key value violates unique constraint" in error_message:
             st.error("This email is already registered.")
@@ -727,30 +1206,30 @@ def login_user(email, password, login_as_admin_attempt=False):
     Redirects to password update if first login is required."""
 
     if supabase is None:
-        print("ERROR: login_user called but 'supabase' is None. Supabase initialization failed or was not completed.")
+        logger.error("login_user called but 'supabase' is None. Supabase initialization failed or was not completed.")
         st.error("Application error: Database connection not established. Please refresh or contact support.")
         return False
 
     try:
-        print(f"DEBUG (login_user): Attempting to log in {email}")
+        logger.debug("Attempting to log in %s", email)
 
         if login_as_admin_attempt:
             # Check against hardcoded admin credentials
-            if email == ADMIN_EMAIL and bcrypt.checkpw(password.encode('utf-8'), ADMIN_PASSWORD_HASH.encode('utf-8')):
+            if is_admin_login(email, password):
                 st.session_state['logged_in'] = True
                 st.session_state['user_email'] = email
                 st.session_state['user_name'] = "Admin" # Hardcoded name for the special admin
                 st.session_state['user_uid'] = "admin_special_uid" # Placeholder UID for special admin
                 st.session_state['is_admin'] = True
                 st.success("Admin login successful!")
-                print(f"DEBUG (login_user): Special Admin logged in: {email}.")
+                logger.info("Special Admin logged in: %s.", email)
                 time.sleep(1)
                 st.session_state['current_page'] = 'Dashboard'
                 st.rerun()
                 return True
             else:
                 st.error("Invalid admin credentials.")
-                print(f"DEBUG (login_user): Admin login failed for {email}.")
+                logger.debug("Admin login failed for %s.", email)
                 return False
         else:
             # Attempt to sign in via Supabase Auth
@@ -764,15 +1243,15 @@ def login_user(email, password, login_as_admin_attempt=False):
 
                 is_user_admin_in_db = user_data.get('isadmin', False) # Changed to lowercase 'isadmin'
                 first_login_required = user_data.get('firstloginrequired', True) # Changed to lowercase 'firstloginrequired'
-                print(f"DEBUG (login_user): User {email} data: isadmin={is_user_admin_in_db}, firstloginrequired={first_login_required}")
+                logger.debug("User %s data: isadmin=%s, firstloginrequired=%s", email, is_user_admin_in_db, first_login_required)
 
                 if login_as_admin_attempt and not is_user_admin_in_db:
                     st.error("This account does not have administrator privileges. Please log in as a regular user.")
-                    print(f"DEBUG (login_user): Admin login attempt for non-admin user {email} denied.")
+                    logger.debug("Admin login attempt for non-admin user %s denied.", email)
                     return False
                 elif not login_as_admin_attempt and is_user_admin_in_db:
                     st.error("This account has administrator privileges. Please log in as an administrator.")
-                    print(f"DEBUG (login_user): User login attempt for admin user {email} denied.")
+                    logger.debug("User login attempt for admin user %s denied.", email)
                     return False
 
                 if first_login_required:
@@ -780,7 +1259,7 @@ def login_user(email, password, login_as_admin_attempt=False):
                     st.session_state['new_user_uid_for_pw_reset'] = user_id
                     st.session_state['current_page'] = 'Update Password'
                     st.success("Please update your password before proceeding.")
-                    print(f"DEBUG (login_user): Redirecting {email} to password update page.")
+                    logger.debug("Redirecting %s to password update page.", email)
                     time.sleep(1)
                     st.rerun()
                     return True
@@ -794,7 +1273,7 @@ def login_user(email, password, login_as_admin_attempt=False):
                 st.success(f"Logged in as {st.session_state['user_name']}.")
                 if st.session_state['is_admin']:
                     st.info("You are logged in as an administrator.")
-                print(f"DEBUG (login_user): Successfully logged in {st.session_state['user_name']} (UID: {st.session_state['user_uid']}, Admin: {st.session_state['is_admin']}).")
+                logger.info("Successfully logged in %s (UID: %s, Admin: %s).", st.session_state['user_name'], st.session_state['user_uid'], st.session_state['is_admin'])
 
                 time.sleep(1)
                 st.session_state['current_page'] = 'Dashboard'
@@ -802,12 +1281,12 @@ def login_user(email, password, login_as_admin_attempt=False):
                 return True
             else:
                 st.error("Invalid email or password.")
-                print(f"DEBUG (login_user): Supabase login failed for {email}. Response: {response}")
+                logger.debug("Supabase login failed for %s. Response: %s", email, response)
                 return False
     except Exception as e: # Catching general Exception as APIResponseException import was removed
         error_message = str(e)
         st.error(f"An authentication error occurred: {error_message}. Please try again.")
-        print(f"ERROR (login_user): Supabase Auth Error during login for {email}: {error_message}")
+        logger.error("Supabase Auth Error during login for %s: %s", email, error_message)
         time.sleep(2)
         if "Invalid login credentials" in error_message or "Email not confirmed" in error_message:
             st.error("Invalid email or password, or email not confirmed.")
@@ -820,7 +1299,7 @@ def login_user(email, password, login_as_admin_attempt=False):
 
 def logout_user():
     """Logs out the current user by resetting session state and Supabase session."""
-    print("DEBUG (logout_user): Initiating logout.")
+    logger.debug("Initiating logout.")
     try:
         supabase.auth.sign_out() # Use regular client for logout
         st.session_state['logged_in'] = False
@@ -829,18 +1308,26 @@ def logout_user():
         st.session_state['user_uid'] = ''
         st.session_state['is_admin'] = False
         st.session_state['ai_review_result'] = None
-        st.session_state['generated_docx_buffer'] = None
+        st.session_state['token_budget_report'] = None
+        st.session_state['prerank_scores'] = None
+        st.session_state['duplicate_report'] = None
+        st.session_state['analysis_job_id'] = None
+        st.session_state['viewed_report'] = None
+        st.session_state['review_reports_pager'] = None
+        st.session_state['admin_reports_pager'] = None
+        st.session_state['loaded_analysis_job_id'] = None
+        st.session_state['report_download_filename'] = None
         st.session_state['review_triggered'] = False
         st.session_state['current_page'] = 'Login'
         st.session_state['login_mode'] = None
         st.session_state['new_user_email_for_pw_reset'] = ''
         st.session_state['new_user_uid_for_pw_reset'] = ''
         st.success("Logged out successfully!")
-        print("DEBUG (logout_user): User logged out. Session state reset. Rerunning.")
+        logger.debug("User logged out. Session state reset. Rerunning.")
         st.rerun()
     except Exception as e:
         st.error(f"Error during logout: {e}")
-        print(f"ERROR (logout_user): Error during logout: {e}")
+        logger.error("Error during logout: %s", e)
 
 # --- Streamlit Page Functions ---
 def dashboard_page():
@@ -851,19 +1338,375 @@ def dashboard_page():
     st.info("To get started, navigate to 'Upload JD & CV' to perform a new AI-powered comparative analysis.")
     if st.session_state['is_admin']: # Only show for admin
         st.write("As an admin, you can also check 'Review Reports' to see all past analyses.")
-    print(f"DEBUG (dashboard_page): Displaying dashboard for {st.session_state['user_name']}.") 
+    logger.debug("Displaying dashboard for %s.", st.session_state['user_name']) 
+
+def run_review_pipeline(ui, user_context, jd_file, cv_files, analysis_mode="single", force_refresh=False, stream_results=True, prerank_top_k=0, criteria_mode="ai"):
+    """
+    Runs a complete review: text extraction, duplicate merging, local pre-ranking, AI analysis, DOCX generation and saving the report.
+    Designed to run as a background analysis job (see analysis_jobs.py): ui is the job's reporter,
+    user_context comes from get_current_user_context(), and jd_file/cv_files are (filename, file_bytes)
+    pairs captured from the uploaders. Returns the job result dict, or {"error": ...} on failure.
+    The review and each of its stages are timed and counted in metrics.py.
+    """
+    outcome = "failure"
+    try:
+        with REVIEW_DURATION_SECONDS.time(analysis_mode=analysis_mode):
+            result = _run_review_stages(ui, user_context, jd_file, cv_files, analysis_mode, force_refresh, stream_results, prerank_top_k, criteria_mode)
+        if "error" not in result:
+            outcome = "success"
+        return result
+    finally:
+        REVIEWS_TOTAL.inc(analysis_mode=analysis_mode, outcome=outcome)
+
+def _run_review_stages(ui, user_context, jd_file, cv_files, analysis_mode, force_refresh, stream_results, prerank_top_k, criteria_mode):
+    """The stages of run_review_pipeline, each timed with metrics.track_stage."""
+    jd_filename, _ = jd_file
+    ui.set_progress(0.05, f"Extracting text from the JD and {len(cv_files)} CV(s)")
+    with track_stage(STAGE_EXTRACTION) as stage:
+        texts = extract_files_text([jd_file] + list(cv_files), ui=ui)
+        if not all(texts):
+            stage.fail()
+    jd_text = texts[0]
+
+    all_candidates_data = []
+    cv_filenames_list = []
+    for (cv_filename, _), cv_text in zip(cv_files, texts[1:]):
+        if cv_text:
+            all_candidates_data.append({'filename': cv_filename, 'text': cv_text})
+            cv_filenames_list.append(cv_filename)
+        else:
+            ui.warning(f"Could not process CV: {cv_filename}. Skipping it.")
+
+    if not jd_text:
+        return {"error": "Failed to extract text from the Job Description."}
+    if not all_candidates_data:
+        return {"error": "No valid CVs could be processed for analysis."}
+
+    # The same candidate sent twice under different filenames is only analyzed once
+    duplicate_report = {"merged": [], "previously_seen": []}
+    try:
+        with track_stage(STAGE_DEDUP):
+            all_candidates_data, duplicate_report["merged"], duplicate_report["previously_seen"] = collapse_duplicate_cvs(
+                all_candidates_data,
+                config.DEDUP_THRESHOLD,
+                store=get_fingerprint_store(),
+                user_uid=user_context['user_uid'],
+                jd_filename=jd_filename,
+                match_all_users=user_context.get('is_admin', False)
+            )
+    except Exception as e:
+        logger.error("Duplicate detection failed, continuing without it: %s", e)
+    if duplicate_report["merged"]:
+        cv_filenames_list = [cv_item['filename'] for cv_item in all_candidates_data]
+        ui.info(f"Merged {len(duplicate_report['merged'])} duplicate CV(s) into the most complete copy. See 'Duplicate CVs' below.")
+    if duplicate_report["previously_seen"]:
+        ui.info(f"{len(duplicate_report['previously_seen'])} candidate(s) were already uploaded in an earlier review. See 'Duplicate CVs' below.")
+
+    try:
+        with track_stage(STAGE_CANDIDATE_INDEX):
+            added_to_index = get_candidate_index().add(
+                [dict(cv_item, candidate_name=_candidate_name_from_filename(cv_item['filename'])) for cv_item in all_candidates_data],
+                user_uid=user_context['user_uid'],
+                user_email=user_context['user_email'],
+                jd_filename=jd_filename
+            )
+        logger.debug("Added %s new CV(s) to the candidate index.", added_to_index)
+    except Exception as e:
+        # The index only powers candidate search; never fail a review because of it
+        logger.error("Could not add CVs to the candidate index: %s", e)
+
+    # Rank all CVs locally (BM25) and only send the best prerank_top_k to the AI
+    ui.set_progress(0.15, f"Pre-ranking {len(all_candidates_data)} CV(s) against the JD")
+    with track_stage(STAGE_PRERANK):
+        prerank_results = prerank_candidates(jd_text, all_candidates_data)
+    if prerank_top_k and len(all_candidates_data) > prerank_top_k:
+        shortlisted_filenames = {entry['filename'] for entry in prerank_results[:prerank_top_k]}
+        all_candidates_data = [cv_item for cv_item in all_candidates_data if cv_item['filename'] in shortlisted_filenames]
+        cv_filenames_list = [cv_item['filename'] for cv_item in all_candidates_data]
+        left_out_filenames = [entry['filename'] for entry in prerank_results[prerank_top_k:]]
+        ui.info(
+            f"Pre-ranking kept the top {prerank_top_k} of {len(prerank_results)} CVs for the AI review. "
+            f"Not sent to the AI: {', '.join(left_out_filenames)}. See 'Local Pre-Ranking' below for all scores."
+        )
+        logger.debug("Pre-ranking shortlisted %s of %s CVs.", prerank_top_k, len(prerank_results))
+    else:
+        shortlisted_filenames = {entry['filename'] for entry in prerank_results}
+    prerank_scores = [
+        {
+            "Candidate Name": _candidate_name_from_filename(entry['filename']),
+            "CV File": entry['filename'],
+            "Pre-Score": entry['Pre-Score'],
+            "Pre-Rank": entry['Pre-Rank'],
+            "Sent to AI": entry['filename'] in shortlisted_filenames,
+        }
+        for entry in prerank_results
+    ]
+
+    ui.set_progress(0.2, "AI is analyzing the JD and CVs")
+    analysis_info = {}
+    with track_stage(STAGE_AI_ANALYSIS) as stage:
+        comparative_results = get_comparative_ai_analysis(
+            jd_text,
+            all_candidates_data,
+            analysis_mode=analysis_mode,
+            force_refresh=force_refresh,
+            on_candidate=ui.add_partial_candidate if stream_results else None,
+            ui=ui,
+            analysis_info=analysis_info,
+            criteria_mode=criteria_mode
+        )
+        if "error" in comparative_results:
+            stage.fail()
+    if "error" in comparative_results:
+        return {"error": f"AI analysis failed: {comparative_results['error']}"}
+    logger.debug("AI review successful.")
+    failed_cvs = analysis_info.get('failed_cvs') or []
+    if failed_cvs:
+        ui.warning(f"AI scoring failed for {len(failed_cvs)} CV(s), so this shortlist is incomplete and is not saved to the report history. Run the review again to retry them.")
+
+    timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+    download_filename = f"{user_context['user_name'].replace(' ', '')}_JD-CV_Comparison_Analysis_{timestamp_str}.docx"
+    download_url = None
+    # Otherwise the report is rendered and saved when it is first downloaded (see _report_download_data)
+    if config.SAVE_REPORTS_ON == "review" and not failed_cvs:
+        ui.set_progress(0.8, "Generating the DOCX report")
+        with track_stage(STAGE_DOCX_RENDER) as stage:
+            docx_bytes = get_report_docx_bytes(comparative_results, jd_filename, cv_filenames_list, ui=ui)
+            if docx_bytes is None:
+                stage.fail()
+        if docx_bytes is None:
+            return {"error": "The AI review completed, but the DOCX report could not be generated."}
+
+        ui.set_progress(0.9, "Saving the report to the cloud")
+        logger.debug("Calling save_report_on_download now...")
+        with track_stage(STAGE_SAVE_REPORT) as stage:
+            download_url = save_report_on_download(
+                download_filename,
+                io.BytesIO(docx_bytes),
+                comparative_results,
+                jd_filename,
+                cv_filenames_list,
+                user_context=user_context,
+                ui=ui,
+                ai_usage=analysis_info.get('ai_usage')
+            )
+            if download_url is None:
+                stage.fail()
+        logger.debug("save_report_on_download call completed.")
+
+    return {
+        "comparative_data": comparative_results,
+        "token_budget_report": analysis_info.get('token_budget_report'),
+        "from_cache": analysis_info.get('from_cache', False),
+        "ai_usage": analysis_info.get('ai_usage'),
+        "failed_cvs": failed_cvs,
+        "prerank_scores": prerank_scores,
+        "duplicate_report": duplicate_report,
+        "jd_filename": jd_filename,
+        "cv_filenames": cv_filenames_list,
+        "report_filename": download_filename,
+        "download_url": download_url,
+    }
+
+def _replay_job_messages(job):
+    """Shows the messages a background job recorded through its reporter."""
+    for message in job.get('messages') or []:
+        if message['level'] == 'code':
+            st.code(message['text'])
+        else:
+            getattr(st, message['level'], st.info)(message['text'])
+
+def _load_finished_job_into_session(job_id):
+    """Copies a completed job's result into session state so the results section can display it."""
+    job = get_job_runner().store.get(job_id)
+    result = job['result']
+    st.session_state['ai_review_result'] = result['comparative_data']
+    st.session_state['token_budget_report'] = result.get('token_budget_report')
+    st.session_state['prerank_scores'] = result.get('prerank_scores')
+    st.session_state['duplicate_report'] = result.get('duplicate_report')
+    st.session_state['jd_filename_for_save'] = result['jd_filename']
+    st.session_state['cv_filenames_for_save'] = result['cv_filenames']
+    st.session_state['report_download_filename'] = result['report_filename']
+    st.session_state['loaded_analysis_job_id'] = job_id
+    st.session_state['review_triggered'] = True
+
+def render_comparative_results(comparative_results, prerank_scores=None):
+    """
+    Shows the tables and text sections of a comparative analysis (a fresh review or a saved report).
+    If prerank_scores (see run_review_pipeline) are given, a Pre-Score column is added to the candidate table,
+    matched by CV file (map-reduce results) or else by candidate name when only one CV has that name.
+    """
+    import pandas as pd
+    candidate_evaluations_data = comparative_results.get("candidate_evaluations", [])
+    if candidate_evaluations_data:
+        st.markdown("### 🧾 Candidate Evaluation Table")
+        df_evaluations = pd.DataFrame(candidate_evaluations_data)
+        expected_cols_eval = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
+        for col in expected_cols_eval:
+            if col not in df_evaluations.columns:
+                df_evaluations[col] = "N/A"
+        if prerank_scores:
+            pre_scores_by_file = {entry['CV File']: entry['Pre-Score'] for entry in prerank_scores}
+            name_counts = {}
+            for entry in prerank_scores:
+                name_counts[entry['Candidate Name']] = name_counts.get(entry['Candidate Name'], 0) + 1
+            pre_scores_by_unique_name = {entry['Candidate Name']: entry['Pre-Score'] for entry in prerank_scores if name_counts[entry['Candidate Name']] == 1}
+            pre_scores = [
+                pre_scores_by_file.get(candidate.get("CV File"), pre_scores_by_unique_name.get(candidate.get("Candidate Name")))
+                for candidate in candidate_evaluations_data
+            ]
+        df_evaluations = df_evaluations[expected_cols_eval]
+        if prerank_scores:
+            df_evaluations.insert(1, "Pre-Score", pre_scores)
+
+        st.dataframe(df_evaluations, use_container_width=True, hide_index=True)
+
+    criteria_observations_data = comparative_results.get("criteria_observations", [])
+    if criteria_observations_data:
+        st.markdown("### ✅ Additional Observations (Criteria Comparison)")
+        df_criteria = pd.DataFrame(criteria_observations_data)
+        st.dataframe(df_criteria, use_container_width=True, hide_index=True)
+
+    additional_observations_text = comparative_results.get("additional_observations_text", "No general observations provided.")
+    if additional_observations_text and additional_observations_text.strip() not in ["No general observations provided.", ""]:
+        st.markdown("### General Observations")
+        st.write(additional_observations_text)
+
+    final_shortlist_recommendation = comparative_results.get("final_shortlist_recommendation", "No final recommendation provided.")
+    if final_shortlist_recommendation and final_shortlist_recommendation.strip() not in ["No final recommendation provided.", ""]:
+        st.markdown("### 📌 Final Shortlist Recommendation")
+        st.write(final_shortlist_recommendation)
+
+def _render_report_for_download(comparative_data, jd_filename, cv_filenames):
+    """Returns the report's DOCX bytes for a download button callable (which cannot show Streamlit errors)."""
+    docx_bytes = get_report_docx_bytes(comparative_data, jd_filename, cv_filenames)
+    if docx_bytes is None:
+        raise RuntimeError("The DOCX report could not be generated.")
+    return docx_bytes
+
+def _report_download_data(job_id, user_context):
+    """
+    Returns the zero-argument callable given to st.download_button for a finished job's report.
+    Streamlit runs it (on its own thread) only when the button is clicked: it renders the report,
+    or takes it from the DOCX cache, and saves it first if the job has not saved it yet. Save
+    problems can only be logged there, and the job lock keeps quick repeated clicks from saving twice.
+    """
+    def build_report():
+        job_store = get_job_runner().store
+        result = job_store.get(job_id)['result']
+        docx_bytes = _render_report_for_download(result['comparative_data'], result['jd_filename'], result['cv_filenames'])
+        # Partial results (see run_review_pipeline) are downloadable but never saved
+        if result.get('download_url') or result.get('failed_cvs'):
+            return docx_bytes
+        with job_store.job_lock(job_id):
+            # Another click may have saved the report while this one was rendering or waiting
+            result = job_store.get(job_id)['result']
+            if not result.get('download_url'):
+                result['download_url'] = save_report_on_download(
+                    result['report_filename'],
+                    io.BytesIO(docx_bytes),
+                    result['comparative_data'],
+                    result['jd_filename'],
+                    result['cv_filenames'],
+                    user_context=user_context,
+                    ui=LoggingReporter(f"Saving the report of job {job_id}"),
+                    ai_usage=result.get('ai_usage')
+                )
+                if result['download_url']:
+                    job_store.update(job_id, result=result)
+        return docx_bytes
+    return build_report
+
+def render_analysis_job_status():
+    """
+    Shows progress of the session's current analysis job. While it is active, returns True and
+    sets 'poll_analysis_job' so the page is rerun after a pause (outside the profiled page span).
+    """
+    import pandas as pd
+    job_id = st.session_state['analysis_job_id']
+    job = get_job_runner().store.get(job_id)
+    if job is None or job['user_uid'] != st.session_state['user_uid']:
+        st.session_state['analysis_job_id'] = None
+        return
+
+    if job['status'] in ACTIVE_JOB_STATUSES:
+        st.progress(job['progress'], text=f"Review job {job_id[:8]} ({job['status']}): {job['stage']}...")
+        st.caption("The review runs in the background. You can leave this page and reopen it later from 'Your recent analysis jobs'.")
+        partial_candidates = job.get('partial_candidates') or []
+        if partial_candidates:
+            expected_cols_stream = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
+            df_streamed = pd.DataFrame(partial_candidates).reindex(columns=expected_cols_stream).fillna("…")
+            st.markdown(f"### 🧾 Candidates evaluated so far ({len(partial_candidates)} of {job['cv_count']})")
+            st.dataframe(df_streamed, use_container_width=True, hide_index=True)
+        st.session_state['poll_analysis_job'] = True
+        return True
+    elif job['status'] == JOB_STATUS_FAILED:
+        _replay_job_messages(job)
+        st.error(job['error'] or "The review failed.")
+    elif job['status'] == JOB_STATUS_DONE:
+        if st.session_state['loaded_analysis_job_id'] != job_id:
+            _load_finished_job_into_session(job_id)
+            logger.debug("Loaded results of job %s.", job_id)
+        _replay_job_messages(job)
+        st.success("AI review completed successfully!")
 
 def upload_jd_cv_page():
-    """Handles JD and CV uploads, triggers AI review, and displays/downloads results."""
+    """Handles JD and CV uploads, queues the AI review as a background job, and displays/downloads results."""
+    import pandas as pd
     st.markdown("<h1 style='color: #0D47A1 !important;'>⬆️ Upload JD & CV for AI Review</h1>", unsafe_allow_html=True)
     st.write("Upload your Job Description and multiple Candidate CVs to start the comparative analysis.")
-    print("DEBUG (upload_jd_cv_page): Displaying upload page.") 
+    logger.debug("Displaying upload page.") 
 
     uploaded_jd = st.file_uploader("Upload Job Description (PDF, DOCX, TXT)", type=["pdf", "docx", "txt"], key="jd_uploader")
     uploaded_cvs = st.file_uploader("Upload Candidate's CVs (Multiple - PDF, DOCX, TXT)", type=["pdf", "docx", "txt"], accept_multiple_files=True, key="cv_uploader")
 
+    analysis_mode_labels = {
+        "single": "Single request (JD and all CVs together)",
+        "map_reduce": "Map-reduce (score each CV separately, then compare)"
+    }
+    analysis_mode = st.radio(
+        "Analysis Mode",
+        list(analysis_mode_labels.keys()),
+        format_func=lambda mode: analysis_mode_labels[mode],
+        index=list(analysis_mode_labels.keys()).index(config.ANALYSIS_MODE) if config.ANALYSIS_MODE in analysis_mode_labels else 0,
+        help="Map-reduce is faster for large batches and avoids hitting the model's context limit.",
+        key="analysis_mode_radio"
+    )
+    force_refresh = st.checkbox(
+        "Force refresh (ignore saved AI results for identical documents)",
+        value=False,
+        key="force_refresh_checkbox"
+    )
+    stream_results = st.checkbox(
+        "Show candidates as soon as they are evaluated",
+        value=config.STREAM_RESULTS,
+        help="Streams the AI response and adds each candidate to the table as soon as their evaluation is complete.",
+        key="stream_results_checkbox"
+    )
+    criteria_mode_labels = {
+        "ai": "AI only",
+        "context": "AI, guided by the keyword scan",
+        "local": "Keyword scan (fast, consistent; the AI skips this table)"
+    }
+    criteria_mode = st.radio(
+        "Criteria Comparison Table",
+        list(criteria_mode_labels.keys()),
+        format_func=lambda mode: criteria_mode_labels[mode],
+        index=list(criteria_mode_labels.keys()).index(config.CRITERIA_TABLE_MODE) if config.CRITERIA_TABLE_MODE in criteria_mode_labels else 0,
+        help="The keyword scan matches the JD's skills against every CV with a skills taxonomy. If the JD names no known skill, the AI builds the table.",
+        key="criteria_mode_radio"
+    )
+    prerank_top_k = st.number_input(
+        "Send only the top K CVs to the AI (0 = send all)",
+        min_value=0,
+        value=config.PRERANK_TOP_K,
+        step=5,
+        help="All CVs are first scored locally against the JD (BM25 keyword relevance, takes milliseconds). Only the best K are analyzed by the AI, which keeps large batches fast and cheap.",
+        key="prerank_top_k_input"
+    )
+
     if st.button("Start AI Review", key="start_review_button"):
-        print("DEBUG (upload_jd_cv_page): 'Start AI Review' button clicked.") 
+        logger.debug("'Start AI Review' button clicked.") 
         if not uploaded_jd:
             st.warning("Please upload a Job Description.")
             return
@@ -871,113 +1714,104 @@ def upload_jd_cv_page():
             st.warning("Please upload at least one Candidate CV.")
             return
 
-        jd_text = get_file_content(uploaded_jd, uploaded_jd.name)
-        
-        all_candidates_data = []
-        cv_filenames_list = [] 
-        for cv_file in uploaded_cvs:
-            cv_text = get_file_content(cv_file, cv_file.name)
-            if cv_text:
-                all_candidates_data.append({'filename': cv_file.name, 'text': cv_text})
-                cv_filenames_list.append(cv_file.name) 
-            else:
-                st.warning(f"Could not process CV: {cv_file.name}. Skipping it.")
-        
-        if not jd_text:
-            st.error("Failed to extract text from the Job Description.")
-            return
-        if not all_candidates_data:
-            st.error("No valid CVs could be processed for analysis.")
-            return
-
         st.session_state['review_triggered'] = False 
         st.session_state['ai_review_result'] = None
-        st.session_state['generated_docx_buffer'] = None
-
-        comparative_results = get_comparative_ai_analysis(jd_text, all_candidates_data)
-
-        if "error" in comparative_results:
-            st.error(f"AI analysis failed: {comparative_results['error']}")
-        else:
-            st.session_state['ai_review_result'] = comparative_results
-            st.success("AI review completed successfully!")
-            print("DEBUG (upload_jd_cv_page): AI review successful. Preparing DOCX.") 
-            
-            st.session_state['jd_filename_for_save'] = uploaded_jd.name
-            st.session_state['cv_filenames_for_save'] = cv_filenames_list 
-
-            st.session_state['generated_docx_buffer'] = generate_docx_report(
-                comparative_results, 
-                st.session_state['jd_filename_for_save'], 
-                ", ".join(st.session_state['cv_filenames_for_save'])
+        st.session_state['token_budget_report'] = None
+        st.session_state['prerank_scores'] = None
+        st.session_state['duplicate_report'] = None
+
+        try:
+            job_id = get_job_runner().submit(
+                st.session_state['user_uid'],
+                uploaded_jd.name,
+                len(uploaded_cvs),
+                run_review_pipeline,
+                get_current_user_context(),
+                (uploaded_jd.name, uploaded_jd.getvalue()),
+                [(cv_file.name, cv_file.getvalue()) for cv_file in uploaded_cvs],
+                analysis_mode=analysis_mode,
+                force_refresh=force_refresh,
+                stream_results=stream_results,
+                prerank_top_k=int(prerank_top_k),
+                criteria_mode=criteria_mode
             )
-            
-            # --- START OF CHATGPT SUGGESTED CHANGE: SAVE TO CLOUD BEFORE DISPLAYING DOWNLOAD BUTTON ---
-            # Generate filename for saving
-            timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-            download_filename = f"{st.session_state['user_name'].replace(' ', '')}_JD-CV_Comparison_Analysis_{timestamp_str}.docx"
-
-            # Adding extra debug prints
-            print("DEBUG (upload_jd_cv_page): Calling save_report_on_download now...")
-            
-            # ✅ CALL save_report_on_download DIRECTLY here
-            save_report_on_download(
-                download_filename,
-                st.session_state['generated_docx_buffer'],
-                st.session_state['ai_review_result'],
-                st.session_state['jd_filename_for_save'],
-                st.session_state['cv_filenames_for_save']
+        except Exception as e:
+            st.error(f"Could not start the review: {e}")
+            logger.error("Job submission failed: %s", e)
+            return
+        st.session_state['analysis_job_id'] = job_id
+        logger.debug("Submitted analysis job %s.", job_id)
+        st.rerun()
+
+    recent_jobs = get_job_runner().store.list_for_user(st.session_state['user_uid'], limit=config.RECENT_JOBS_SHOWN)
+    if recent_jobs:
+        with st.expander("Your recent analysis jobs"):
+            df_jobs = pd.DataFrame([{
+                "Job ID": job['id'][:8],
+                "Job Description": job['jd_filename'],
+                "CVs": job['cv_count'],
+                "Status": job['status'],
+                "Progress": f"{job['progress']:.0%}",
+                "Started": datetime.fromisoformat(job['created_at']).strftime('%Y-%m-%d %H:%M:%S'),
+            } for job in recent_jobs])
+            st.dataframe(df_jobs, use_container_width=True, hide_index=True)
+            job_ids = [job['id'] for job in recent_jobs]
+            selected_job_id = st.selectbox(
+                "Open a job",
+                job_ids,
+                format_func=lambda job_id: f"{job_id[:8]} - {next(job['jd_filename'] for job in recent_jobs if job['id'] == job_id)}",
+                key="open_job_select"
             )
-            print("DEBUG (upload_jd_cv_page): save_report_on_download call completed.")
-            # --- END OF CHATGPT SUGGESTED CHANGE ---
+            if st.button("Open Job", key="open_job_button"):
+                st.session_state['analysis_job_id'] = selected_job_id
+                st.rerun()
 
-            st.session_state['review_triggered'] = True 
+    if st.session_state['analysis_job_id'] and render_analysis_job_status():
+        return
 
     if st.session_state['review_triggered'] and st.session_state['ai_review_result']:
-        print("DEBUG (upload_jd_cv_page): Displaying AI review results section.") 
+        logger.debug("Displaying AI review results section.") 
         comparative_results = st.session_state['ai_review_result']
 
         st.subheader("AI Review Results:")
 
-        candidate_evaluations_data = comparative_results.get("candidate_evaluations", [])
-        if candidate_evaluations_data:
-            st.markdown("### 🧾 Candidate Evaluation Table")
-            df_evaluations = pd.DataFrame(candidate_evaluations_data)
-            expected_cols_eval = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
-            for col in expected_cols_eval:
-                if col not in df_evaluations.columns:
-                    df_evaluations[col] = "N/A"
-            df_evaluations = df_evaluations[expected_cols_eval]
-
-            st.dataframe(df_evaluations, use_container_width=True, hide_index=True)
-        
-        criteria_observations_data = comparative_results.get("criteria_observations", [])
-        if criteria_observations_data:
-            st.markdown("### ✅ Additional Observations (Criteria Comparison)")
-            df_criteria = pd.DataFrame(criteria_observations_data)
-            st.dataframe(df_criteria, use_container_width=True, hide_index=True)
-
-        additional_observations_text = comparative_results.get("additional_observations_text", "No general observations provided.")
-        if additional_observations_text and additional_observations_text.strip() not in ["No general observations provided.", ""]:
-            st.markdown("### General Observations")
-            st.write(additional_observations_text)
-
-        final_shortlist_recommendation = comparative_results.get("final_shortlist_recommendation", "No final recommendation provided.")
-        if final_shortlist_recommendation and final_shortlist_recommendation.strip() not in ["No final recommendation provided.", ""]:
-            st.markdown("### 📌 Final Shortlist Recommendation")
-            st.write(final_shortlist_recommendation)
+        render_comparative_results(comparative_results, prerank_scores=st.session_state['prerank_scores'])
+
+        duplicate_report = st.session_state['duplicate_report']
+        if duplicate_report and (duplicate_report['merged'] or duplicate_report['previously_seen']):
+            with st.expander(f"Duplicate CVs ({len(duplicate_report['merged'])} merged, {len(duplicate_report['previously_seen'])} seen before)"):
+                if duplicate_report['merged']:
+                    st.markdown("**Merged in this review** (only the kept CV was analyzed)")
+                    st.dataframe(pd.DataFrame(duplicate_report['merged']), use_container_width=True, hide_index=True)
+                if duplicate_report['previously_seen']:
+                    st.markdown("**Already uploaded in an earlier review**")
+                    st.dataframe(pd.DataFrame(duplicate_report['previously_seen']), use_container_width=True, hide_index=True)
+
+        if st.session_state['prerank_scores']:
+            df_prerank = pd.DataFrame(st.session_state['prerank_scores'])
+            with st.expander(f"Local Pre-Ranking ({int(df_prerank['Sent to AI'].sum())} of {len(df_prerank)} CVs sent to the AI)"):
+                st.caption("Pre-Score is the CV's BM25 keyword relevance to the JD, scaled so the best CV scores 100.")
+                st.dataframe(df_prerank, use_container_width=True, hide_index=True)
+
+        if st.session_state['token_budget_report']:
+            df_token_usage = pd.DataFrame(st.session_state['token_budget_report'])
+            dropped_tokens = int(df_token_usage["Dropped Tokens"].sum())
+            with st.expander(f"Prompt Token Usage ({int(df_token_usage['Used Tokens'].sum()):,} tokens used, {dropped_tokens:,} dropped)"):
+                if dropped_tokens:
+                    st.warning("Some documents exceeded their share of the prompt budget; their least relevant sections were left out of the AI analysis.")
+                st.dataframe(df_token_usage, use_container_width=True, hide_index=True)
 
         st.markdown("---") 
 
         st.subheader("Download & Save Report")
         
         # --- START OF CHATGPT SUGGESTED CHANGE (Modified download button structure) ---
-        # No more on_click for save_report_on_download here as it's called earlier
-        if st.session_state['generated_docx_buffer']:
+        # The report is rendered (or taken from the DOCX cache) only when the button is clicked
+        if st.session_state['loaded_analysis_job_id']:
             st.download_button(
                 label="Download DOCX Report ⬇️", # Label changed for clarity
-                data=st.session_state['generated_docx_buffer'],
-                file_name=download_filename, # Use the same filename generated for saving
+                data=_report_download_data(st.session_state['loaded_analysis_job_id'], get_current_user_context()),
+                file_name=st.session_state['report_download_filename'], # Use the same filename generated for saving
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
                 key="download_docx_only" # New key for this button
             )
@@ -987,27 +1821,39 @@ def upload_jd_cv_page():
 
 # --- Supabase Storage & Database Functions ---
 
-def upload_file_to_supabase(file_bytes, file_name, user_uid):
+def upload_file_to_supabase(file_bytes, file_name, user_uid, supabase_target_client=None, ui=st):
     """
-    Uploads a file to Supabase Storage and returns its public URL.
+    Uploads a file to Supabase Storage and returns its public URL, or None if the upload failed.
     Uses service_role client if user_uid is 'admin_special_uid'.
+    Callers without a Streamlit session (background jobs) pass supabase_target_client explicitly.
+    Uploads are timed and failures counted as the 'storage_upload' review stage (see metrics.py).
     """
+    with track_stage(STAGE_STORAGE_UPLOAD) as stage:
+        public_url = _upload_file_to_supabase(file_bytes, file_name, user_uid, supabase_target_client, ui)
+        if public_url is None:
+            stage.fail()
+    return public_url
+
+def _upload_file_to_supabase(file_bytes, file_name, user_uid, supabase_target_client, ui):
+    """Performs the upload for upload_file_to_supabase."""
     try:
         bucket_name = "app-files" # Ensure this bucket exists in your Supabase Storage
         file_path_in_storage = f"jd_cv_reports/{user_uid}/{file_name}"
 
-        if user_uid == "admin_special_uid":
+        if supabase_target_client is not None:
+            logger.debug("Using client provided by caller.")
+        elif user_uid == "admin_special_uid":
             if 'supabase_service_role_client' not in st.session_state:
-                st.error("Supabase service role client not initialized.")
+                ui.error("Supabase service role client not initialized.")
                 return None
             supabase_target_client = st.session_state['supabase_service_role_client']
-            print("DEBUG (upload_file_to_supabase): Using service role client for hardcoded admin upload.")
+            logger.debug("Using service role client for hardcoded admin upload.")
         else:
             if 'supabase_client' not in st.session_state:
-                st.error("Supabase client not initialized.")
+                ui.error("Supabase client not initialized.")
                 return None
             supabase_target_client = st.session_state['supabase_client']
-            print("DEBUG (upload_file_to_supabase): Using regular client for user upload.")
+            logger.debug("Using regular client for user upload.")
 
         # Perform the upload.
         # This is the most robust way to handle varying response types:
@@ -1026,18 +1872,18 @@ def upload_file_to_supabase(file_bytes, file_name, user_uid):
         if isinstance(response, dict) and response.get("error"):
             error_obj = response["error"]
             error_message = error_obj.get("message", "Unknown error from dict response") if isinstance(error_obj, dict) else str(error_obj)
-            st.error(f"Supabase Storage upload failed (dict error): {error_message}")
-            print(f"ERROR (upload_file_to_supabase): Upload failed (dict error): {error_message}")
+            ui.error(f"Supabase Storage upload failed (dict error): {error_message}")
+            logger.error("Upload failed (dict error): %s", error_message)
             return None
         elif hasattr(response, 'error') and response.error:
             error_message = response.error.message if hasattr(response.error, 'message') else "Unknown error from attribute error"
-            st.error(f"Supabase Storage upload failed (attribute error): {error_message}")
-            print(f"ERROR (upload_file_to_supabase): Upload failed (attribute error): {error_message}")
+            ui.error(f"Supabase Storage upload failed (attribute error): {error_message}")
+            logger.error("Upload failed (attribute error): %s", error_message)
             return None
         elif not hasattr(response, 'data') or not response.data:
             # This covers cases where there's no explicit error, but also no data (indicating failure)
-            st.error("Supabase Storage upload failed: No data returned and no explicit error.")
-            print(f"ERROR (upload_file_to_supabase): Upload failed: Unexpected response structure - {response}")
+            ui.error("Supabase Storage upload failed: No data returned and no explicit error.")
+            logger.error("Upload failed: Unexpected response structure - %s", response)
             return None
         else:
             # Upload was successful, now get the public URL
@@ -1048,17 +1894,17 @@ def upload_file_to_supabase(file_bytes, file_name, user_uid):
             if isinstance(public_url_response, dict) and public_url_response.get("error"):
                 error_obj = public_url_response["error"]
                 error_message = error_obj.get("message", "Unknown error from dict response") if isinstance(error_obj, dict) else str(error_obj)
-                st.error(f"Failed to get public URL (dict error): {error_message}")
-                print(f"ERROR (upload_file_to_supabase): Failed to get public URL (dict error): {error_message}")
+                ui.error(f"Failed to get public URL (dict error): {error_message}")
+                logger.error("Failed to get public URL (dict error): %s", error_message)
                 return None
             elif hasattr(public_url_response, 'error') and public_url_response.error:
                 error_message = public_url_response.error.message if hasattr(public_url_response.error, 'message') else "Unknown error from attribute error"
-                st.error(f"Failed to get public URL (attribute error): {error_message}")
-                print(f"ERROR (upload_file_to_supabase): Failed to get public URL (attribute error): {error_message}")
+                ui.error(f"Failed to get public URL (attribute error): {error_message}")
+                logger.error("Failed to get public URL (attribute error): %s", error_message)
                 return None
             elif not hasattr(public_url_response, 'data') or not public_url_response.data:
-                st.error("Public URL data not found in Supabase response.")
-                print(f"ERROR (upload_file_to_supabase): Public URL response missing data: {public_url_response}")
+                ui.error("Public URL data not found in Supabase response.")
+                logger.error("Public URL response missing data: %s", public_url_response)
                 return None
             else:
                 # The public URL is typically in the 'data' attribute of the public_url_response object
@@ -1069,35 +1915,38 @@ def upload_file_to_supabase(file_bytes, file_name, user_uid):
                 elif isinstance(public_url_response.data, dict) and 'publicUrl' in public_url_response.data:
                     return public_url_response.data['publicUrl']
                 else:
-                    st.error("Could not extract public URL from Supabase response (unexpected data type).")
-                    print(f"ERROR (upload_file_to_supabase): Unexpected public URL response data type: {public_url_response.data}")
+                    ui.error("Could not extract public URL from Supabase response (unexpected data type).")
+                    logger.error("Unexpected public URL response data type: %s", public_url_response.data)
                     return None
 
     except Exception as e:
-        st.error(f"An unexpected error occurred during file upload to Supabase Storage: {e}")
-        print(f"ERROR (upload_file_to_supabase): Unexpected error: {e}")
+        ui.error(f"An unexpected error occurred during file upload to Supabase Storage: {e}")
+        logger.error("Unexpected error: %s", e)
         return None
 
-def delete_file_from_supabase_storage(file_path_in_storage, user_uid_for_deletion_check):
+def delete_file_from_supabase_storage(file_path_in_storage, user_uid_for_deletion_check, supabase_target_client=None, ui=st):
     """
     Deletes a file from Supabase Storage.
     Uses service_role client if user_uid_for_deletion_check is 'admin_special_uid'.
+    Callers without a Streamlit session (background jobs) pass supabase_target_client explicitly.
     """
     try:
         bucket_name = "app-files" # Ensure this bucket exists in your Supabase Storage
 
-        if user_uid_for_deletion_check == "admin_special_uid":
+        if supabase_target_client is not None:
+            logger.debug("Using client provided by caller.")
+        elif user_uid_for_deletion_check == "admin_special_uid":
             if 'supabase_service_role_client' not in st.session_state:
-                st.error("Supabase service role client not initialized for deletion.")
+                ui.error("Supabase service role client not initialized for deletion.")
                 return False
             supabase_target_client = st.session_state['supabase_service_role_client']
-            print("DEBUG (delete_file_from_supabase_storage): Using service role client for admin deletion.")
+            logger.debug("Using service role client for admin deletion.")
         else:
             if 'supabase_client' not in st.session_state:
-                st.error("Supabase client not initialized for deletion.")
+                ui.error("Supabase client not initialized for deletion.")
                 return False
             supabase_target_client = st.session_state['supabase_client']
-            print("DEBUG (delete_file_from_supabase_storage): Using regular client for user deletion.")
+            logger.debug("Using regular client for user deletion.")
 
         # Perform the removal. The remove method expects a list of file paths.
         # This is the most robust way to handle varying response types:
@@ -1107,135 +1956,272 @@ def delete_file_from_supabase_storage(file_path_in_storage, user_uid_for_deletio
         if isinstance(response, dict) and response.get("error"):
             error_obj = response["error"]
             error_message = error_obj.get("message", "Unknown error from dict response") if isinstance(error_obj, dict) else str(error_obj)
-            st.error(f"Supabase Storage deletion failed (dict error): {error_message}")
-            print(f"ERROR (delete_file_from_supabase_storage): Deletion failed (dict error): {error_message}")
+            ui.error(f"Supabase Storage deletion failed (dict error): {error_message}")
+            logger.error("Deletion failed (dict error): %s", error_message)
             return False
         elif hasattr(response, 'error') and response.error:
             error_message = response.error.message if hasattr(response.error, 'message') else "Unknown error from attribute error"
-            st.error(f"Supabase Storage deletion failed (attribute error): {error_message}")
-            print(f"ERROR (delete_file_from_supabase_storage): Deletion failed (attribute error): {error_message}")
+            ui.error(f"Supabase Storage deletion failed (attribute error): {error_message}")
+            logger.error("Deletion failed (attribute error): %s", error_message)
             return False
         elif not hasattr(response, 'data') or not response.data:
             # This covers cases where there's no explicit error, but also no data (indicating failure)
-            st.error("Supabase Storage deletion failed: No data returned and no explicit error.")
-            print(f"ERROR (delete_file_from_supabase_storage): Deletion failed: Unexpected response structure - {response}")
+            ui.error("Supabase Storage deletion failed: No data returned and no explicit error.")
+            logger.error("Deletion failed: Unexpected response structure - %s", response)
             return False
         else:
             # If no error, the deletion was successful.
             # The 'data' attribute might contain a list of objects with 'name' and 'id' of deleted files.
-            print(f"DEBUG (delete_file_from_supabase_storage): File(s) successfully deleted: {response.data}")
+            logger.debug("File(s) successfully deleted: %s", response.data)
             return True
 
     except Exception as e:
-        st.error(f"An unexpected error occurred during file deletion from Supabase Storage: {e}")
-        print(f"ERROR (delete_file_from_supabase_storage): Unexpected error: {e}")
+        ui.error(f"An unexpected error occurred during file deletion from Supabase Storage: {e}")
+        logger.error("Unexpected error: %s", e)
         return False
         
-def save_report_on_download(filename, docx_buffer, ai_result, jd_original_name, cv_original_names):
-    """Saves the report to Supabase Storage and 'jd_cv_reports' table metadata."""
-    st.info("Attempting to save report to cloud... (This message will disappear shortly)")
-    print("DEBUG (save_report_on_download): Function started. User UID:", st.session_state.get('user_uid', 'N/A'))
+def get_current_user_context():
+    """
+    Captures the logged-in user's identity and Supabase clients from session state, so work that
+    outlives the current script run (background analysis jobs) can act on the user's behalf.
+    """
+    return {
+        "user_uid": st.session_state['user_uid'],
+        "user_email": st.session_state['user_email'],
+        "user_name": st.session_state['user_name'],
+        "is_admin": st.session_state['is_admin'],
+        "supabase_client": st.session_state.get('supabase_client'),
+        "supabase_service_role_client": st.session_state.get('supabase_service_role_client'),
+    }
 
-    if supabase is None:
-        st.error("Application error: Supabase client not available for saving.")
-        print("ERROR (save_report_on_download): Supabase client is None. Cannot save report.")
-        return
+def save_report_on_download(filename, docx_buffer, ai_result, jd_original_name, cv_original_names, user_context=None, ui=st, ai_usage=None):
+    """
+    Saves the report to Supabase Storage and 'jd_cv_reports' table metadata.
+    user_context defaults to the logged-in user (see get_current_user_context).
+    ai_usage (see get_comparative_ai_analysis) is stored in the row's ai_* columns.
+    Returns the report's download URL, or None if saving failed.
+    """
+    if user_context is None:
+        user_context = get_current_user_context()
+    user_uid = user_context['user_uid']
+    ui.info("Attempting to save report to cloud... (This message will disappear shortly)")
+    logger.debug("Function started. User UID: %s", user_uid)
+
+    # ADDED: Use service_role client for hardcoded admin to upload and insert report metadata
+    if user_uid == "admin_special_uid":
+        supabase_target_client = user_context['supabase_service_role_client']
+    else:
+        supabase_target_client = user_context['supabase_client']
 
-    storage_file_path = f"jd_cv_reports/{st.session_state['user_uid']}/{filename}"
+    if supabase_target_client is None:
+        ui.error("Application error: Supabase client not available for saving.")
+        logger.error("Supabase client is None. Cannot save report.")
+        return None
+
+    storage_file_path = f"jd_cv_reports/{user_uid}/{filename}"
     download_url = None
 
     try:
-        print(f"DEBUG (save_report_on_download): Attempting to upload file to Storage at: {storage_file_path}")
+        logger.debug("Attempting to upload file to Storage at: %s", storage_file_path)
         docx_buffer.seek(0)
         file_bytes = docx_buffer.getvalue()
-        # MODIFIED: Pass user_uid to upload_file_to_supabase to determine client
-        download_url = upload_file_to_supabase(file_bytes, filename, st.session_state['user_uid'])
+        download_url = upload_file_to_supabase(file_bytes, filename, user_uid, supabase_target_client=supabase_target_client, ui=ui)
 
         if download_url:
-            st.success(f"File uploaded to Supabase Storage successfully! URL: {download_url}")
-            print(f"DEBUG (save_report_on_download): File uploaded to Storage. Public URL: {download_url}")
+            ui.success(f"File uploaded to Supabase Storage successfully! URL: {download_url}")
+            logger.debug("File uploaded to Storage. Public URL: %s", download_url)
 
             report_metadata = {
-                "user_email": st.session_state['user_email'],
-                "user_name": st.session_state['user_name'],
-                "user_uid": st.session_state['user_uid'],
+                "user_email": user_context['user_email'],
+                "user_name": user_context['user_name'],
+                "user_uid": user_uid,
                 "jd_filename": jd_original_name,
                 "cv_filenames": json.dumps(cv_original_names), # Store list as JSON string
                 "review_date": datetime.now().isoformat(), # Use ISO format for Supabase timestamp
                 "outputdocfilename": filename, # Changed to lowercase 'outputdocfilename'
                 "outputdocurl": download_url, # Changed to lowercase 'outputdocurl'
-                "summary": ai_result.get("final_shortlist_recommendation", "No summary provided.")
+                "summary": ai_result.get("final_shortlist_recommendation", "No summary provided."),
+                "comparative_data": ai_result # Full structured result (JSONB), used by the in-app report viewer
             }
-            print(f"DEBUG (save_report_on_download): Prepared Supabase table metadata: {report_metadata}")
+            if ai_usage:
+                # Rolled up by the admin AI usage page (see ai_usage_rollup in supabase/migrations)
+                report_metadata.update({
+                    "ai_model": ai_usage['model'],
+                    "ai_prompt_tokens": ai_usage['prompt_tokens'],
+                    "ai_completion_tokens": ai_usage['completion_tokens'],
+                    "ai_cached_tokens": ai_usage['cached_tokens'],
+                    "ai_seconds": round(ai_usage['seconds'], 3),
+                })
+            logger.debug("Prepared Supabase table metadata for %s (%s bytes of structured results).", filename, len(json.dumps(ai_result)))
 
             try:
-                print("DEBUG (save_report_on_download): About to attempt saving metadata to Supabase table 'jd_cv_reports'...")
-                # ADDED: Use service_role client for hardcoded admin to insert report metadata
-                if st.session_state['user_uid'] == "admin_special_uid":
-                    print("DEBUG (save_report_on_download): Using service role client for admin metadata insert.")
-                    response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').insert(report_metadata).execute()
-                else:
-                    print("DEBUG (save_report_on_download): Using regular client for user metadata insert.")
-                    response = supabase.table('jd_cv_reports').insert(report_metadata).execute()
+                logger.debug("About to attempt saving metadata to Supabase table 'jd_cv_reports'...")
+                response = supabase_target_client.table('jd_cv_reports').insert(report_metadata).execute()
 
                 if response.data:
-                    st.success("Report metadata saved to Supabase successfully!")
-                    print("DEBUG (save_report_on_download): Report metadata successfully added to Supabase.")
+                    ui.success("Report metadata saved to Supabase successfully!")
+                    logger.debug("Report metadata successfully added to Supabase.")
+                    return download_url
                 else:
-                    st.error(f"Supabase metadata save failed: {response.json()}")
-                    print(f"ERROR (save_report_on_download): Supabase metadata save failed: {response.json()}")
-                    if download_url:
-                        # MODIFIED: Pass user_uid to delete_file_from_supabase_storage
-                        delete_file_from_supabase_storage(storage_file_path, st.session_state['user_uid'])
-                        print("DEBUG: Deleted file from Storage due to metadata save failure.")
+                    ui.error(f"Supabase metadata save failed: {response.json()}")
+                    logger.error("Supabase metadata save failed: %s", response.json())
+                    delete_file_from_supabase_storage(storage_file_path, user_uid, supabase_target_client=supabase_target_client, ui=ui)
+                    logger.debug("Deleted file from Storage due to metadata save failure.")
 
             except Exception as generic_e: # Catching general Exception
-                st.error(f"An unexpected error occurred during Supabase metadata save: {generic_e}.")
-                print(f"ERROR (save_report_on_download): Generic error during Supabase metadata save: {generic_e}")
-                if download_url:
-                    # MODIFIED: Pass user_uid to delete_file_from_supabase_storage
-                    delete_file_from_supabase_storage(storage_file_path, st.session_state['user_uid'])
-                    print("DEBUG: Deleted file from Storage due to generic metadata save failure.")
+                ui.error(f"An unexpected error occurred during Supabase metadata save: {generic_e}.")
+                logger.error("Generic error during Supabase metadata save: %s", generic_e)
+                delete_file_from_supabase_storage(storage_file_path, user_uid, supabase_target_client=supabase_target_client, ui=ui)
+                logger.debug("Deleted file from Storage due to generic metadata save failure.")
         else:
-            st.error("File upload to Supabase Storage failed, so metadata was not saved.")
+            ui.error("File upload to Supabase Storage failed, so metadata was not saved.")
 
     except Exception as e: # Catching general Exception
-        st.error(f"Error during report upload or initial setup: {e}")
-        print(f"ERROR (save_report_on_download): Overall error in function (Storage upload or initial setup): {e}")
+        ui.error(f"Error during report upload or initial setup: {e}")
+        logger.error("Overall error in function (Storage upload or initial setup): %s", e)
 
-    finally:
-        pass
+    return None
+
+# Columns shown in the report list; comparative_data is only fetched for the report being viewed
+REPORT_LIST_COLUMNS = "id, outputdocfilename, jd_filename, cv_filenames, review_date, summary, outputdocurl"
+
+def fetch_reports_page(reports_client, columns, page_size, cursor=None, user_uid=None, date_from=None, date_to=None, jd_name=None, user_email=None):
+    """
+    Fetches one page of jd_cv_reports, newest first, with all filtering, ordering and paging done by the database.
+    Uses keyset pagination on (review_date, id): cursor is the (review_date, id) of the last row of the previous
+    page, so every page costs the same index range scan however deep it is. Returns (rows, next_cursor), where
+    next_cursor is None on the last page.
+    """
+    query = reports_client.table('jd_cv_reports').select(columns)
+    if user_uid:
+        query = query.eq('user_uid', user_uid)
+    if user_email:
+        query = query.ilike('user_email', f"%{user_email}%")
+    if date_from:
+        query = query.gte('review_date', date_from.isoformat())
+    if date_to:
+        query = query.lt('review_date', (date_to + timedelta(days=1)).isoformat())
+    if jd_name:
+        query = query.ilike('jd_filename', f"%{jd_name}%")
+    if cursor:
+        cursor_date, cursor_id = cursor
+        query = query.or_(f'review_date.lt."{cursor_date}",and(review_date.eq."{cursor_date}",id.lt."{cursor_id}")')
+    # One extra row tells whether another page follows, without a COUNT(*) over the table
+    response = query.order('review_date', desc=True).order('id', desc=True).limit(page_size + 1).execute()
+    rows = response.data or []
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]['review_date'], rows[-1]['id'])
+    return rows, next_cursor
+
+def get_report_page_cursor(pager_key, filters, page_size):
+    """
+    Returns the keyset cursor of the page currently shown by a paged report list. The pager keeps the
+    cursors of the pages visited so far in session state and starts over when the filters change.
+    """
+    pager_filters = dict(filters, page_size=page_size)
+    pager = st.session_state.get(pager_key)
+    if pager is None or pager['filters'] != pager_filters:
+        pager = {"filters": pager_filters, "cursors": [None]}
+        st.session_state[pager_key] = pager
+    return pager['cursors'][-1]
+
+def render_report_page_navigation(pager_key, next_cursor):
+    """Shows Previous/Next buttons for a paged report list (see get_report_page_cursor)."""
+    pager = st.session_state[pager_key]
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    if col_prev.button("⬅️ Previous", key=f"{pager_key}_prev", disabled=len(pager['cursors']) == 1):
+        pager['cursors'].pop()
+        st.rerun()
+    col_page.markdown(f"<div style='text-align: center;'>Page {len(pager['cursors'])}</div>", unsafe_allow_html=True)
+    if col_next.button("Next ➡️", key=f"{pager_key}_next", disabled=next_cursor is None):
+        pager['cursors'].append(next_cursor)
+        st.rerun()
+
+def render_saved_report_viewer(reports_client, reports):
+    """
+    Lets the user open one of the listed reports in the app. Its tables are rendered from the stored
+    comparative_data, and a DOCX in the current layout can be downloaded without another AI call.
+    """
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>View a Report</h3>", unsafe_allow_html=True)
+    reports_by_id = {report['id']: report for report in reports}
+    selected_report_id = st.selectbox(
+        "Report",
+        list(reports_by_id.keys()),
+        format_func=lambda report_id: f"{reports_by_id[report_id].get('outputdocfilename', 'N/A')} ({reports_by_id[report_id].get('jd_filename', 'N/A')})",
+        key="view_report_select"
+    )
+    if st.button("Open Report", key="open_report_button"):
+        try:
+            response = reports_client.table('jd_cv_reports').select('comparative_data').eq('id', selected_report_id).single().execute()
+            st.session_state['viewed_report'] = {"id": selected_report_id, "comparative_data": (response.data or {}).get('comparative_data')}
+            logger.debug("Loaded structured results of report %s.", selected_report_id)
+        except Exception as e:
+            st.error(f"Error loading the report: {e}")
+            logger.error("Error loading report %s: %s", selected_report_id, e)
+            return
+
+    viewed_report = st.session_state['viewed_report']
+    if not viewed_report or viewed_report['id'] not in reports_by_id:
+        return
+    report = reports_by_id[viewed_report['id']]
+    comparative_data = viewed_report['comparative_data']
+    if not comparative_data:
+        st.info("This report was saved before structured results were stored. Use its download link to open the DOCX.")
+        return
+
+    render_comparative_results(comparative_data)
+    cv_filenames = json.loads(report.get('cv_filenames') or '[]') if isinstance(report.get('cv_filenames'), str) else (report.get('cv_filenames') or [])
+    st.download_button(
+        label="Download DOCX (current layout) ⬇️",
+        data=lambda: _render_report_for_download(comparative_data, report.get('jd_filename', 'Job Description'), cv_filenames),
+        file_name=report.get('outputdocfilename') or "JD-CV_Comparison_Analysis.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        key="download_saved_report_docx"
+    )
 
 def review_reports_page():
     """Displays a table of past reports fetched from Supabase for the current user."""
+    import pandas as pd
     st.markdown("<h1 style='color: #0D47A1 !important;'>📚 Review Your Past Reports</h1>", unsafe_allow_html=True)
     st.write("Here you can find a history of your AI-generated comparative analysis reports.")
-    print("DEBUG (review_reports_page): Displaying review reports page.")
+    logger.debug("Displaying review reports page.")
 
     if not st.session_state['logged_in'] or not st.session_state['user_uid'] or supabase is None:
         st.info("Please log in to view your past reports.")
         if supabase is None:
-            print("ERROR: review_reports_page called but 'supabase' is None.")
+            logger.error("review_reports_page called but 'supabase' is None.")
         else:
-            print("DEBUG (review_reports_page): User not logged in, cannot fetch reports.")
+            logger.debug("User not logged in, cannot fetch reports.")
         return
 
+    with st.form("review_reports_filters"):
+        col1, col2, col3, col4 = st.columns([1, 1, 2, 1])
+        date_from = col1.date_input("From", value=None, key="reports_filter_date_from")
+        date_to = col2.date_input("To", value=None, key="reports_filter_date_to")
+        jd_name = col3.text_input("Job Description name contains", key="reports_filter_jd_name")
+        page_size = col4.selectbox("Per page", [25, 50, 100], key="reports_filter_page_size")
+        st.form_submit_button("Apply Filters")
+
     try:
-        print(f"DEBUG (review_reports_page): Fetching reports for UID: {st.session_state['user_uid']}")
+        logger.debug("Fetching reports for UID: %s", st.session_state['user_uid'])
         # ADDED: Determine which client to use for fetching reports
         if st.session_state['user_uid'] == "admin_special_uid":
             # Hardcoded admin can view all reports using service_role client
-            response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').select('*').execute()
-            print("DEBUG (review_reports_page): Admin viewing all reports using service role client.")
+            reports_client = st.session_state['supabase_service_role_client']
+            owner_uid = None
+            logger.debug("Admin viewing all reports using service role client.")
         else:
             # Regular user views only their own reports (RLS applies)
-            response = supabase.table('jd_cv_reports').select('*').eq('user_uid', st.session_state['user_uid']).execute()
-            print("DEBUG (review_reports_page): User viewing own reports using regular client.")
+            reports_client = supabase
+            owner_uid = st.session_state['user_uid']
+            logger.debug("User viewing own reports using regular client.")
 
-        reviews_data = response.data if response.data else []
-
-        # Sort by review_date in descending order (assuming review_date is ISO format string)
-        reviews_data.sort(key=lambda x: x.get('review_date', ''), reverse=True)
+        filters = {"user_uid": owner_uid, "date_from": date_from, "date_to": date_to, "jd_name": jd_name.strip()}
+        cursor = get_report_page_cursor('review_reports_pager', filters, page_size)
+        reviews_data, next_cursor = fetch_reports_page(reports_client, REPORT_LIST_COLUMNS, page_size, cursor=cursor, **filters)
 
         processed_reviews_data = []
         for report in reviews_data:
@@ -1251,7 +2237,7 @@ def review_reports_page():
             })
 
         if processed_reviews_data:
-            print(f"DEBUG (review_reports_page): Found {len(processed_reviews_data)} reports.")
+            logger.debug("Showing %s reports.", len(processed_reviews_data))
             df = pd.DataFrame(processed_reviews_data)
             st.dataframe(df,
                          column_config={
@@ -1259,38 +2245,133 @@ def review_reports_page():
                          },
                          hide_index=True,
                          use_container_width=True)
-        else:
+            render_report_page_navigation('review_reports_pager', next_cursor)
+            render_saved_report_viewer(reports_client, reviews_data)
+        elif cursor is None and not any([date_from, date_to, jd_name.strip()]):
             st.info("No reports found yet for your account. Start by uploading JD & CVs!")
-            print("DEBUG (review_reports_page): No reports found for this user.")
+            logger.debug("No reports found for this user.")
+        else:
+            st.info("No reports match these filters.")
+            render_report_page_navigation('review_reports_pager', next_cursor)
     except Exception as e: # Catching general Exception
         st.error(f"Error fetching your review reports: {e}")
-        print(f"ERROR (review_reports_page): Error fetching reports: {e}")
+        logger.error("Error fetching reports: %s", e)
 
 
 # --- Admin Pages ---
 def admin_dashboard_page():
     """Admin dashboard overview."""
+    import pandas as pd
     st.markdown("<h1 style='color: #0D47A1 !important;'>⚙️ Admin Dashboard</h1>", unsafe_allow_html=True)
     st.write("Welcome to the Admin Panel. From here you can manage users and all generated reports.")
     st.info("Use the sidebar navigation to access User Management, Report Management, or Invite New Member.")
-    print("DEBUG (admin_dashboard_page): Displaying admin dashboard.")
+    logger.debug("Displaying admin dashboard.")
+
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Extraction Cache</h3>", unsafe_allow_html=True)
+    cache_stats = get_extraction_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", cache_stats['hits'])
+    col2.metric("Misses", cache_stats['misses'])
+    col3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    col4.metric("Size", f"{cache_stats['size_bytes'] / (1024 * 1024):.1f} / {cache_stats['max_bytes'] / (1024 * 1024):.0f} MB")
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>AI Result Cache</h3>", unsafe_allow_html=True)
+    result_cache_stats = get_analysis_result_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", result_cache_stats['hits'])
+    col2.metric("Misses", result_cache_stats['misses'])
+    col3.metric("Hit Rate", f"{result_cache_stats['hit_rate']:.0%}")
+    col4.metric("Entries", f"{result_cache_stats['entries']} / {result_cache_stats['max_entries']}")
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>OpenAI Rate Limiting</h3>", unsafe_allow_html=True)
+    limiter_stats = get_openai_rate_limiter().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requests (OK / Failed)", f"{limiter_stats['requests']} ({limiter_stats['succeeded']} / {limiter_stats['failed']})")
+    col2.metric("Throttled", limiter_stats['throttled'], help=f"Total time spent waiting for rate limits: {limiter_stats['throttle_wait_seconds']:.1f}s")
+    col3.metric("Retries (429s)", f"{limiter_stats['retries']} ({limiter_stats['rate_limit_errors']})")
+    col4.metric("In Flight", f"{limiter_stats['in_flight']} / {limiter_stats['max_concurrency']}")
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Worker Pool</h3>", unsafe_allow_html=True)
+    pool_stats = get_worker_pool().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Workers", pool_stats['workers'])
+    col2.metric("Queue Depth", pool_stats['queue_depth'])
+    col3.metric("In Flight", f"{pool_stats['in_flight']} / {pool_stats['max_pending']}")
+    col4.metric("Completed / Failed", f"{pool_stats['completed']} / {pool_stats['failed']}")
+    if pool_stats['timings']:
+        st.dataframe(pd.DataFrame(pool_stats['timings']), use_container_width=True, hide_index=True)
+    else:
+        st.info("No extraction or rendering jobs have run yet.")
+
+def run_user_deletion(user_uid, user_email):
+    """
+    Runs (or resumes) the deletion cascade of a user with a progress bar.
+    Returns True when the user and all their data are gone.
+    """
+    progress_bar = st.progress(0.0, text=f"Deleting {user_email}...")
+    try:
+        record = delete_user_cascade(
+            st.session_state['supabase_service_role_client'],
+            user_uid,
+            user_email,
+            on_progress=lambda fraction, message: progress_bar.progress(fraction, text=message)
+        )
+    except UserDeletionInProgress as e:
+        st.warning(f"{e} Wait for it to finish before trying again.")
+        return False
+    except Exception as e:
+        st.error(f"Deleting {user_email} stopped: {e}. The steps already done are kept; use 'Resume' under Unfinished User Deletions to finish it.")
+        logger.error("Deletion of %s stopped: %s", user_email, e)
+        return False
+    st.success(f"User {user_email} and all their associated data ({record['files_deleted']} report file(s)) deleted successfully.")
+    logger.info("User %s fully deleted.", user_email)
+    return True
+
+
+def render_unfinished_user_deletions():
+    """Lists user deletions that failed or were interrupted, with a button to resume each one."""
+    unfinished = get_user_deletion_store().list_unfinished(config.USER_DELETION_STALE_SECONDS)
+    if not unfinished:
+        return
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Unfinished User Deletions</h3>", unsafe_allow_html=True)
+    for record in unfinished:
+        remaining_steps = [STEP_LABELS[step] for step in DELETION_STEPS if step not in record['completed_steps']]
+        info_col, button_col = st.columns([4, 1])
+        with info_col:
+            st.write(
+                f"**{record['user_email']}** — {record['status']} since {record['updated_at'][:16].replace('T', ' ')}; "
+                f"{record['files_deleted']} of {record['files_total']} file(s) deleted. Remaining: {', '.join(remaining_steps)}."
+            )
+            if record['error']:
+                st.caption(f"Last error: {record['error']}")
+        with button_col:
+            if st.button("Resume", key=f"resume_user_deletion_{record['user_uid']}"):
+                with info_col:
+                    if run_user_deletion(record['user_uid'], record['user_email']):
+                        time.sleep(1)
+                        st.rerun()
+
 
 def admin_user_management_page():
     """Admin page to manage users."""
+    import pandas as pd
     st.markdown("<h1 style='color: #0D47A1 !important;'>👥 Admin: User Management</h1>", unsafe_allow_html=True)
     st.write("View, manage roles, or delete users.")
-    print("DEBUG (admin_user_management_page): Displaying user management page.")
+    logger.debug("Displaying user management page.")
 
     if st.session_state['supabase_service_role_client'] is None: # MODIFIED: Use service client for admin pages
-        print("ERROR: admin_user_management_page called but 'supabase_service_role_client' is None.")
+        logger.error("admin_user_management_page called but 'supabase_service_role_client' is None.")
         st.error("Application error: Database connection not established. Please refresh or contact support.")
         return
 
     users_data = []
     try:
-        print(f"DEBUG (admin_user_management_page): Fetching all users from Supabase 'users' table using service role client.")
+        logger.debug("Fetching all users from Supabase 'users' table using service role client.")
         # MODIFIED: Use service_role client
-        response = st.session_state['supabase_service_role_client'].table('users').select('*').execute()
+        with track_admin_query("list_users"):
+            response = st.session_state['supabase_service_role_client'].table('users').select('*').execute()
         users_from_db = response.data if response.data else []
 
         for user_info in users_from_db:
@@ -1302,7 +2383,7 @@ def admin_user_management_page():
             })
 
         if users_data:
-            print(f"DEBUG (admin_user_management_page): Found {len(users_data)} users.")
+            logger.debug("Found %s users.", len(users_data))
             df_users = pd.DataFrame(users_data)
             st.dataframe(df_users, use_container_width=True, hide_index=True)
 
@@ -1317,7 +2398,7 @@ def admin_user_management_page():
                 if st.button("Toggle Admin Status", key="toggle_admin_button"):
                     if user_email_toggle:
                         try:
-                            print(f"DEBUG (admin_user_management_page): Toggling admin status for {user_email_toggle}.")
+                            logger.debug("Toggling admin status for %s.", user_email_toggle)
                             # MODIFIED: Fetch user from Supabase Auth to get UID using admin client
                             auth_user_response = st.session_state['supabase_service_role_client'].auth.admin.get_user_by_email(user_email_toggle)
                             user_record = auth_user_response.user
@@ -1330,20 +2411,20 @@ def admin_user_management_page():
 
                                 if user_record.id == st.session_state['user_uid'] and current_admin_status:
                                     st.error("You cannot revoke your own administrator privileges.")
-                                    print("DEBUG (admin_user_management_page): Self-revocation attempt blocked.")
+                                    logger.debug("Self-revocation attempt blocked.")
                                 else:
                                     # MODIFIED: Update 'isadmin' in the 'users' table using service client
                                     st.session_state['supabase_service_role_client'].table('users').update({'isadmin': not current_admin_status}).eq('id', user_record.id).execute()
                                     st.success(f"Admin status for {user_email_toggle} toggled to {not current_admin_status}.")
-                                    print(f"DEBUG (admin_user_management_page): Admin status for {user_email_toggle} set to {not current_admin_status}.")
+                                    logger.info("Admin status for %s set to %s.", user_email_toggle, not current_admin_status)
                                     time.sleep(1)
                                     st.rerun()
                             else:
                                 st.error("User not found in Supabase Auth.")
-                                print(f"ERROR (admin_user_management_page): User {user_email_toggle} not found in Supabase Auth.")
+                                logger.error("User %s not found in Supabase Auth.", user_email_toggle)
                         except Exception as e: # Catching general Exception
                             st.error(f"Error toggling admin status: {e}")
-                            print(f"ERROR (admin_user_management_page): Error toggling: {e}")
+                            logger.error("Error toggling: %s", e)
                     else:
                         st.warning("Please enter a user email to toggle admin status.")
 
@@ -1354,160 +2435,393 @@ def admin_user_management_page():
                     if user_email_delete:
                         if user_email_delete == st.session_state['user_email']:
                             st.error("You cannot delete your own admin account!")
-                            print("DEBUG (admin_user_management_page): Self-deletion attempt blocked.")
+                            logger.debug("Self-deletion attempt blocked.")
                         else:
                             try:
-                                print(f"DEBUG (admin_user_management_page): Deleting user {user_email_delete}.")
-                                # MODIFIED: Get user UID from Supabase Auth using admin client
+                                logger.debug("Deleting user %s.", user_email_delete)
+                                # Get user UID from Supabase Auth using admin client
                                 auth_user_response = st.session_state['supabase_service_role_client'].auth.admin.get_user_by_email(user_email_delete)
                                 user_record = auth_user_response.user
-                                user_uid_to_delete = user_record.id
-
-                                # MODIFIED: Delete associated files from Storage using service client
-                                # Need to fetch reports first to get file paths
-                                # MODIFIED: Use service_role client and lowercase column name
-                                reports_response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').select('outputdocfilename').eq('user_uid', user_uid_to_delete).execute()
-                                if reports_response.data:
-                                    for report_data in reports_response.data:
-                                        storage_file_path = f"jd_cv_reports/{user_uid_to_delete}/{report_data['outputdocfilename']}" # Changed to lowercase
-                                        # MODIFIED: Pass "admin_special_uid" to ensure service client is used for deletion
-                                        if delete_file_from_supabase_storage(storage_file_path, "admin_special_uid"):
-                                            print(f"DEBUG (admin_user_management_page): Deleted Storage file: {storage_file_path}.")
-                                        else:
-                                            st.warning(f"Could not delete storage file for {user_email_delete}: {report_data['outputdocfilename']}.")
-
-                                # MODIFIED: Delete reports from 'jd_cv_reports' table using service client
-                                st.session_state['supabase_service_role_client'].table('jd_cv_reports').delete().eq('user_uid', user_uid_to_delete).execute()
-                                print(f"DEBUG (admin_user_management_page): Deleted reports for user {user_email_delete} from 'jd_cv_reports' table.")
-
-                                # MODIFIED: Delete user from 'users' table using service client
-                                st.session_state['supabase_service_role_client'].table('users').delete().eq('id', user_uid_to_delete).execute()
-                                print(f"DEBUG (admin_user_management_page): Deleted user {user_email_delete} from 'users' table.")
-
-                                # MODIFIED: Delete user from Supabase Auth using admin client
-                                st.session_state['supabase_service_role_client'].auth.admin.delete_user(user_uid_to_delete)
-                                st.success(f"User {user_email_delete} and all their associated data deleted successfully.")
-                                print(f"DEBUG (admin_user_management_page): User {user_email_delete} fully deleted.")
-                                time.sleep(1)
-                                st.rerun()
+                                if run_user_deletion(user_record.id, user_email_delete):
+                                    time.sleep(1)
+                                    st.rerun()
                             except Exception as e: # Catching general Exception
                                 st.error(f"Error deleting user: {e}")
-                                print(f"ERROR (admin_user_management_page): Error deleting user: {e}")
+                                logger.error("Error deleting user: %s", e)
                     else:
                         st.warning("Please enter a user email to delete.")
 
+
+            render_unfinished_user_deletions()
+
         else:
             st.info("No users registered yet or error fetching users.")
-            print("DEBUG (admin_user_management_page): No users found or fetch error.")
+            logger.debug("No users found or fetch error.")
 
     except Exception as e:
         st.error(f"Error fetching users for admin management: {e}")
-        print(f"ERROR (admin_user_management_page): Error fetching users for admin management: {e}")
+        logger.error("Error fetching users for admin management: %s", e)
+
 
+# Columns of the admin report grid (and what bulk deletion needs to locate the storage files)
+ADMIN_REPORT_COLUMNS = "id, outputdocfilename, user_uid, user_name, user_email, jd_filename, cv_filenames, review_date, summary, outputdocurl"
+
+def delete_reports(reports, supabase_target_client, ui=st):
+    """
+    Deletes reports (rows with 'id', 'user_uid', 'outputdocfilename', 'jd_filename' and 'cv_filenames') with one
+    Storage remove([...]) call per STORAGE_REMOVE_BATCH_SIZE files and a single table delete filtered with in_ on
+    their IDs, then flags their CVs as deleted in the candidate search index.
+    Returns {'reports_deleted', 'files_deleted', 'seconds'}.
+    """
+    started = time.perf_counter()
+    storage_paths = [f"jd_cv_reports/{report['user_uid']}/{report['outputdocfilename']}" for report in reports if report.get('outputdocfilename')]
+    files_deleted = 0
+    for batch_start in range(0, len(storage_paths), config.STORAGE_REMOVE_BATCH_SIZE):
+        batch = storage_paths[batch_start:batch_start + config.STORAGE_REMOVE_BATCH_SIZE]
+        try:
+            removed = supabase_target_client.storage.from_("app-files").remove(batch)
+            removed = removed.data if hasattr(removed, 'data') else removed
+            files_deleted += len(removed or [])
+        except Exception as e:
+            ui.warning(f"Could not delete {len(batch)} report file(s) from Storage: {e}")
+            logger.error("Storage batch removal failed: %s", e)
+
+    response = supabase_target_client.table('jd_cv_reports').delete().in_('id', [report['id'] for report in reports]).execute()
+    reports_deleted = len(response.data or [])
+
+    # Keep the deleted reports' CVs out of the candidate search
+    try:
+        candidate_index = get_candidate_index()
+        for report in reports:
+            cv_filenames = json.loads(report.get('cv_filenames') or '[]') if isinstance(report.get('cv_filenames'), str) else (report.get('cv_filenames') or [])
+            candidate_index.remove_report(report['user_uid'], report.get('jd_filename'), cv_filenames)
+    except Exception as e:
+        ui.warning(f"Reports deleted, but their CVs could not be removed from the candidate search: {e}")
+        logger.error("Candidate index removal failed after deleting reports: %s", e)
+    seconds = time.perf_counter() - started
+    logger.info("Deleted %s report(s) and %s file(s) in %.2fs.", reports_deleted, files_deleted, seconds)
+    return {"reports_deleted": reports_deleted, "files_deleted": files_deleted, "seconds": seconds}
 
 def admin_report_management_page():
-    """Admin page to manage all reports."""
+    """Admin page to manage all reports: a paged, filterable grid with multi-select bulk deletion."""
+    import pandas as pd
     st.markdown("<h1 style='color: #0D47A1 !important;'>📊 Admin: Report Management</h1>", unsafe_allow_html=True)
     st.write("View and delete all AI-generated comparative analysis reports.")
-    print("DEBUG (admin_report_management_page): Displaying report management page.")
+    logger.debug("Displaying report management page.")
 
     if st.session_state['supabase_service_role_client'] is None: # MODIFIED: Use service client for admin pages
-        print("ERROR: admin_report_management_page called but 'supabase_service_role_client' is None.")
+        logger.error("admin_report_management_page called but 'supabase_service_role_client' is None.")
         st.error("Application error: Database connection not established. Please refresh or contact support.")
         return
+    service_client = st.session_state['supabase_service_role_client']
+
+    # Filters live in a form, so typing does not re-query until "Apply Filters" is pressed
+    with st.form("admin_reports_filters"):
+        col1, col2, col3, col4, col5 = st.columns([1, 1, 2, 2, 1])
+        date_from = col1.date_input("From", value=None, key="admin_reports_date_from")
+        date_to = col2.date_input("To", value=None, key="admin_reports_date_to")
+        jd_name = col3.text_input("Job Description name contains", key="admin_reports_jd_name")
+        user_email = col4.text_input("Uploader email contains", key="admin_reports_user_email")
+        page_size = col5.selectbox("Per page", [25, 50, 100], key="admin_reports_page_size")
+        st.form_submit_button("Apply Filters")
 
-    all_reports_data = []
     try:
-        print(f"DEBUG (admin_report_management_page): Fetching all reports from Supabase 'jd_cv_reports' table using service role client.")
-        # MODIFIED: Fetching all reports using service_role client
-        response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').select('*').execute()
-        all_reports_raw = response.data if response.data else []
-        all_reports_raw.sort(key=lambda x: x.get('review_date', ''), reverse=True)
-
-        for report_info in all_reports_raw:
-            cv_filenames = json.loads(report_info.get('cv_filenames', '[]')) if isinstance(report_info.get('cv_filenames'), str) else report_info.get('cv_filenames', [])
-            all_reports_data.append({
-                "Report ID": report_info.get('id', 'N/A'),
-                "Report Name": report_info.get('outputdocfilename', 'N/A'), # Changed to lowercase
-                "Uploaded By": report_info.get('user_name', 'N/A'),
-                "Uploader Email": report_info.get('user_email', 'N/A'),
-                "JD Filename": report_info.get('jd_filename', 'N/A'),
-                "CV Filenames": ", ".join(cv_filenames),
-                "Date Generated": datetime.fromisoformat(report_info['review_date']).strftime('%Y-%m-%d %H:%M:%S') if report_info.get('review_date') else 'N/A',
-                "Summary": report_info.get('summary', 'No summary provided.'),
-                "Download Link": report_info.get('outputdocurl', '') # Changed to lowercase
-            })
+        filters = {"date_from": date_from, "date_to": date_to, "jd_name": jd_name.strip(), "user_email": user_email.strip()}
+        cursor = get_report_page_cursor('admin_reports_pager', filters, page_size)
+        logger.debug("Fetching a page of reports (filters: %s).", filters)
+        with track_admin_query("list_reports"):
+            page_reports, next_cursor = fetch_reports_page(service_client, ADMIN_REPORT_COLUMNS, page_size, cursor=cursor, **filters)
+    except Exception as e: # Catching general Exception
+        st.error(f"Error fetching all reports for admin management: {e}")
+        logger.error("Error fetching reports: %s", e)
+        return
 
-        if all_reports_data:
-            print(f"DEBUG (admin_report_management_page): Found {len(all_reports_data)} reports.")
-            df = pd.DataFrame(all_reports_data)
-            st.dataframe(df,
-                         column_config={
-                             "Download Link": st.column_config.LinkColumn("Download File", display_text="⬇️ Download", help="Click to download the report file")
-                         },
-                         hide_index=True,
-                         use_container_width=True)
+    if not page_reports:
+        st.info("No reports found in the database." if cursor is None and not any(filters.values()) else "No reports match these filters.")
+        logger.debug("No reports found.")
+        if cursor is not None:
+            render_report_page_navigation('admin_reports_pager', next_cursor)
+        return
 
-            st.markdown("---")
-            st.markdown("<h3 style='color: #0D47A1 !important;'>Delete Report</h3>", unsafe_allow_html=True)
-            report_id_to_delete = st.text_input("Enter Report ID to Delete (from table above)", key="delete_report_id")
-
-            if st.button("Delete Report", key="delete_report_button"):
-                if report_id_to_delete:
-                    try:
-                        print(f"DEBUG (admin_report_management_page): Deleting report {report_id_to_delete}.")
-                        # MODIFIED: Fetch report data using service client
-                        # MODIFIED: Use service_role client and lowercase column name
-                        report_response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').select('outputdocfilename', 'user_uid').eq('id', report_id_to_delete).single().execute()
-                        report_data = report_response.data if report_response.data else None
-
-                        if report_data:
-                            storage_file_path = f"jd_cv_reports/{report_data['user_uid']}/{report_data['outputdocfilename']}" # Changed to lowercase
-
-                            # MODIFIED: Delete file from storage using service client
-                            # MODIFIED: Pass "admin_special_uid" to ensure service client is used for deletion
-                            if delete_file_from_supabase_storage(storage_file_path, "admin_special_uid"):
-                                st.success(f"File '{report_data['outputdocfilename']}' deleted from Storage.")
-                                print(f"DEBUG (admin_report_management_page): Deleted Storage file: {storage_file_path}.")
-                            else:
-                                st.warning(f"Could not delete storage file for report ID {report_id_to_delete}.")
+    all_reports_data = []
+    for report_info in page_reports:
+        cv_filenames = json.loads(report_info.get('cv_filenames', '[]')) if isinstance(report_info.get('cv_filenames'), str) else report_info.get('cv_filenames', [])
+        all_reports_data.append({
+            "Report ID": report_info.get('id', 'N/A'),
+            "Report Name": report_info.get('outputdocfilename', 'N/A'), # Changed to lowercase
+            "Uploaded By": report_info.get('user_name', 'N/A'),
+            "Uploader Email": report_info.get('user_email', 'N/A'),
+            "JD Filename": report_info.get('jd_filename', 'N/A'),
+            "CV Filenames": ", ".join(cv_filenames),
+            "Date Generated": datetime.fromisoformat(report_info['review_date']).strftime('%Y-%m-%d %H:%M:%S') if report_info.get('review_date') else 'N/A',
+            "Summary": report_info.get('summary', 'No summary provided.'),
+            "Download Link": report_info.get('outputdocurl', '') # Changed to lowercase
+        })
+
+    logger.debug("Showing %s reports.", len(all_reports_data))
+    st.caption("Select rows to delete them.")
+    grid_event = st.dataframe(pd.DataFrame(all_reports_data),
+                              column_config={
+                                  "Download Link": st.column_config.LinkColumn("Download File", display_text="⬇️ Download", help="Click to download the report file")
+                              },
+                              hide_index=True,
+                              use_container_width=True,
+                              on_select="rerun",
+                              selection_mode="multi-row",
+                              key="admin_reports_grid")
+    render_report_page_navigation('admin_reports_pager', next_cursor)
+
+    selected_reports = [page_reports[row] for row in grid_event.selection.rows]
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Delete Reports</h3>", unsafe_allow_html=True)
+    if not selected_reports:
+        st.info("Select one or more reports in the table above to delete them.")
+        return
 
-                            # MODIFIED: Delete report metadata from table using service client
-                            response = st.session_state['supabase_service_role_client'].table('jd_cv_reports').delete().eq('id', report_id_to_delete).execute()
-                            if response.data:
-                                st.success(f"Report '{report_id_to_delete}' deleted from Supabase table.")
-                                print(f"DEBUG (admin_report_management_page): Supabase table deletion successful: {report_id_to_delete}.") # Corrected log message
-                            else:
-                                st.error(f"Failed to delete report from Supabase table: {response.json()}")
-                                print(f"ERROR (admin_report_management_page): Supabase table deletion failed: {response.json()}")
+    confirm_delete = st.checkbox(f"I understand that the {len(selected_reports)} selected report(s) and their files will be permanently deleted.", key="confirm_delete_reports")
+    if st.button(f"Delete {len(selected_reports)} Selected Report(s)", key="delete_reports_button", disabled=not confirm_delete):
+        try:
+            with st.spinner(f"Deleting {len(selected_reports)} report(s)..."):
+                with track_admin_query("delete_reports"):
+                    outcome = delete_reports(selected_reports, service_client)
+            reports_per_second = outcome['reports_deleted'] / outcome['seconds'] if outcome['seconds'] else 0.0
+            st.success(
+                f"Deleted {outcome['reports_deleted']} report(s) and {outcome['files_deleted']} file(s) in {outcome['seconds']:.2f}s "
+                f"({reports_per_second:.1f} reports/s)."
+            )
+            if outcome['reports_deleted'] < len(selected_reports):
+                st.warning(f"{len(selected_reports) - outcome['reports_deleted']} report(s) were not deleted from the table (already deleted or blocked by policy).")
+        except Exception as e: # Catching general Exception
+            st.error(f"Error deleting reports: {e}. Ensure Storage path is correct and rules allow deletion.")
+            logger.error("Error during bulk report deletion: %s", e)
+            return
+        # Clear the row selection and confirmation, so they cannot carry over to the rows that move up
+        for widget_key in ('admin_reports_grid', 'confirm_delete_reports'):
+            st.session_state.pop(widget_key, None)
+        time.sleep(1)
+        st.rerun()
 
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error("Report with this ID not found.")
-                            print(f"ERROR (admin_report_management_page): Report {report_id_to_delete} not found.")
-                    except Exception as e: # Catching general Exception
-                        st.error(f"Error deleting report: {e}. Ensure Storage path is correct and rules allow deletion.")
-                        print(f"ERROR (admin_report_management_page): Error during report deletion for {report_id_to_delete}: {e}")
-                else:
-                    st.warning("Please enter a Report ID to delete.")
+def admin_candidate_search_page():
+    """Admin page to search every previously processed CV for matches to a job description."""
+    import pandas as pd
+    st.markdown("<h1 style='color: #0D47A1 !important;'>🔎 Candidate Search</h1>", unsafe_allow_html=True)
+    st.write("Search all CVs processed in past reviews for candidates matching a job description or a few keywords.")
+    logger.debug("Displaying candidate search page.")
+
+    candidate_index = get_candidate_index()
+    index_stats = candidate_index.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Indexed CVs", f"{index_stats['active']:,}")
+    col2.metric("Removed (awaiting compaction)", f"{index_stats['deleted']:,}")
+    col3.metric("Index Size", f"{index_stats['size_bytes'] / (1024 * 1024):.1f} MB")
+
+    with st.form("candidate_search_form"):
+        query_jd_file = st.file_uploader("Upload a Job Description (PDF, DOCX, TXT)", type=["pdf", "docx", "txt"], key="candidate_search_jd_uploader")
+        query_text = st.text_area("...or describe what you are looking for", placeholder="e.g. SAP HR consultant with payroll and SuccessFactors experience", key="candidate_search_query")
+        top_k = st.number_input("Number of matches", min_value=1, max_value=200, value=config.CANDIDATE_SEARCH_TOP_K, key="candidate_search_top_k")
+        search_submitted = st.form_submit_button("Search")
+
+    if search_submitted:
+        if query_jd_file:
+            query_text = get_file_content(query_jd_file, query_jd_file.name)
+        if not query_text or not query_text.strip():
+            st.warning("Please upload a Job Description or enter a search text.")
+            return
 
-        else:
-            st.info("No reports found in the database.")
-            print("DEBUG (admin_report_management_page): No reports found in database.")
+        started = time.perf_counter()
+        with track_admin_query("candidate_search"):
+            matches = candidate_index.search(query_text, top_k=int(top_k))
+        logger.debug("Search returned %s match(es) in %.3fs.", len(matches), time.perf_counter() - started)
+        if not matches:
+            st.info("No matching candidates found.")
+            return
 
-    except Exception as e: # Catching general Exception
-        st.error(f"Error fetching all reports for admin management: {e}")
-        print(f"ERROR (admin_report_management_page): Error fetching all reports: {e}")
+        df_matches = pd.DataFrame([{
+            "Similarity": f"{match['similarity']:.0%}",
+            "Candidate Name": match['candidate_name'],
+            "CV File": match['filename'],
+            "Reviewed For (JD)": match['jd_filename'],
+            "Uploaded By": match['user_email'],
+            "Added": datetime.fromisoformat(match['added_at']).strftime('%Y-%m-%d %H:%M'),
+            "Excerpt": match['snippet'],
+        } for match in matches])
+        st.dataframe(df_matches, use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Index Maintenance</h3>", unsafe_allow_html=True)
+    st.caption("Compaction rewrites the vector file without removed entries.")
+    if st.button("Compact Index", key="compact_candidate_index_button"):
+        with st.spinner("Compacting the candidate index..."):
+            dropped = candidate_index.compact()
+        st.success(f"Compaction complete. {dropped} removed entr{'y' if dropped == 1 else 'ies'} dropped.")
+
+def _latency_table(rows, name_column):
+    """Formats profiler summary rows for st.dataframe."""
+    import pandas as pd
+    return pd.DataFrame([{
+        name_column: row['name'],
+        "Type": row['kind'],
+        "Count": row['count'],
+        "p50 (ms)": round(row['p50_ms'], 1),
+        "p95 (ms)": round(row['p95_ms'], 1),
+        "p99 (ms)": round(row['p99_ms'], 1),
+        "Max (ms)": round(row['max_ms'], 1),
+    } for row in rows])
+
+def admin_performance_page():
+    """Admin page with page and call-site latency percentiles, recent reruns and on-demand cProfile captures."""
+    import pandas as pd
+    st.markdown("<h1 style='color: #0D47A1 !important;'>⏱️ Admin: Performance</h1>", unsafe_allow_html=True)
+    st.write(f"Latency of page renders and of every Supabase and OpenAI request, over the last {config.PROFILER_WINDOW_SIZE} calls of each (since the server started).")
+    logger.debug("Displaying performance page.")
+
+    profiler = get_profiler()
+    if not profiler.enabled:
+        st.info("The profiler is disabled. Set PROFILER_ENABLED=true to collect timings.")
+        return
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Pages</h3>", unsafe_allow_html=True)
+    page_rows = profiler.summary(kinds=[SPAN_PAGE])
+    if page_rows:
+        st.dataframe(_latency_table(page_rows, "Page").drop(columns=["Type"]), use_container_width=True, hide_index=True)
+    else:
+        st.info("No pages have been timed yet.")
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Call Sites</h3>", unsafe_allow_html=True)
+    st.caption("Supabase database, Storage and Auth requests and OpenAI calls, by request and the function that made it.")
+    call_rows = [row for row in profiler.summary() if row['kind'] != SPAN_PAGE]
+    if call_rows:
+        st.dataframe(_latency_table(call_rows, "Call Site"), use_container_width=True, hide_index=True)
+    else:
+        st.info("No Supabase or OpenAI requests have been timed yet.")
+
+    st.markdown("<h3 style='color: #0D47A1 !important;'>Recent Reruns</h3>", unsafe_allow_html=True)
+    recent_reruns = profiler.recent_reruns()
+    if recent_reruns:
+        st.dataframe(pd.DataFrame([{
+            "Time": rerun['at'].strftime('%H:%M:%S'),
+            "Page": rerun['page'],
+            "Total (ms)": round(rerun['total_ms'], 1),
+            "Supabase (ms)": round(rerun['supabase_ms'], 1),
+            "Storage (ms)": round(rerun['storage_ms'], 1),
+            "Auth (ms)": round(rerun['auth_ms'], 1),
+            "OpenAI (ms)": round(rerun['openai_ms'], 1),
+            "Requests": rerun['spans'],
+        } for rerun in recent_reruns]), use_container_width=True, hide_index=True)
+
+    client_health = get_client_health()
+    if client_health:
+        st.markdown("<h3 style='color: #0D47A1 !important;'>API Health Checks</h3>", unsafe_allow_html=True)
+        health_cols = st.columns(len(client_health))
+        for health_col, (api_name, health) in zip(health_cols, client_health.items()):
+            health_col.metric(api_name.capitalize(), f"{health['latency_ms']} ms" if health['ok'] else "Unreachable", help=health['error'])
+
+    st.markdown("---")
+    st.markdown("<h3 style='color: #0D47A1 !important;'>cProfile Capture</h3>", unsafe_allow_html=True)
+    capture_requested, capture_page = profiler.capture_pending()
+    if capture_requested:
+        st.info(f"Waiting for the next rerun of {capture_page or 'any page'}.")
+        if st.button("Cancel Capture", key="cancel_cprofile_capture_button"):
+            profiler.cancel_capture()
+            st.rerun()
+    else:
+        capture_options = ["Any page"] + sorted(row['name'] for row in page_rows)
+        capture_choice = st.selectbox("Capture the next rerun of", capture_options, key="cprofile_capture_page")
+        if st.button("Capture Next Rerun", key="request_cprofile_capture_button"):
+            profiler.request_capture(CAPTURE_ANY_PAGE if capture_choice == "Any page" else capture_choice)
+            st.rerun()
+
+    last_capture = profiler.last_capture
+    if last_capture:
+        st.write(f"Last capture: **{last_capture['page']}** at {last_capture['captured_at'].strftime('%Y-%m-%d %H:%M:%S')} ({last_capture['total_ms']:.0f} ms).")
+        st.download_button(
+            label="Download .prof (pstats / snakeviz)",
+            data=last_capture['prof_bytes'],
+            file_name=f"rerun_{last_capture['captured_at'].strftime('%Y%m%d_%H%M%S')}.prof",
+            mime="application/octet-stream",
+            key="download_cprofile_capture"
+        )
+        with st.expander("Top functions by cumulative time"):
+            st.code(last_capture['stats_text'], language=None)
+
+    if st.button("Reset Timings", key="reset_profiler_button"):
+        profiler.reset()
+        st.rerun()
+
+# Grouping options of the AI usage page -> group_by argument of the ai_usage_rollup SQL function
+AI_USAGE_GROUPINGS = {"User": "user", "Day": "day", "Model": "model", "Job Description": "jd"}
+
+def fetch_ai_usage_rollup(service_client, group_by, date_from=None, date_to=None):
+    """
+    Returns OpenAI usage totals per group ('user', 'day', 'model' or 'jd') of the reports reviewed in
+    [date_from, date_to]. The rollup runs in the database (ai_usage_rollup, see supabase/migrations),
+    so only one row per group is transferred, however many reports there are.
+    """
+    response = service_client.rpc('ai_usage_rollup', {
+        "group_by": group_by,
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": (date_to + timedelta(days=1)).isoformat() if date_to else None,
+    }).execute()
+    return response.data or []
+
+def admin_ai_usage_page():
+    """Admin page with OpenAI token usage and analysis time per user, day, model or job description."""
+    import pandas as pd
+    st.markdown("<h1 style='color: #0D47A1 !important;'>🧮 Admin: AI Usage</h1>", unsafe_allow_html=True)
+    st.write("OpenAI tokens and analysis time recorded with each saved report. Reports saved before usage was recorded are not counted.")
+    logger.debug("Displaying AI usage page.")
+
+    if st.session_state['supabase_service_role_client'] is None:
+        logger.error("admin_ai_usage_page called but 'supabase_service_role_client' is None.")
+        st.error("Application error: Database connection not established. Please refresh or contact support.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    date_from = col1.date_input("From", value=datetime.now().date() - timedelta(days=30), key="ai_usage_date_from")
+    date_to = col2.date_input("To", value=None, key="ai_usage_date_to")
+    grouping = col3.selectbox("Group by", list(AI_USAGE_GROUPINGS), key="ai_usage_group_by")
+
+    try:
+        with track_admin_query("ai_usage_rollup"):
+            rows = fetch_ai_usage_rollup(st.session_state['supabase_service_role_client'], AI_USAGE_GROUPINGS[grouping], date_from, date_to)
+    except Exception as e:
+        st.error(f"Error fetching AI usage: {e}")
+        logger.error("Error fetching AI usage rollup: %s", e)
+        return
+
+    if not rows:
+        st.info("No AI usage recorded in this period.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Reviews", f"{sum(row['reviews'] for row in rows):,}")
+    col2.metric("Prompt Tokens", f"{sum(row['prompt_tokens'] for row in rows):,}", help=f"{sum(row['cached_tokens'] for row in rows):,} served from the prompt cache")
+    col3.metric("Completion Tokens", f"{sum(row['completion_tokens'] for row in rows):,}")
+    col4.metric("AI Time", f"{sum(row['total_seconds'] for row in rows) / 60:.1f} min")
+
+    df_usage = pd.DataFrame([{
+        grouping: row['group_key'] or "N/A",
+        "Reviews": row['reviews'],
+        "Prompt Tokens": row['prompt_tokens'],
+        "Cached Tokens": row['cached_tokens'],
+        "Completion Tokens": row['completion_tokens'],
+        "Total Tokens": row['prompt_tokens'] + row['completion_tokens'],
+        "Avg Time (s)": round(row['avg_seconds'] or 0.0, 1),
+        "p95 Time (s)": round(row['p95_seconds'] or 0.0, 1),
+    } for row in rows])
+    # Days read best in date order; everything else with the heaviest users of tokens first
+    if grouping != "Day":
+        df_usage = df_usage.sort_values("Total Tokens", ascending=False)
+    st.dataframe(df_usage, use_container_width=True, hide_index=True)
 
 def admin_invite_member_page():
     """Admin page to invite and create new user accounts."""
     st.markdown("<h1 style='color: #0D47A1 !important;'>➕ Admin: Invite New Member</h1>", unsafe_allow_html=True)
     st.write("Create new user accounts directly and assign their initial role.")
-    print("DEBUG (admin_invite_member_page): Displaying invite member page.")
+    logger.debug("Displaying invite member page.")
 
     if st.session_state['supabase_service_role_client'] is None: # MODIFIED: Use service client for admin pages
-        print("ERROR: admin_invite_member_page called but 'supabase_service_role_client' is None.")
+        logger.error("admin_invite_member_page called but 'supabase_service_role_client' is None.")
         st.error("Application error: Database connection not established. Please refresh or contact support.")
         return
 
@@ -1535,30 +2849,30 @@ def admin_invite_member_page():
         submit_invite_button = st.form_submit_button("Invite New Member")
 
         if submit_invite_button:
-            print("DEBUG (admin_invite_member_page): 'Invite New Member' button clicked.")
+            logger.debug("'Invite New Member' button clicked.")
             if is_admin_new_user and not confirm_admin_invite:
                 status_message_placeholder.error("Please confirm to create an Administrator account by checking the box.")
-                print("DEBUG (admin_invite_member_page): Admin invite: checkbox not confirmed.")
+                logger.debug("Admin invite: checkbox not confirmed.")
                 return
 
             if not (new_user_email_input and new_username_input and new_user_password_input):
                 status_message_placeholder.warning("Please fill in all fields (Email, Username, Temporary Password).")
-                print("DEBUG (admin_invite_member_page): Admin invite: missing fields.")
+                logger.debug("Admin invite: missing fields.")
                 return
 
             if not re.match(r"[^@]+@[^@]+\.[^@]+", new_user_email_input):
                 status_message_placeholder.warning("Please enter a valid email address.")
-                print("DEBUG (admin_invite_member_page): Admin invite: invalid email format.")
+                logger.debug("Admin invite: invalid email format.")
                 return
 
             if len(new_user_password_input) < 6:
                 status_message_placeholder.warning("Temporary password should be at least 6 characters long (Supabase minimum).")
-                print("DEBUG (admin_invite_member_page): Admin invite: weak password.")
+                logger.debug("Admin invite: weak password.")
                 return
 
             try:
                 with st.spinner("Inviting new member..."):
-                    print(f"DEBUG (admin_invite_member_page): Attempting to create user {new_user_email_input} with role {assign_role}.")
+                    logger.debug("Attempting to create user %s with role %s.", new_user_email_input, assign_role)
                     # MODIFIED: Create user in Supabase Auth using service client
                     response = st.session_state['supabase_service_role_client'].auth.admin.create_user(
                         {"email": new_user_email_input, "password": new_user_password_input, "email_confirm": True} # Set email_confirm to True for verification
@@ -1578,7 +2892,7 @@ def admin_invite_member_page():
                         st.session_state['supabase_service_role_client'].table('users').insert(user_data).execute()
 
                         status_message_placeholder.success(f"New user '{new_username_input}' ({new_user_email_input}) created successfully with role: {assign_role}! They will need to verify their email.")
-                        print(f"DEBUG (admin_invite_member_page): User {new_user_email_input} created in Auth and 'users' table.")
+                        logger.info("User %s created in Auth and 'users' table.", new_user_email_input)
 
                         st.session_state['invite_email'] = ""
                         st.session_state['invite_username'] = ""
@@ -1591,11 +2905,11 @@ def admin_invite_member_page():
                         st.rerun()
                     else:
                         status_message_placeholder.error(f"Error creating user in Supabase Auth: {response.json()}")
-                        print(f"ERROR (admin_invite_member_page): Supabase Auth user creation failed: {response.json()}")
+                        logger.error("Supabase Auth user creation failed: %s", response.json())
 
             except Exception as e: # Catching general Exception
                 error_message = str(e)
-                print(f"ERROR (admin_invite_member_page): Error: {error_message}")
+                logger.error("Error: %s", error_message)
                 if "duplicate key value violates unique constraint" in error_message or "email already registered" in error_message:
                     status_message_placeholder.error("This email is already registered. Please use a different email.")
                 elif "Password should be at least 6 characters" in error_message:
@@ -1607,16 +2921,16 @@ def update_password_page():
     """Page for new users to update their temporary password."""
     st.markdown("<h1 style='color: #0D47A1 !important;'>🔑 Update Your Password</h1>", unsafe_allow_html=True)
     st.write("As a new member, please set your personal password to continue.")
-    print("DEBUG (update_password_page): Displaying update password page.")
+    logger.debug("Displaying update password page.")
 
     if supabase is None:
-        print("ERROR: update_password_page called but 'supabase' is None.")
+        logger.error("update_password_page called but 'supabase' is None.")
         st.error("Application error: Database connection not established. Please refresh or contact support.")
         return
 
     if not st.session_state['new_user_uid_for_pw_reset']:
         st.warning("You must be logged in with a temporary account to access this page. Please log in.")
-        print("DEBUG (update_password_page): No user UID found for password reset. Redirecting.")
+        logger.debug("No user UID found for password reset. Redirecting.")
         if st.button("Go to Login"):
             st.session_state['current_page'] = 'Login'
             st.rerun()
@@ -1634,25 +2948,25 @@ def update_password_page():
         submit_update_button = st.form_submit_button("Update Password")
 
         if submit_update_button:
-            print("DEBUG (update_password_page): 'Update Password' button clicked.")
+            logger.debug("'Update Password' button clicked.")
             if not (current_temp_password and new_password and confirm_new_password):
                 update_status_placeholder.warning("Please fill in all password fields.")
-                print("DEBUG (update_password_page): Missing password fields.")
+                logger.debug("Missing password fields.")
                 return
 
             if new_password != confirm_new_password:
                 update_status_placeholder.error("New passwords do not match.")
-                print("DEBUG (update_password_page): New passwords mismatch.")
+                logger.debug("New passwords mismatch.")
                 return
 
             if len(new_password) < 6:
                 update_status_placeholder.warning("New password must be at least 6 characters long.")
-                print("DEBUG (update_password_page): New password too short.")
+                logger.debug("New password too short.")
                 return
 
             try:
                 with st.spinner("Updating password..."):
-                    print(f"DEBUG (update_password_page): Attempting to update password for UID: {st.session_state['new_user_uid_for_pw_reset']}")
+                    logger.debug("Attempting to update password for UID: %s", st.session_state['new_user_uid_for_pw_reset'])
                     # Re-authenticate with the temporary password to get a valid session for the user
                     auth_response = supabase.auth.sign_in_with_password({
                         "email": st.session_state['new_user_email_for_pw_reset'],
@@ -1667,19 +2981,19 @@ def update_password_page():
                             st.session_state['supabase_service_role_client'].table('users').update({'firstloginrequired': False}).eq('id', st.session_state['new_user_uid_for_pw_reset']).execute()
 
                             update_status_placeholder.success("Password updated successfully! Please log in with your new password.")
-                            print("DEBUG (update_password_page): Password updated and firstloginrequired set to False.")
+                            logger.info("Password updated and firstloginrequired set to False.")
                             time.sleep(2)
                             logout_user() # Log out to force re-login with new password
                         else:
                             update_status_placeholder.error(f"Failed to update password: {update_response.json()}")
-                            print(f"ERROR (update_password_page): Supabase update_user failed: {update_response.json()}")
+                            logger.error("Supabase update_user failed: %s", update_response.json())
                     else:
                         update_status_placeholder.error("Current temporary password is incorrect.")
-                        print(f"ERROR (update_password_page): Invalid temporary password provided for update.")
+                        logger.error("Invalid temporary password provided for update.")
 
             except Exception as e: # Catching general Exception
                 error_message = str(e)
-                print(f"ERROR (update_password_page): Error during password update: {error_message}")
+                logger.error("Error during password update: %s", error_message)
                 if "Password should be at least 6 characters" in error_message:
                     update_status_placeholder.error("The new password is too weak. Please choose a stronger one.")
                 else:
@@ -1711,7 +3025,7 @@ def main():
 
             # Navigation for logged-in users (User & Admin)
             user_pages = ['Dashboard', 'Upload JD & CV']
-            admin_pages = ['Admin Dashboard', 'Admin: User Management', 'Admin: Report Management', 'Admin: Invite New Member']
+            admin_pages = ['Admin Dashboard', 'Admin: User Management', 'Admin: Report Management', 'Admin: Candidate Search', 'Admin: Performance', 'Admin: AI Usage', 'Admin: Invite New Member']
 
             all_pages = user_pages
             if st.session_state['is_admin']:
@@ -1727,7 +3041,7 @@ def main():
 
             def update_page_selection():
                 st.session_state['current_page'] = st.session_state['sidebar_radio_selection']
-                print(f"DEBUG (sidebar_radio): Page selected: {st.session_state['current_page']}")
+                logger.debug("Page selected: %s", st.session_state['current_page'])
 
             page_selection = st.radio(
                 "Navigation",
@@ -1745,28 +3059,42 @@ def main():
         st.markdown('<div class="logged-in-main-content">', unsafe_allow_html=True)
 
         # --- Render Logged-in Pages ---
-        if st.session_state['current_page'] == 'Dashboard':
-            dashboard_page()
-        elif st.session_state['current_page'] == 'Upload JD & CV':
-            upload_jd_cv_page()
-        elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Review Reports':
-            review_reports_page()
-        elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin Dashboard':
-            admin_dashboard_page()
-        elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: User Management':
-            admin_user_management_page()
-        elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Report Management':
-            admin_report_management_page()
-        elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Invite New Member':
-            admin_invite_member_page()
-        elif st.session_state['current_page'] == 'Update Password':
-             update_password_page()
-        else:
-            st.error("Access Denied or Page Not Found. Please navigate using the sidebar.")
-            print(f"ERROR (main rendering): Invalid page state for logged-in user: {st.session_state['current_page']}")
+        # Timed per rerun for the admin performance page (see profiler.py)
+        with get_profiler().page(st.session_state['current_page']):
+            if st.session_state['current_page'] == 'Dashboard':
+                dashboard_page()
+            elif st.session_state['current_page'] == 'Upload JD & CV':
+                upload_jd_cv_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Review Reports':
+                review_reports_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin Dashboard':
+                admin_dashboard_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: User Management':
+                admin_user_management_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Report Management':
+                admin_report_management_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Candidate Search':
+                admin_candidate_search_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Performance':
+                admin_performance_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: AI Usage':
+                admin_ai_usage_page()
+            elif st.session_state['is_admin'] and st.session_state['current_page'] == 'Admin: Invite New Member':
+                admin_invite_member_page()
+            elif st.session_state['current_page'] == 'Update Password':
+                 update_password_page()
+            else:
+                st.error("Access Denied or Page Not Found. Please navigate using the sidebar.")
+                logger.error("Invalid page state for logged-in user: %s", st.session_state['current_page'])
 
         st.markdown('</div>', unsafe_allow_html=True) # Close the logged-in-main-content div
 
+        # Waiting for the next poll of a running analysis job is not page render time
+        if st.session_state['poll_analysis_job']:
+            st.session_state['poll_analysis_job'] = False
+            time.sleep(config.JOB_POLL_INTERVAL_SECONDS)
+            st.rerun()
+
     # --- Main Content Area when NOT logged in (Login/Landing Page) ---
     else:
         st.markdown("<h1 class='main-app-title'>SSO Consultants AI Recruitment System</h1>", unsafe_allow_html=True)
@@ -1780,13 +3108,13 @@ def main():
                 if st.button("Login as Admin", key="button_login_admin_main_page"):
                     st.session_state['login_mode'] = 'admin'
                     st.session_state['current_page'] = 'Login'
-                    print("DEBUG (main): Admin login mode selected from main page.")
+                    logger.debug("Admin login mode selected from main page.")
                     st.rerun()
             with user_col:
                 if st.button("Login as User", key="button_login_user_main_page"):
                     st.session_state['login_mode'] = 'user'
                     st.session_state['current_page'] = 'Login'
-                    print("DEBUG (main): User login mode selected from main page.")
+                    logger.debug("User login mode selected from main page.")
                     st.rerun()
 
         # Display the 'Please select' message
@@ -1806,7 +3134,7 @@ def main():
                     password = st.text_input("Password", type="password")
                     submit_button = st.form_submit_button("Login")
                     if submit_button:
-                        print(f"DEBUG (main): Login form submitted for {email}.")
+                        logger.debug("Login form submitted for %s.", email)
                         if email and password:
                             login_user(email, password, login_as_admin_attempt=(st.session_state['login_mode'] == 'admin'))
                         else:
@@ -0,0 +1,132 @@
+"""
+Benchmarks the DOCX report renderer against the previous cell-by-cell renderer.
+
+Renders synthetic comparative analyses for a grid of candidate and criteria counts and
+prints the median render time of each renderer. Run from the repository root:
+
+    python benchmarks/benchmark_docx_render.py [--repeat 5] [--candidates 5 20 50 100] [--criteria 10 25 50]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from docx import Document
+from docx.enum.section import WD_SECTION_START
+from docx.enum.table import WD_ALIGN_VERTICAL
+from docx.shared import Inches, Pt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_processing import render_docx_report  # noqa: E402
+
+
+def render_docx_report_legacy(comparative_data, jd_filename="Job Description", cv_filenames_str="Candidates"):
+    """The previous renderer: tables filled through DataFrame.iterrows(), 9pt set on every run of every cell."""
+    document = Document()
+
+    section = document.sections[0]
+    section.start_type = WD_SECTION_START.NEW_PAGE
+    section.left_margin = Inches(1)
+    section.right_margin = Inches(1)
+    section.top_margin = Inches(1)
+    section.bottom_margin = Inches(1)
+
+    document.add_heading("JD-CV Comparative Analysis Report", level=0)
+    document.add_paragraph(f"Job Description: {jd_filename}\nCandidates: {cv_filenames_str}")
+
+    tables = []
+    df_evaluations = pd.DataFrame(comparative_data["candidate_evaluations"])
+    expected_cols_eval = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
+    for col in expected_cols_eval:
+        if col not in df_evaluations.columns:
+            df_evaluations[col] = "N/A"
+    tables.append(df_evaluations[expected_cols_eval])
+    tables.append(pd.DataFrame(comparative_data["criteria_observations"]))
+
+    for df_table in tables:
+        table = document.add_table(rows=1, cols=len(df_table.columns))
+        table.style = 'Table Grid'
+        hdr_cells = table.rows[0].cells
+        for i, col_name in enumerate(df_table.columns):
+            hdr_cells[i].text = col_name
+            for paragraph in hdr_cells[i].paragraphs:
+                for run in paragraph.runs:
+                    run.bold = True
+                    run.font.size = Pt(9)
+            hdr_cells[i].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+        for index, row in df_table.iterrows():
+            row_cells = table.add_row().cells
+            for i, cell_value in enumerate(row):
+                row_cells[i].text = str(cell_value)
+                for paragraph in row_cells[i].paragraphs:
+                    for run in paragraph.runs:
+                        run.font.size = Pt(9)
+
+    document.add_paragraph(comparative_data["final_shortlist_recommendation"])
+    doc_io = io.BytesIO()
+    document.save(doc_io)
+    return doc_io.getvalue()
+
+
+def make_comparative_data(num_candidates, num_criteria):
+    candidate_names = [f"Candidate {idx + 1}" for idx in range(num_candidates)]
+    return {
+        "candidate_evaluations": [
+            {
+                "Candidate Name": name,
+                "Match %": f"{90 - idx % 50}%",
+                "Ranking": str(idx + 1),
+                "Shortlist Probability": ("High", "Moderate", "Low")[idx % 3],
+                "Key Strengths": "End-to-end recruitment, stakeholder management, Naukri and LinkedIn sourcing",
+                "Key Gaps": "No payroll exposure, limited HRMS experience",
+                "Location Suitability": "Pune (flexible)",
+                "Comments": "Strong communication; suitable for a fast-paced Indian mid-size organisation.",
+            }
+            for idx, name in enumerate(candidate_names)
+        ],
+        "criteria_observations": [
+            dict({"Criteria": f"Requirement {criteria_idx + 1}"}, **{name: ("✅", "⚠️", "❌")[(criteria_idx + idx) % 3] for idx, name in enumerate(candidate_names)})
+            for criteria_idx in range(num_criteria)
+        ],
+        "additional_observations_text": "Most candidates have strong sourcing experience.",
+        "final_shortlist_recommendation": ", ".join(candidate_names[:3]),
+    }
+
+
+def median_seconds(render_fn, comparative_data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render_fn(comparative_data, "JD.pdf", "CVs")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per measurement (the median is reported).")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[5, 20, 50, 100])
+    parser.add_argument("--criteria", type=int, nargs="+", default=[10, 25, 50])
+    args = parser.parse_args()
+
+    render_docx_report(make_comparative_data(1, 1))  # Builds the cached template outside the measurements
+
+    print(f"{'Candidates':>10} {'Criteria':>8} {'Cells':>7} {'Legacy (ms)':>12} {'Current (ms)':>13} {'Speed-up':>9}")
+    for num_candidates in args.candidates:
+        for num_criteria in args.criteria:
+            comparative_data = make_comparative_data(num_candidates, num_criteria)
+            legacy_seconds = median_seconds(render_docx_report_legacy, comparative_data, args.repeat)
+            current_seconds = median_seconds(render_docx_report, comparative_data, args.repeat)
+            cells = num_candidates * 8 + num_criteria * (num_candidates + 1)
+            print(
+                f"{num_candidates:>10} {num_criteria:>8} {cells:>7} {legacy_seconds * 1000:>12.1f} "
+                f"{current_seconds * 1000:>13.1f} {legacy_seconds / current_seconds:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
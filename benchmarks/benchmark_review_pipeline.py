@@ -0,0 +1,521 @@
+"""
+Benchmarks the review pipeline offline, without OpenAI or Supabase.
+
+For each corpus (a synthetic JD plus 1, 10, 50 or 200 CVs, as PDF, DOCX or TXT) and analysis
+mode, the harness runs the stages a review goes through in app.py: get_file_content on every
+file, get_comparative_ai_analysis, generate_docx_report and save_report_on_download. OpenAI
+requests go to a local fake server that answers with canned JSON after a configurable latency;
+reports are saved to an in-memory Supabase stand-in. Every run uses freshly generated documents
+and force_refresh, so no cache is hit. Prints (or writes with --output) one JSON document with
+the duration and peak memory of each stage, for comparing runs over time. Peak Python memory is
+measured in this process with tracemalloc; text extraction and DOCX rendering run in the worker
+pool's processes, whose peak is in max_worker_rss_mb. Run from the repository root:
+
+    python benchmarks/benchmark_review_pipeline.py [--sizes 1 10 50 200] [--formats pdf docx txt] [--analysis-modes single map_reduce]
+        [--openai-latency-ms 200] [--openai-jitter-ms 50] [--no-tracemalloc] [--output results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+CORPUS_SIZES = [1, 10, 50, 200]
+FILE_FORMATS = ["pdf", "docx", "txt"]
+ANALYSIS_MODES = ["single", "map_reduce"]
+
+BENCHMARK_USER = {"user_uid": "benchmark-user", "user_email": "benchmark@example.com", "user_name": "Benchmark User", "is_admin": False}
+
+# Placeholder credentials (nothing is sent to Supabase or OpenAI) and settings that keep the app's
+# own throttling and background work out of the measurements; any of them can be overridden from
+# the environment, e.g. OPENAI_TOKENS_PER_MINUTE to include the rate limiter.
+BENCHMARK_ENV = {
+    "SUPABASE_URL": "https://benchmark.supabase.co",
+    "SUPABASE_KEY": "benchmark-anon-key",
+    "SUPABASE_SERVICE_ROLE_KEY": "benchmark-service-role-key",
+    "OPENAI_API_KEY": "benchmark-openai-key",
+    "CLIENT_HEALTH_CHECK_INTERVAL_SECONDS": "0",
+    "METRICS_PORT": "0",
+    "LOG_LEVEL": "ERROR",
+    "STREAMLIT_LOGGER_LEVEL": "error",
+    "OPENAI_REQUESTS_PER_MINUTE": "1000000",
+    "OPENAI_TOKENS_PER_MINUTE": "1000000000",
+}
+
+SKILLS = [
+    "Python", "SQL", "Recruitment", "Talent Acquisition", "Stakeholder Management", "Payroll", "SAP HR",
+    "SuccessFactors", "Onboarding", "Employer Branding", "Naukri Sourcing", "LinkedIn Recruiter",
+    "Campus Hiring", "HR Analytics", "Excel", "Workday", "Compensation and Benefits", "Employee Relations",
+]
+CITIES = ["Pune", "Mumbai", "Delhi", "Bengaluru", "Hyderabad", "Chennai", "Remote"]
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Ananya", "Kabir", "Meera", "Rohan", "Saanvi", "Vihaan", "Priya"]
+LAST_NAMES = ["Sharma", "Kulkarni", "Iyer", "Deshmukh", "Reddy", "Nair", "Mehta", "Joshi", "Gupta", "Rao"]
+
+
+# --- Synthetic corpus ---
+
+def make_jd_text(rng, nonce):
+    skills = rng.sample(SKILLS, 8)
+    lines = [
+        "Job Description: Senior Talent Acquisition Partner",
+        f"Location: {rng.choice(CITIES)}",
+        f"Reference: {nonce}",
+        "",
+        "Responsibilities:",
+    ]
+    lines += [f"- Own end-to-end hiring using {skill} across business units." for skill in skills[:5]]
+    lines += ["", "Requirements:", "- MBA HR or equivalent.", f"- {rng.randint(4, 10)}+ years of experience."]
+    lines += [f"- Hands-on experience with {skill}." for skill in skills]
+    return "\n".join(lines)
+
+
+def make_cv_text(rng, candidate_name, nonce):
+    lines = [candidate_name, f"Based in {rng.choice(CITIES)} | {rng.randint(1, 15)} years of experience | Ref {nonce}", "", "Experience:"]
+    for job_idx in range(rng.randint(2, 5)):
+        lines.append(f"Company {rng.randint(1, 500)} - HR role {job_idx + 1} ({2024 - job_idx * 2 - rng.randint(1, 2)} to {2024 - job_idx * 2})")
+        lines += [f"- Delivered results with {skill} for {rng.randint(5, 200)} positions." for skill in rng.sample(SKILLS, rng.randint(3, 6))]
+    lines += ["", "Skills: " + ", ".join(rng.sample(SKILLS, rng.randint(5, 12))), "", "Education: MBA HR, Pune University"]
+    return "\n".join(lines)
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace").decode("latin-1")
+
+
+def make_pdf_bytes(text, lines_per_page=55):
+    """Writes text as a minimal PDF (Helvetica, one text object per page) that PyPDF2 can extract."""
+    lines = text.splitlines() or [""]
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)]
+    page_ids = [4 + idx * 2 for idx in range(len(pages))]
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {len(pages)} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, page_lines in zip(page_ids, pages):
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects[page_id] = f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        objects[page_id + 1] = f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream"
+
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = pdf.tell()
+        pdf.write(f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1"))
+    xref_offset = pdf.tell()
+    pdf.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for object_id in sorted(objects):
+        pdf.write(f"{offsets[object_id]:010d} 00000 n \n".encode("latin-1"))
+    pdf.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1"))
+    return pdf.getvalue()
+
+
+def make_docx_bytes(text):
+    from docx import Document
+
+    document = Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    docx_io = io.BytesIO()
+    document.save(docx_io)
+    return docx_io.getvalue()
+
+
+def encode_document(text, file_format):
+    if file_format == "pdf":
+        return make_pdf_bytes(text)
+    if file_format == "docx":
+        return make_docx_bytes(text)
+    return text.encode("utf-8")
+
+
+def make_corpus(num_cvs, file_format, seed):
+    """Returns ((jd_filename, jd_bytes), [(cv_filename, cv_bytes), ...]). Documents are unique per seed, so caches never hit."""
+    rng = random.Random(seed)
+    nonce = uuid.UUID(int=rng.getrandbits(128)).hex[:12]
+    jd_file = (f"Benchmark JD.{file_format}", encode_document(make_jd_text(rng, nonce), file_format))
+    cv_files = []
+    for idx in range(num_cvs):
+        # The app derives candidate names from the filenames
+        candidate_name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {idx + 1}"
+        cv_files.append((f"{candidate_name} CV.{file_format}", encode_document(make_cv_text(rng, candidate_name, nonce), file_format)))
+    return jd_file, cv_files
+
+
+# --- Fake OpenAI server ---
+
+def _evaluation(rng, candidate_name):
+    return {
+        "Candidate Name": candidate_name,
+        "Match %": f"{rng.randint(40, 95)}%",
+        "Shortlist Probability": rng.choice(["High", "Moderate", "Low"]),
+        "Key Strengths": ", ".join(rng.sample(SKILLS, 3)),
+        "Key Gaps": ", ".join(rng.sample(SKILLS, 2)),
+        "Location Suitability": rng.choice(CITIES),
+        "Comments": "Synthetic evaluation returned by the benchmark's fake OpenAI server.",
+    }
+
+
+def _criteria_rows(rng, candidate_names):
+    return [
+        dict({"Criteria": skill}, **{name: rng.choice(["✅", "⚠️", "❌"]) for name in candidate_names})
+        for skill in SKILLS[:8]
+    ]
+
+
+def canned_completion_content(messages, rng):
+    """Builds a JSON reply of the shape the app asked for: single-call analysis, map (one CV) or reduce."""
+    system_prompt = messages[0]["content"]
+    user_prompt = messages[-1]["content"]
+    if '"rankings"' in system_prompt:
+        candidate_names = list(dict.fromkeys(re.findall(r'"Candidate Name": "([^"]+)"', user_prompt)))
+        return {
+            "rankings": [{"Candidate ID": rank, "Candidate Name": name, "Ranking": str(rank)} for rank, name in enumerate(candidate_names, start=1)],
+            "criteria_observations": _criteria_rows(rng, candidate_names),
+            "additional_observations_text": "Synthetic observations.",
+            "final_shortlist_recommendation": ", ".join(candidate_names[:3]),
+        }
+    candidate_names = list(dict.fromkeys(re.findall(r"Name: ([^,]+), Filename:", user_prompt)))
+    if "ONE candidate" in system_prompt:
+        evaluation = _evaluation(rng, candidate_names[0] if candidate_names else "Unknown")
+        evaluation["criteria"] = [{"Criteria": skill, "Assessment": rng.choice(["✅", "⚠️", "❌"])} for skill in SKILLS[:8]]
+        return evaluation
+    evaluations = [_evaluation(rng, name) for name in candidate_names]
+    for rank, evaluation in enumerate(evaluations, start=1):
+        evaluation["Ranking"] = str(rank)
+    return {
+        "candidate_evaluations": evaluations,
+        "criteria_observations": _criteria_rows(rng, candidate_names),
+        "additional_observations_text": "Synthetic observations.",
+        "final_shortlist_recommendation": ", ".join(candidate_names[:3]),
+    }
+
+
+class FakeOpenAIServer:
+    """Serves POST /v1/chat/completions on a local port, answering with canned JSON after latency_ms (+ up to jitter_ms)."""
+
+    def __init__(self, latency_ms, jitter_ms, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with server._lock:
+                    server.requests += 1
+                    delay_ms = server.latency_ms + server._rng.uniform(0, server.jitter_ms)
+                    reply_rng = random.Random(server._rng.random())
+                time.sleep(delay_ms / 1000)
+                content = json.dumps(canned_completion_content(request["messages"], reply_rng), ensure_ascii=False)
+                prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+                completion_tokens = len(content) // 4
+                body = json.dumps({
+                    "id": f"chatcmpl-benchmark-{uuid.uuid4().hex[:8]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "benchmark"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# --- In-memory Supabase stand-in ---
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {"data": self.data}
+
+
+class _Bucket:
+    def __init__(self, files, bucket_name):
+        self._files = files
+        self._bucket_name = bucket_name
+
+    def upload(self, path, file_bytes, file_options=None):
+        self._files[(self._bucket_name, path)] = bytes(file_bytes)
+        return _Response({"path": path})
+
+    def get_public_url(self, path):
+        return _Response(f"https://benchmark.supabase.co/storage/v1/object/public/{self._bucket_name}/{path}")
+
+    def remove(self, paths):
+        return _Response([{"name": path} for path in paths if self._files.pop((self._bucket_name, path), None) is not None])
+
+
+class _Storage:
+    def __init__(self):
+        self.files = {}
+
+    def from_(self, bucket_name):
+        return _Bucket(self.files, bucket_name)
+
+
+class _InsertQuery:
+    def __init__(self, rows, row):
+        self._rows = rows
+        self._row = row
+
+    def execute(self):
+        row = dict(self._row, id=len(self._rows) + 1)
+        self._rows.append(row)
+        return _Response([row])
+
+
+class _Table:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def insert(self, row):
+        return _InsertQuery(self._rows, row)
+
+
+class InMemorySupabase:
+    """The parts of the Supabase client that save_report_on_download uses: Storage upload/URL/remove and table inserts."""
+
+    def __init__(self):
+        self.storage = _Storage()
+        self.tables = {}
+
+    def table(self, table_name):
+        return _Table(self.tables.setdefault(table_name, []))
+
+
+class QuietUI:
+    """Stands in for st / a job reporter: swallows messages, keeping errors for the results."""
+
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message, *args, **kwargs):
+        self.errors.append(str(message))
+
+    def spinner(self, *args, **kwargs):
+        return contextlib.nullcontext()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+# --- Harness ---
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024, 1)
+
+
+def _max_worker_rss_mb():
+    """Peak RSS of the largest live worker process (Linux only: read from /proc; None elsewhere)."""
+    peaks = []
+    for process in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{process.pid}/status", encoding="ascii") as status_file:
+                peaks.extend(int(line.split()[1]) / 1024 for line in status_file if line.startswith("VmHWM:"))
+        except OSError:
+            continue
+    return round(max(peaks), 1) if peaks else None
+
+
+@contextlib.contextmanager
+def measure_stage(stages, name, trace_memory):
+    """Records the stage's duration and, with tracemalloc, how far Python memory rose above its level at the start."""
+    stage = stages[name] = {}
+    if trace_memory:
+        tracemalloc.reset_peak()
+        memory_at_start = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage["seconds"] = round(time.perf_counter() - started, 4)
+        if trace_memory:
+            stage["peak_python_mb"] = round((tracemalloc.get_traced_memory()[1] - memory_at_start) / (1024 * 1024), 2)
+
+
+def run_scenario(app, fake_openai, num_cvs, file_format, analysis_mode, seed, trace_memory):
+    jd_file, cv_files = make_corpus(num_cvs, file_format, seed)
+    supabase = InMemorySupabase()
+    user_context = dict(BENCHMARK_USER, supabase_client=supabase, supabase_service_role_client=supabase)
+    ui = QuietUI()
+    stages = {}
+    started = time.perf_counter()
+
+    with measure_stage(stages, "extraction", trace_memory) as stage:
+        jd_text = app.get_file_content(io.BytesIO(jd_file[1]), jd_file[0])
+        all_cv_data = []
+        for cv_filename, cv_bytes in cv_files:
+            cv_text = app.get_file_content(io.BytesIO(cv_bytes), cv_filename)
+            if cv_text:
+                all_cv_data.append({"filename": cv_filename, "text": cv_text})
+        stage["files"] = 1 + len(cv_files)
+        stage["input_bytes"] = len(jd_file[1]) + sum(len(cv_bytes) for _, cv_bytes in cv_files)
+        stage["failed_files"] = int(not jd_text) + len(cv_files) - len(all_cv_data)
+
+    requests_before = fake_openai.requests
+    analysis_info = {}
+    with measure_stage(stages, "ai_analysis", trace_memory) as stage:
+        comparative_data = app.get_comparative_ai_analysis(jd_text, all_cv_data, analysis_mode=analysis_mode, force_refresh=True, ui=ui, analysis_info=analysis_info)
+        stage["openai_requests"] = fake_openai.requests - requests_before
+        ai_usage = analysis_info.get("ai_usage") or {}
+        stage["prompt_tokens"] = ai_usage.get("prompt_tokens", 0)
+        stage["completion_tokens"] = ai_usage.get("completion_tokens", 0)
+        stage["failed"] = "error" in comparative_data
+
+    cv_filenames = [cv_item["filename"] for cv_item in all_cv_data]
+    docx_buffer = None
+    if "error" not in comparative_data:
+        with measure_stage(stages, "docx_render", trace_memory) as stage:
+            docx_buffer = app.generate_docx_report(comparative_data, jd_file[0], ", ".join(cv_filenames), ui=ui)
+            stage["output_bytes"] = len(docx_buffer.getvalue()) if docx_buffer is not None else 0
+            stage["failed"] = docx_buffer is None
+
+    if docx_buffer is not None:
+        with measure_stage(stages, "save_report", trace_memory) as stage:
+            download_url = app.save_report_on_download(
+                f"benchmark_{file_format}_{num_cvs}_{analysis_mode}.docx",
+                docx_buffer,
+                comparative_data,
+                jd_file[0],
+                cv_filenames,
+                user_context=user_context,
+                ui=ui,
+                ai_usage=analysis_info.get("ai_usage")
+            )
+            stage["failed"] = download_url is None
+
+    return {
+        "cvs": num_cvs,
+        "format": file_format,
+        "analysis_mode": analysis_mode,
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "stages": stages,
+        "errors": ui.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=CORPUS_SIZES, help="Numbers of CVs per corpus.")
+    parser.add_argument("--formats", nargs="+", choices=FILE_FORMATS, default=FILE_FORMATS)
+    parser.add_argument("--analysis-modes", nargs="+", choices=ANALYSIS_MODES, default=ANALYSIS_MODES)
+    parser.add_argument("--openai-latency-ms", type=float, default=200, help="Delay of every fake OpenAI response.")
+    parser.add_argument("--openai-jitter-ms", type=float, default=50, help="Random extra delay of up to this much.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", dest="trace_memory", action="store_false", help="Skip tracemalloc (it slows Python code down).")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    fake_openai = FakeOpenAIServer(args.openai_latency_ms, args.openai_jitter_ms, seed=args.seed).start()
+    work_dir = tempfile.mkdtemp(prefix="review-benchmark-")
+    env = dict(BENCHMARK_ENV, OPENAI_BASE_URL=fake_openai.base_url)
+    # Caches and stores go to a scratch directory, so the benchmark never reads or fills the real ones
+    for name, path in (("EXTRACTION_CACHE_DIR", "extraction"), ("JOB_STORE_PATH", "analysis_jobs.sqlite3"),
+                       ("DEDUP_STORE_PATH", "cv_fingerprints.sqlite3"), ("CANDIDATE_INDEX_DIR", "candidate_index"),
+                       ("USER_DELETION_STORE_PATH", "user_deletions.sqlite3")):
+        env[name] = os.path.join(work_dir, path)
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    # The fake server must receive the requests whatever the environment says
+    os.environ["OPENAI_BASE_URL"] = fake_openai.base_url
+
+    # Importing app.py renders its login page once in Streamlit's bare mode
+    started = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - started
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # Starts the worker pool's processes and imports openai outside the measurements
+    for analysis_mode in args.analysis_modes:
+        run_scenario(app, fake_openai, 1, "txt", analysis_mode, f"warm-up-{analysis_mode}", trace_memory=False)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    runs = []
+    for file_format in args.formats:
+        for num_cvs in args.sizes:
+            for analysis_mode in args.analysis_modes:
+                print(f"Running {num_cvs} {file_format.upper()} CV(s), {analysis_mode}...", file=sys.stderr)
+                seed = f"{args.seed}-{file_format}-{num_cvs}-{analysis_mode}"
+                runs.append(run_scenario(app, fake_openai, num_cvs, file_format, analysis_mode, seed, args.trace_memory))
+    if args.trace_memory:
+        tracemalloc.stop()
+    fake_openai.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "benchmark": "review_pipeline",
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "openai_latency_ms": args.openai_latency_ms,
+            "openai_jitter_ms": args.openai_jitter_ms,
+            "tracemalloc": args.trace_memory,
+            "worker_pool_size": app.config.WORKER_POOL_SIZE,
+            "map_reduce_concurrency": app.config.MAP_REDUCE_CONCURRENCY,
+            "openai_max_concurrency": app.config.OPENAI_MAX_CONCURRENCY,
+        },
+        "app_import_seconds": round(import_seconds, 4),
+        "max_rss_mb": _max_rss_mb(),
+        "max_worker_rss_mb": _max_worker_rss_mb(),
+        "runs": runs,
+    }
+    results_json = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(results_json + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(results_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Checks the app's cold start and idle rerun times against a time budget.
+
+Each sample starts a fresh Python process that runs app.py through Streamlit's AppTest
+(the login page, no network calls): the first run is the cold start, including every
+module app.py imports; the following runs are idle reruns. The script also fails if a
+heavy module that should be imported lazily was loaded by the login page. Exits with
+status 1 when a budget is exceeded, so it can run in CI. Run from the repository root:
+
+    python benchmarks/benchmark_startup.py [--samples 3] [--reruns 5] [--cold-start-budget-ms 2500] [--rerun-budget-ms 400]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+SAMPLE_PREFIX = "BENCHMARK_SAMPLE "
+
+# Modules the login page must not import (see the lazy imports in app.py, clients.py and openai_limiter.py)
+LAZY_MODULES = ["pandas", "openai", "docx", "PyPDF2"]
+
+# Placeholder settings: the login page creates its Supabase client without contacting the server
+BENCHMARK_ENV = {
+    "SUPABASE_URL": "https://benchmark.supabase.co",
+    "SUPABASE_KEY": "benchmark-anon-key",
+    "SUPABASE_SERVICE_ROLE_KEY": "benchmark-service-role-key",
+    "OPENAI_API_KEY": "benchmark-openai-key",
+    "CLIENT_HEALTH_CHECK_INTERVAL_SECONDS": "0",
+    "METRICS_PORT": "0",
+}
+
+
+def measure_sample(reruns):
+    """Runs in the child process: returns the cold start time, the rerun times and the lazy modules that got imported."""
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(APP_PATH, default_timeout=120)
+    started = time.perf_counter()
+    app_test.run()
+    cold_start_ms = (time.perf_counter() - started) * 1000
+    if app_test.exception:
+        raise RuntimeError(f"app.py raised: {app_test.exception[0].value}")
+    rerun_ms = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app_test.run()
+        rerun_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        "cold_start_ms": cold_start_ms,
+        "rerun_ms": rerun_ms,
+        "lazy_modules_loaded": [module for module in LAZY_MODULES if module in sys.modules],
+    }
+
+
+def run_sample(reruns):
+    env = dict(os.environ)
+    for key, value in BENCHMARK_ENV.items():
+        env.setdefault(key, value)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--reruns", str(reruns)],
+        cwd=os.path.dirname(APP_PATH),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # The app's log lines share stdout with the sample
+    sample_line = next(line for line in completed.stdout.splitlines() if line.startswith(SAMPLE_PREFIX))
+    return json.loads(sample_line[len(SAMPLE_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=3, help="Fresh processes to start (the median is compared with the budget).")
+    parser.add_argument("--reruns", type=int, default=5, help="Idle reruns per process.")
+    parser.add_argument("--cold-start-budget-ms", type=float, default=2500)
+    parser.add_argument("--rerun-budget-ms", type=float, default=400)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(SAMPLE_PREFIX + json.dumps(measure_sample(args.reruns)))
+        return
+
+    samples = [run_sample(args.reruns) for _ in range(args.samples)]
+    cold_start_ms = statistics.median(sample["cold_start_ms"] for sample in samples)
+    rerun_ms = statistics.median(timing for sample in samples for timing in sample["rerun_ms"])
+    lazy_modules_loaded = sorted({module for sample in samples for module in sample["lazy_modules_loaded"]})
+
+    failures = []
+    if cold_start_ms > args.cold_start_budget_ms:
+        failures.append(f"cold start {cold_start_ms:.0f} ms exceeds the {args.cold_start_budget_ms:.0f} ms budget")
+    if rerun_ms > args.rerun_budget_ms:
+        failures.append(f"idle rerun {rerun_ms:.0f} ms exceeds the {args.rerun_budget_ms:.0f} ms budget")
+    if lazy_modules_loaded:
+        failures.append(f"the login page imported {', '.join(lazy_modules_loaded)}")
+
+    print(f"Cold start:  {cold_start_ms:8.0f} ms (budget {args.cold_start_budget_ms:.0f} ms)")
+    print(f"Idle rerun:  {rerun_ms:8.0f} ms (budget {args.rerun_budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# --- Shared API Clients ---
+# Supabase and OpenAI clients are created once per server process instead of once per
+# browser session (Supabase) or once per rerun (OpenAI), so page loads reuse warm keep-alive
+# connections instead of paying a TCP + TLS handshake. All Supabase clients share one httpx
+# connection pool; the clients only differ by the Authorization header they send, so each
+# session still gets its own lightweight client carrying its user's token. Async OpenAI
+# calls run on one long-lived event loop, because httpx async connections are bound to the
+# loop that opened them. A background thread pings both APIs periodically, which keeps the
+# pools warm and records whether they are reachable. openai is imported on first use, since it
+# is slow to import and pages that make no AI request do not need it.
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import httpx
+from supabase import ClientOptions, create_client
+from supabase_auth import SyncMemoryStorage
+
+import config
+from profiler import ProfiledTransport, get_profiler
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+_lock = threading.Lock()
+_supabase_http_client = None
+_supabase_service_client = None
+_openai_client = None
+_async_openai_client = None
+_event_loop = None
+_health_thread = None
+_health = {}
+_COROUTINE_DONE = object()
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def get_supabase_http_client():
+    """Returns the process-wide httpx connection pool shared by every Supabase client."""
+    global _supabase_http_client
+    if _supabase_http_client is None:
+        with _lock:
+            if _supabase_http_client is None:
+                # Every Supabase request is timed by the profiler (see profiler.ProfiledTransport)
+                _supabase_http_client = httpx.Client(
+                    transport=ProfiledTransport(httpx.HTTPTransport(limits=_http_limits()), get_profiler()),
+                    timeout=httpx.Timeout(config.SUPABASE_HTTP_TIMEOUT_SECONDS, connect=config.HTTP_CONNECT_TIMEOUT_SECONDS)
+                )
+        _start_health_checks()
+    return _supabase_http_client
+
+
+def create_session_supabase_client():
+    """
+    Returns a new anon-key Supabase client for one browser session. It signs the session's user
+    in and out and sends their token with every request, but opens no connections of its own.
+    """
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(
+        storage=SyncMemoryStorage(),
+        httpx_client=get_supabase_http_client()
+    ))
+
+
+def get_supabase_service_client():
+    """Returns the process-wide service role Supabase client (admin operations, background jobs)."""
+    global _supabase_service_client
+    if _supabase_service_client is None:
+        http_client = get_supabase_http_client()
+        with _lock:
+            if _supabase_service_client is None:
+                # The service client never signs in, so there is no session to persist or refresh
+                _supabase_service_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=ClientOptions(
+                    storage=SyncMemoryStorage(),
+                    persist_session=False,
+                    auto_refresh_token=False,
+                    httpx_client=http_client
+                ))
+    return _supabase_service_client
+
+
+def get_openai_client():
+    """Returns the process-wide OpenAI client. Retries are handled by the rate limiter (openai_limiter.py), not the SDK."""
+    global _openai_client
+    if _openai_client is None:
+        from openai import DefaultHttpxClient, OpenAI
+        with _lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0, http_client=DefaultHttpxClient(limits=_http_limits()))
+        _start_health_checks()
+    return _openai_client
+
+
+def _get_event_loop():
+    """Returns the long-lived event loop that runs all async OpenAI calls, starting its thread on first use."""
+    global _event_loop
+    if _event_loop is None:
+        with _lock:
+            if _event_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-openai-loop", daemon=True).start()
+                _event_loop = loop
+    return _event_loop
+
+
+def get_async_openai_client():
+    """Returns the process-wide AsyncOpenAI client. Only use it in coroutines run through run_coroutine()."""
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        with _lock:
+            if _async_openai_client is None:
+                _async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0, http_client=DefaultAsyncHttpxClient(limits=_http_limits()))
+    return _async_openai_client
+
+
+def run_coroutine(coroutine_factory, on_item=None):
+    """
+    Runs coroutine_factory(emit) on the shared event loop and returns its result. The coroutine
+    may call emit(item); each item is handed to on_item in the calling thread while it waits, so
+    on_item can update Streamlit elements. emit is None when on_item is not given.
+    """
+    if on_item is None:
+        return asyncio.run_coroutine_threadsafe(coroutine_factory(None), _get_event_loop()).result()
+
+    items = []
+    items_ready = threading.Condition()
+
+    def emit(item):
+        with items_ready:
+            items.append(item)
+            items_ready.notify()
+
+    future = asyncio.run_coroutine_threadsafe(coroutine_factory(emit), _get_event_loop())
+    future.add_done_callback(lambda _: emit(_COROUTINE_DONE))
+    while True:
+        with items_ready:
+            while not items:
+                items_ready.wait()
+            pending, items[:] = list(items), []
+        for item in pending:
+            if item is _COROUTINE_DONE:
+                return future.result()
+            on_item(item)
+
+
+def _check_supabase():
+    response = get_supabase_http_client().get(
+        f"{SUPABASE_URL.rstrip('/')}/auth/v1/health",
+        headers={"apikey": SUPABASE_KEY}
+    )
+    response.raise_for_status()
+
+
+def _check_openai():
+    get_openai_client().with_options(timeout=config.HTTP_CONNECT_TIMEOUT_SECONDS * 2).models.list()
+
+
+def run_health_checks():
+    """Pings Supabase and OpenAI over the shared pools and records the outcome. Returns get_client_health()."""
+    for name, check in (("supabase", _check_supabase), ("openai", _check_openai)):
+        started = time.perf_counter()
+        try:
+            check()
+            _health[name] = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000), "error": None, "checked_at": time.time()}
+        except Exception as e:
+            _health[name] = {"ok": False, "latency_ms": None, "error": str(e), "checked_at": time.time()}
+            logger.error("%s health check failed: %s", name, e)
+    return get_client_health()
+
+
+def get_client_health():
+    """Returns the latest health check result per API: {'supabase': {...}, 'openai': {...}} (empty before the first check)."""
+    return {name: dict(result) for name, result in _health.items()}
+
+
+def _health_check_loop():
+    while True:
+        time.sleep(config.CLIENT_HEALTH_CHECK_INTERVAL_SECONDS)
+        run_health_checks()
+
+
+def _start_health_checks():
+    global _health_thread
+    if config.CLIENT_HEALTH_CHECK_INTERVAL_SECONDS <= 0 or _health_thread is not None:
+        return
+    with _lock:
+        if _health_thread is None:
+            _health_thread = threading.Thread(target=_health_check_loop, name="client-health-checks", daemon=True)
+            _health_thread.start()
@@ -0,0 +1,147 @@
+# --- Application Configuration ---
+# Tunables shared by app.py and its helper modules. Everything is read from
+# environment variables (same as the Supabase/OpenAI credentials in app.py) so
+# deployments can adjust them without code changes.
+import os
+
+# --- Extraction Cache ---
+# Directory where extracted CV/JD text is stored, keyed by a hash of the uploaded bytes.
+EXTRACTION_CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extraction"))
+# Upper bound for the on-disk size of the extraction cache (least recently used entries are evicted first).
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# --- Shared Worker Pool ---
+# Number of worker processes used for PDF/DOCX extraction and DOCX rendering (shared by all sessions).
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", str(max(1, os.cpu_count() or 1))))
+# Maximum number of jobs queued or running at once; further submissions wait for a free slot.
+WORKER_POOL_MAX_PENDING = int(os.environ.get("WORKER_POOL_MAX_PENDING", str(WORKER_POOL_SIZE * 8)))
+# How long a submission waits for a free queue slot before giving up.
+WORKER_POOL_SUBMIT_TIMEOUT_SECONDS = float(os.environ.get("WORKER_POOL_SUBMIT_TIMEOUT_SECONDS", "30"))
+# How long a caller waits for a submitted extraction or rendering job before giving up on it.
+WORKER_POOL_JOB_TIMEOUT_SECONDS = float(os.environ.get("WORKER_POOL_JOB_TIMEOUT_SECONDS", "300"))
+# Number of recent jobs kept for the timing statistics on the Admin Dashboard.
+WORKER_POOL_TIMING_WINDOW = int(os.environ.get("WORKER_POOL_TIMING_WINDOW", "500"))
+
+# --- OpenAI Analysis ---
+# Model and sampling temperature used for the comparative JD/CV analysis.
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TEMPERATURE = float(os.environ.get("OPENAI_TEMPERATURE", "0.2"))
+# Default analysis mode: "single" sends the JD and all CVs in one request, "map_reduce" scores each CV separately.
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "single")
+# Maximum number of concurrent per-CV scoring requests in map-reduce mode.
+MAP_REDUCE_CONCURRENCY = int(os.environ.get("MAP_REDUCE_CONCURRENCY", "8"))
+
+# --- Prompt Token Budget ---
+# Maximum number of input tokens for one analysis request (system prompt + JD + CVs).
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "100000"))
+# Largest fraction of the budget (after the system prompt) that the Job Description may use.
+PROMPT_JD_SHARE = float(os.environ.get("PROMPT_JD_SHARE", "0.2"))
+
+# --- AI Result Cache ---
+# How long a memoized AI analysis result stays valid, and how many results are kept in memory.
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+# --- Streaming ---
+# Whether the upload page streams AI results and shows each candidate as soon as it is evaluated (default for the checkbox).
+STREAM_RESULTS = os.environ.get("STREAM_RESULTS", "true").lower() in ("1", "true", "yes")
+
+# --- Background Analysis Jobs ---
+# SQLite database holding analysis job state, progress and results.
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(".cache", "analysis_jobs.sqlite3"))
+# Number of reviews that can run at the same time across all sessions.
+ANALYSIS_JOB_WORKERS = int(os.environ.get("ANALYSIS_JOB_WORKERS", "4"))
+# How often the upload page polls a running job, and how long finished jobs are kept.
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "1.5"))
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(7 * 24 * 60 * 60)))
+# Number of recent jobs listed on the upload page.
+RECENT_JOBS_SHOWN = int(os.environ.get("RECENT_JOBS_SHOWN", "10"))
+
+# --- OpenAI Rate Limiting ---
+# Process-wide limits shared by all sessions; set them slightly below the account's OpenAI limits.
+OPENAI_REQUESTS_PER_MINUTE = int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", "200000"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "16"))
+# Retry policy for 429s and transient errors (jittered exponential backoff, Retry-After honoured).
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE_SECONDS = float(os.environ.get("OPENAI_BACKOFF_BASE_SECONDS", "1"))
+OPENAI_BACKOFF_MAX_SECONDS = float(os.environ.get("OPENAI_BACKOFF_MAX_SECONDS", "60"))
+# Completion tokens assumed per request when reserving tokens-per-minute capacity.
+OPENAI_EXPECTED_COMPLETION_TOKENS = int(os.environ.get("OPENAI_EXPECTED_COMPLETION_TOKENS", "2000"))
+
+# --- Local Pre-Ranking ---
+# Default number of best-matching CVs (by local BM25 score against the JD) sent to the AI; 0 sends all.
+PRERANK_TOP_K = int(os.environ.get("PRERANK_TOP_K", "0"))
+
+# --- Candidate Vector Index ---
+# Every processed CV is embedded locally and kept here for cross-report search.
+CANDIDATE_INDEX_DIR = os.environ.get("CANDIDATE_INDEX_DIR", os.path.join(".cache", "candidate_index"))
+# Embedding size; changing it requires deleting the index directory.
+CANDIDATE_INDEX_DIM = int(os.environ.get("CANDIDATE_INDEX_DIM", "1024"))
+# Default number of matches shown by the admin candidate search.
+CANDIDATE_SEARCH_TOP_K = int(os.environ.get("CANDIDATE_SEARCH_TOP_K", "20"))
+
+# --- Criteria Comparison Table ---
+# "ai": the AI builds it alone (original behaviour); "context": the AI builds it from the skills
+# matcher's evidence; "local": built by the skills matcher, the AI skips it.
+CRITERIA_TABLE_MODE = os.environ.get("CRITERIA_TABLE_MODE", "ai")
+# Maximum number of JD requirements (rows) in the locally built table.
+CRITERIA_MAX_ROWS = int(os.environ.get("CRITERIA_MAX_ROWS", "15"))
+
+# --- Near-Duplicate Detection ---
+# CVs whose estimated text similarity (MinHash Jaccard) reaches this threshold are treated as the same CV.
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.85"))
+# Signatures of past uploads, used to flag candidates seen before.
+DEDUP_STORE_PATH = os.environ.get("DEDUP_STORE_PATH", os.path.join(".cache", "cv_fingerprints.sqlite3"))
+
+# --- DOCX Reports ---
+# When reports are rendered and saved to Supabase: "download" (the first time it is downloaded,
+# so reviews nobody downloads cost no rendering or upload) or "review" (as soon as the review
+# finishes, so every review appears in the report history).
+SAVE_REPORTS_ON = os.environ.get("SAVE_REPORTS_ON", "download")
+# Rendered reports are memoized by a hash of their content, so repeat downloads never re-render.
+DOCX_CACHE_MAX_ENTRIES = int(os.environ.get("DOCX_CACHE_MAX_ENTRIES", "64"))
+DOCX_CACHE_TTL_SECONDS = int(os.environ.get("DOCX_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# --- Supabase Storage ---
+# Maximum number of paths sent in one Storage remove([...]) request.
+STORAGE_REMOVE_BATCH_SIZE = int(os.environ.get("STORAGE_REMOVE_BATCH_SIZE", "1000"))
+
+# --- User Deletion ---
+# SQLite database recording the progress of user deletion cascades, so interrupted ones can be resumed.
+USER_DELETION_STORE_PATH = os.environ.get("USER_DELETION_STORE_PATH", os.path.join(".cache", "user_deletions.sqlite3"))
+# Number of deletion steps and Storage remove batches run at the same time.
+USER_DELETION_CONCURRENCY = int(os.environ.get("USER_DELETION_CONCURRENCY", "4"))
+# A running cascade whose progress record has not been updated for this long is taken to be
+# interrupted (e.g. by a server restart) and can be resumed; a fresher one cannot be started twice.
+USER_DELETION_STALE_SECONDS = int(os.environ.get("USER_DELETION_STALE_SECONDS", "300"))
+
+# --- Shared API Clients ---
+# Connection pool of the process-wide Supabase and OpenAI clients (see clients.py).
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Idle connections are closed after this many seconds; the health checks below keep the pools warm.
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY_SECONDS", "120"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+# Timeout of Supabase database and Storage requests.
+SUPABASE_HTTP_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_HTTP_TIMEOUT_SECONDS", "20"))
+# How often Supabase and OpenAI are pinged in the background; 0 disables the checks.
+CLIENT_HEALTH_CHECK_INTERVAL_SECONDS = float(os.environ.get("CLIENT_HEALTH_CHECK_INTERVAL_SECONDS", "60"))
+
+# --- Profiler ---
+# Times page renders and Supabase/OpenAI requests for the admin performance page (see profiler.py).
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Number of recent durations kept per span, and number of recent page renders listed.
+PROFILER_WINDOW_SIZE = int(os.environ.get("PROFILER_WINDOW_SIZE", "1000"))
+PROFILER_RECENT_RERUNS = int(os.environ.get("PROFILER_RECENT_RERUNS", "50"))
+
+# --- Logging ---
+# Minimum level written to stdout (DEBUG, INFO, WARNING, ERROR); see logging_config.py.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Third-party loggers kept at WARNING or above, whatever LOG_LEVEL is.
+LOG_QUIET_LOGGERS = [name.strip() for name in os.environ.get("LOG_QUIET_LOGGERS", "httpx,httpcore,hpack,openai,urllib3").split(",") if name.strip()]
+
+# --- Metrics ---
+# Port of the Prometheus /metrics endpoint (see metrics.py); 0 disables it.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+METRICS_BIND_ADDRESS = os.environ.get("METRICS_BIND_ADDRESS", "0.0.0.0")
@@ -0,0 +1,229 @@
+# --- Near-Duplicate CV Detection ---
+# Agencies often send the same CV twice under different filenames. Each CV text gets a
+# MinHash signature over its word 5-grams; signatures are split into LSH bands so only CVs
+# sharing a band bucket are compared. Duplicates inside one batch are collapsed before the
+# AI call, and signatures of processed CVs are kept in SQLite to recognise past uploads.
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import config
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard similarity almost always share a bucket
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+# Fixed seed: signatures are persisted, so the permutations must be identical in every process
+_random = np.random.RandomState(20240611)
+_PERM_A = _random.randint(1, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _random.randint(0, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingle_hashes(text):
+    """Returns the distinct 32-bit hashes of the text's word SHINGLE_SIZE-grams."""
+    words = _WORD_PATTERN.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little') for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+
+def minhash_signature(text):
+    """Returns the MinHash signature (NUM_PERMUTATIONS uint64 values) of text."""
+    hashes = _shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERMUTATIONS, _MERSENNE_PRIME, dtype=np.uint64)
+    # (a * x + b) mod p for every permutation and shingle at once; a, b < 2^31 and x < 2^32 cannot overflow
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of the two texts behind the signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+
+def lsh_buckets(signature):
+    """Returns one bucket key per LSH band of the signature."""
+    return [
+        hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+
+def find_batch_duplicates(texts, threshold):
+    """
+    Groups near-duplicate texts of one batch. Returns (groups, signatures): groups is a list of
+    index lists, one per distinct document, with the longest text first (it is the one to keep).
+    """
+    signatures = [minhash_signature(text) for text in texts]
+    parents = list(range(len(texts)))
+
+    def find_root(idx):
+        while parents[idx] != idx:
+            parents[idx] = parents[parents[idx]]
+            idx = parents[idx]
+        return idx
+
+    buckets = {}
+    for idx, signature in enumerate(signatures):
+        for band, bucket in enumerate(lsh_buckets(signature)):
+            buckets.setdefault((band, bucket), []).append(idx)
+    checked_pairs = set()
+    for members in buckets.values():
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                if (first, second) in checked_pairs:
+                    continue
+                checked_pairs.add((first, second))
+                if estimated_similarity(signatures[first], signatures[second]) >= threshold:
+                    parents[find_root(second)] = find_root(first)
+
+    groups = {}
+    for idx in range(len(texts)):
+        groups.setdefault(find_root(idx), []).append(idx)
+    ordered_groups = [sorted(members, key=lambda idx: -len(texts[idx] or "")) for members in groups.values()]
+    ordered_groups.sort(key=min)
+    return ordered_groups, signatures
+
+
+class FingerprintStore:
+    """SQLite store of MinHash signatures of past uploads, with an LSH band table for lookups. Thread-safe."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cv_fingerprints (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL,
+                    user_uid TEXT,
+                    jd_filename TEXT,
+                    signature BLOB NOT NULL,
+                    added_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS cv_fingerprint_bands (band INTEGER NOT NULL, bucket TEXT NOT NULL, fingerprint_id INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cv_fingerprint_bands_bucket_idx ON cv_fingerprint_bands (band, bucket)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return contextlib.closing(conn)
+
+    def find_matches(self, signature, threshold, user_uid=None):
+        """
+        Returns past uploads whose signature is at least threshold similar, best first, as dicts with a
+        'similarity'. If user_uid is given, only that user's uploads are searched.
+        """
+        band_conditions = " OR ".join("(band = ? AND bucket = ?)" for _ in range(LSH_BANDS))
+        band_params = [value for band, bucket in enumerate(lsh_buckets(signature)) for value in (band, bucket)]
+        user_condition = " AND user_uid = ?" if user_uid is not None else ""
+        user_params = [user_uid] if user_uid is not None else []
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM cv_fingerprints WHERE id IN (SELECT fingerprint_id FROM cv_fingerprint_bands WHERE {band_conditions}){user_condition}",
+                band_params + user_params
+            ).fetchall()
+        matches = []
+        for row in rows:
+            similarity = estimated_similarity(signature, np.frombuffer(row['signature'], dtype=np.uint64))
+            if similarity >= threshold:
+                match = dict(row)
+                match.pop('signature')
+                match['similarity'] = similarity
+                matches.append(match)
+        matches.sort(key=lambda match: -match['similarity'])
+        return matches
+
+    def add(self, filename, signature, user_uid=None, jd_filename=None):
+        with self._write_lock, self._connect() as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO cv_fingerprints (filename, user_uid, jd_filename, signature, added_at) VALUES (?, ?, ?, ?, ?)",
+                (filename, user_uid, jd_filename, signature.astype(np.uint64).tobytes(), datetime.now().isoformat())
+            )
+            conn.executemany(
+                "INSERT INTO cv_fingerprint_bands (band, bucket, fingerprint_id) VALUES (?, ?, ?)",
+                [(band, bucket, cursor.lastrowid) for band, bucket in enumerate(lsh_buckets(signature))]
+            )
+
+    def delete_user(self, user_uid):
+        """Deletes the fingerprints of every upload by the user. Returns the number deleted."""
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute("DELETE FROM cv_fingerprint_bands WHERE fingerprint_id IN (SELECT id FROM cv_fingerprints WHERE user_uid = ?)", (user_uid,))
+            return conn.execute("DELETE FROM cv_fingerprints WHERE user_uid = ?", (user_uid,)).rowcount
+
+
+def collapse_duplicate_cvs(all_candidates_data, threshold, store=None, user_uid=None, jd_filename=None, match_all_users=False):
+    """
+    Collapses near-duplicate CVs (dicts with 'filename' and 'text') of one batch into the most
+    complete copy, and, if a FingerprintStore is given, looks every kept CV up among past uploads
+    and records the ones not seen before. Past uploads are those of user_uid only, unless
+    match_all_users is set (admins), since their filenames usually name the candidate. Returns (kept_candidates, merged, previously_seen): merged lists
+    {'Kept CV', 'Merged Duplicate', 'Similarity'} rows; previously_seen lists
+    {'CV File', 'Earlier Upload', 'Reviewed For (JD)', 'Uploaded On', 'Similarity'} rows.
+    """
+    groups, signatures = find_batch_duplicates([cv_item['text'] for cv_item in all_candidates_data], threshold)
+    kept_indices = []
+    merged = []
+    previously_seen = []
+    for group in groups:
+        kept_idx = group[0]
+        kept_indices.append(kept_idx)
+        for duplicate_idx in group[1:]:
+            merged.append({
+                "Kept CV": all_candidates_data[kept_idx]['filename'],
+                "Merged Duplicate": all_candidates_data[duplicate_idx]['filename'],
+                "Similarity": f"{estimated_similarity(signatures[kept_idx], signatures[duplicate_idx]):.0%}",
+            })
+        if store is None:
+            continue
+        past_matches = store.find_matches(signatures[kept_idx], threshold, user_uid=None if match_all_users else user_uid)
+        if past_matches:
+            best_match = past_matches[0]
+            previously_seen.append({
+                "CV File": all_candidates_data[kept_idx]['filename'],
+                "Earlier Upload": best_match['filename'],
+                "Reviewed For (JD)": best_match['jd_filename'],
+                "Uploaded On": datetime.fromisoformat(best_match['added_at']).strftime('%Y-%m-%d'),
+                "Similarity": f"{best_match['similarity']:.0%}",
+            })
+        else:
+            store.add(all_candidates_data[kept_idx]['filename'], signatures[kept_idx], user_uid=user_uid, jd_filename=jd_filename)
+    # Keep the upload order for the rest of the pipeline
+    kept_candidates = [all_candidates_data[idx] for idx in sorted(kept_indices)]
+    return kept_candidates, merged, previously_seen
+
+
+_fingerprint_store = None
+_fingerprint_store_lock = threading.Lock()
+
+
+def get_fingerprint_store():
+    """Returns the process-wide FingerprintStore of past uploads, creating it on first use."""
+    global _fingerprint_store
+    if _fingerprint_store is None:
+        with _fingerprint_store_lock:
+            if _fingerprint_store is None:
+                _fingerprint_store = FingerprintStore(config.DEDUP_STORE_PATH)
+    return _fingerprint_store
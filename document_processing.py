@@ -0,0 +1,177 @@
+# --- Document Processing ---
+# Pure (Streamlit-free) text extraction and DOCX rendering. These functions only take
+# and return plain bytes/dicts so they can run inside worker processes (see worker_pool.py);
+# app.py wraps them with the user-facing error handling.
+import functools
+import io
+import re
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from PyPDF2 import PdfReader
+from docx import Document
+from docx.shared import Inches, Pt
+from docx.enum.section import WD_SECTION_START
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+# Bump this whenever the extraction logic below changes so cached text from the old extractors is not reused.
+EXTRACTOR_VERSION = "1"
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+
+def extract_text_from_pdf_bytes(file_bytes):
+    """Extracts text from PDF bytes using PyPDF2."""
+    reader = PdfReader(io.BytesIO(file_bytes))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() or ""
+    return text
+
+
+def extract_text_from_docx_bytes(file_bytes):
+    """Extracts text from DOCX bytes using python-docx."""
+    document = Document(io.BytesIO(file_bytes))
+    text = ""
+    for paragraph in document.paragraphs:
+        text += paragraph.text + "\n"
+    return text
+
+
+def extract_text(file_bytes, file_extension):
+    """Extracts text from a PDF, DOCX or TXT file given its raw bytes and lowercase extension."""
+    if file_extension == '.pdf':
+        return extract_text_from_pdf_bytes(file_bytes)
+    elif file_extension == '.docx':
+        return extract_text_from_docx_bytes(file_bytes)
+    elif file_extension == '.txt':
+        return file_bytes.decode('utf-8')
+    raise ValueError(f"Unsupported file type: {file_extension}. Only PDF, DOCX, TXT are supported.")
+
+
+# --- DOCX Report Rendering ---
+# Tables are written as one block of XML per table into a pre-styled template: the
+# "Report Table" style carries the borders, the 9pt font and the bold header row, so no
+# per-cell or per-run formatting is needed. benchmarks/benchmark_docx_render.py compares
+# this with the previous cell-by-cell renderer.
+# Bump whenever the report layout changes, so memoized reports from the old renderer are not reused.
+REPORT_RENDERER_VERSION = "2"
+REPORT_TABLE_STYLE = "Report Table"
+EVALUATION_COLUMNS = ["Candidate Name", "Match %", "Ranking", "Shortlist Probability", "Key Strengths", "Key Gaps", "Location Suitability", "Comments"]
+
+# Characters that are not allowed in XML (PDF extraction sometimes produces them)
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+@functools.lru_cache(maxsize=1)
+def _report_template_bytes():
+    """Builds the report template once per process: page margins and the 9pt 'Report Table' style with a bold, repeating header row."""
+    document = Document()
+
+    section = document.sections[0]
+    section.start_type = WD_SECTION_START.NEW_PAGE
+    section.left_margin = Inches(1)
+    section.right_margin = Inches(1)
+    section.top_margin = Inches(1)
+    section.bottom_margin = Inches(1)
+
+    table_style = document.styles.add_style(REPORT_TABLE_STYLE, WD_STYLE_TYPE.TABLE)
+    table_style.base_style = document.styles['Table Grid']
+    table_style.font.size = Pt(9)
+    table_style.element.append(parse_xml(
+        f'<w:tblStylePr {nsdecls("w")} w:type="firstRow">'
+        '<w:rPr><w:b/></w:rPr><w:tcPr><w:vAlign w:val="center"/></w:tcPr>'
+        '</w:tblStylePr>'
+    ))
+
+    template_io = io.BytesIO()
+    document.save(template_io)
+    return template_io.getvalue()
+
+
+def _cell_xml(value, width):
+    lines = _INVALID_XML_CHARS.sub("", str(value)).split("\n")
+    text_xml = "<w:br/>".join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in lines)
+    return f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr><w:p><w:r>{text_xml}</w:r></w:p></w:tc>'
+
+
+def _table_element(style_id, columns, rows, text_width):
+    """Builds a complete w:tbl element (header row plus one row per list of values) from a single XML string."""
+    column_width = text_width // max(len(columns), 1)
+    grid_xml = "".join(f'<w:gridCol w:w="{column_width}"/>' for _ in columns)
+    header_xml = '<w:tr><w:trPr><w:tblHeader/></w:trPr>' + "".join(_cell_xml(column, column_width) for column in columns) + '</w:tr>'
+    rows_xml = "".join('<w:tr>' + "".join(_cell_xml(value, column_width) for value in row) + '</w:tr>' for row in rows)
+    return parse_xml(
+        f'<w:tbl {nsdecls("w")}>'
+        f'<w:tblPr><w:tblStyle w:val="{style_id}"/><w:tblW w:w="0" w:type="auto"/>'
+        '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="0" w:lastColumn="0" w:noHBand="0" w:noVBand="1"/></w:tblPr>'
+        f'<w:tblGrid>{grid_xml}</w:tblGrid>{header_xml}{rows_xml}</w:tbl>'
+    )
+
+
+def _append_table(document, columns, rows):
+    section = document.sections[0]
+    text_width = int((section.page_width - section.left_margin - section.right_margin) / 635)  # EMU -> twips
+    table = _table_element(document.styles[REPORT_TABLE_STYLE].style_id, columns, rows, text_width)
+    body = document.element.body
+    if body.sectPr is not None:
+        body.sectPr.addprevious(table)
+    else:
+        body.append(table)
+
+
+def render_docx_report(comparative_data, jd_filename="Job Description", cv_filenames_str="Candidates"):
+    """
+    Renders the comparative analysis DOCX report and returns it as bytes.
+    Includes two tables and text sections.
+    """
+    document = Document(io.BytesIO(_report_template_bytes()))
+
+    document.add_heading("JD-CV Comparative Analysis Report", level=0)
+    document.add_paragraph().add_run("Generated by SSO Consultants AI").italic = True
+    document.add_paragraph().add_run(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}").small_caps = True
+    document.add_paragraph(f"Job Description: {jd_filename}\nCandidates: {cv_filenames_str}")
+    document.add_paragraph("\n")
+
+    candidate_evaluations_data = comparative_data.get("candidate_evaluations", [])
+    criteria_observations_data = comparative_data.get("criteria_observations", [])
+    additional_observations_text = comparative_data.get("additional_observations_text", "No general observations provided.")
+    final_shortlist_recommendation = comparative_data.get("final_shortlist_recommendation", "No final recommendation provided.")
+
+    if candidate_evaluations_data:
+        document.add_heading("🧾 Candidate Evaluation Table", level=1)
+        document.add_paragraph("Detailed assessment of each candidate against the Job Description:")
+        _append_table(
+            document,
+            EVALUATION_COLUMNS,
+            [[candidate.get(column, "N/A") for column in EVALUATION_COLUMNS] for candidate in candidate_evaluations_data]
+        )
+        document.add_paragraph("\n")
+
+    if criteria_observations_data:
+        document.add_heading("✅ Additional Observations (Criteria Comparison)", level=1)
+        # Columns in order of first appearance, as a DataFrame built from these rows would have them
+        criteria_columns = list(dict.fromkeys(column for observation in criteria_observations_data for column in observation))
+        _append_table(
+            document,
+            criteria_columns,
+            [[observation.get(column, "") for column in criteria_columns] for observation in criteria_observations_data]
+        )
+        document.add_paragraph("\n")
+
+    if additional_observations_text and additional_observations_text.strip() not in ["No general observations provided.", ""]:
+        document.add_heading("General Observations", level=2)
+        document.add_paragraph(additional_observations_text)
+        document.add_paragraph("\n")
+
+    if final_shortlist_recommendation and final_shortlist_recommendation.strip() not in ["No final recommendation provided.", ""]:
+        document.add_heading("📌 Final Shortlist Recommendation", level=1)
+        final_rec_para = document.add_paragraph()
+        final_rec_para.add_run(final_shortlist_recommendation).bold = True
+        document.add_paragraph("\n")
+
+    doc_io = io.BytesIO()
+    document.save(doc_io)
+    return doc_io.getvalue()
@@ -0,0 +1,160 @@
+# --- Content-Addressed Extraction Cache ---
+# Stores text extracted from uploaded JD/CV files on disk, keyed by a SHA-256 of the
+# raw file bytes plus the extractor version, so re-uploading the same document skips
+# PDF/DOCX parsing entirely. Lives in its own module (not app.py) because Streamlit
+# re-executes app.py on every rerun; module-level state here is created once per
+# server process and shared by all sessions.
+import hashlib
+import logging
+import os
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Persistent, size-bounded LRU cache of extracted document text.
+    Entries are plain UTF-8 files named after their key; file modification time
+    doubles as the LRU timestamp (touched on every hit), so the ordering survives restarts.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Computed lazily on first write
+
+    @staticmethod
+    def make_key(file_bytes, file_extension, extractor_version):
+        """Builds the cache key from the uploaded bytes, file type and extractor version."""
+        digest = hashlib.sha256()
+        digest.update(extractor_version.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(file_extension.lower().encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(file_bytes)
+        return digest.hexdigest()
+
+    def _path_for(self, key):
+        # Shard by the first two hex characters to keep directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key):
+        """Returns the cached text for key, or None on a miss."""
+        path = self._path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except (FileNotFoundError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path, None)  # Mark as most recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """Stores text under key and evicts least recently used entries if over budget."""
+        path = self._path_for(key)
+        data = text.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            existing_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Could not write cache entry %s: %s", key, e)
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total_bytes()
+            else:
+                self._total_bytes += len(data) - existing_size
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith('.txt'):
+                    yield os.path.join(shard_dir, name)
+
+    def _scan_total_bytes(self):
+        total = 0
+        for path in self._iter_entries():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def _evict_locked(self):
+        entries = []
+        for path in self._iter_entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()  # Oldest access first
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "size_bytes": self._total_bytes if self._total_bytes is not None else self._scan_total_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Returns the process-wide ExtractionCache, creating it on first use."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionCache(config.EXTRACTION_CACHE_DIR, config.EXTRACTION_CACHE_MAX_BYTES)
+                logger.debug("Extraction cache initialized at %s.", config.EXTRACTION_CACHE_DIR)
+    return _extraction_cache
@@ -0,0 +1,78 @@
+# --- Incremental JSON Parsing ---
+# Used when the comparative analysis is streamed from OpenAI: the response is one JSON
+# object, and we want each element of its "candidate_evaluations" array as soon as that
+# element's closing brace arrives, long before the whole document is complete.
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingArrayItemParser:
+    """
+    Incrementally scans a streamed JSON object and yields each complete object inside the
+    top-level array stored under array_key. Call feed() with every new chunk of text.
+    """
+
+    def __init__(self, array_key):
+        self.array_key = array_key
+        self._buffer = []          # Characters of the current array item being collected
+        self._depth = 0            # Current nesting depth ({ and [ both count)
+        self._in_string = False
+        self._escape = False
+        self._string_chars = []    # Content of the string currently being read at depth 1
+        self._last_string = None   # Most recent complete string at depth 1 (a candidate key)
+        self._current_key = None   # Key whose value is currently being read at depth 1
+        self._array_depth = None   # Depth inside the target array, once it has been entered
+        self._collecting = False
+        self.items_emitted = 0
+
+    def feed(self, chunk):
+        """Consumes a chunk of streamed text and returns the list of items completed by it."""
+        completed_items = []
+        for char in chunk:
+            if self._collecting:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    if self._depth == 1:
+                        self._string_chars.append(char)
+                elif char == '\\':
+                    self._escape = True
+                    if self._depth == 1:
+                        self._string_chars.append(char)
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = ''.join(self._string_chars)
+                elif self._depth == 1:
+                    self._string_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif char == ':' and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in '{[':
+                if char == '[' and self._depth == 1 and self._current_key == self.array_key:
+                    self._array_depth = self._depth + 1
+                elif char == '{' and self._array_depth is not None and self._depth == self._array_depth:
+                    self._collecting = True
+                    self._buffer = ['{']
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._collecting and char == '}' and self._depth == self._array_depth:
+                    self._collecting = False
+                    try:
+                        completed_items.append(json.loads(''.join(self._buffer)))
+                        self.items_emitted += 1
+                    except json.JSONDecodeError as e:
+                        logger.error("Could not parse streamed item: %s", e)
+                    self._buffer = []
+                elif char == ']' and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+        return completed_items
@@ -0,0 +1,81 @@
+# --- Structured Logging ---
+# Every module logs through its own logger (logging.getLogger(__name__)) with lazy
+# %-style arguments, so a message below LOG_LEVEL is dropped before it is formatted.
+# Records that pass are handed to a queue; a background listener thread turns them into
+# one JSON object per line on stdout, keeping serialization and I/O off the request path.
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+import config
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON line: time, level, logger, function, message, thread, extra fields and traceback."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _PreparingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Merges the message arguments and renders any traceback in the logging thread (they may
+    not survive until the listener gets to the record), leaving the JSON encoding to the listener.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """Installs the queue handler on the root logger and starts the listener. Safe to call on every rerun; only the first call does anything."""
+    global _listener
+    if _listener is not None:
+        return
+    with _configure_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+        listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+        listener.start()
+        atexit.register(listener.stop)
+
+        root_logger = logging.getLogger()
+        root_logger.addHandler(_PreparingQueueHandler(log_queue))
+        root_logger.setLevel(config.LOG_LEVEL)
+        # HTTP clients log every request at INFO/DEBUG; keep them at warnings unless asked for
+        for logger_name in config.LOG_QUIET_LOGGERS:
+            logging.getLogger(logger_name).setLevel(max(logging.WARNING, logging.getLevelName(config.LOG_LEVEL)))
+        _listener = listener
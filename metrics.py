@@ -0,0 +1,254 @@
+# --- Operational Metrics ---
+# Counters and latency histograms for the review pipeline (extraction, AI analysis, DOCX
+# rendering, Storage upload), OpenAI token usage and the admin pages' queries, kept in
+# memory for the lifetime of the server process. A small HTTP server on a daemon thread
+# serves them in the Prometheus text format at /metrics (port METRICS_PORT), so they can be
+# scraped without touching the Streamlit server. Example alert on p95 review latency:
+#
+#     histogram_quantile(0.95, sum by (le) (rate(review_duration_seconds_bucket[5m]))) > 120
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds; a review stage takes from milliseconds (dedup) to minutes (AI analysis)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_EXTRACTION = "extraction"
+STAGE_DEDUP = "dedup"
+STAGE_CANDIDATE_INDEX = "candidate_index"
+STAGE_PRERANK = "prerank"
+STAGE_AI_ANALYSIS = "ai_analysis"
+STAGE_DOCX_RENDER = "docx_render"
+STAGE_STORAGE_UPLOAD = "storage_upload"
+STAGE_SAVE_REPORT = "save_report"
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A named metric with a fixed set of label names, registered for render_metrics()."""
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label combination."""
+
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series]
+
+
+class Histogram(_Metric):
+    """Observed values (durations in seconds) counted into cumulative buckets per label combination."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts with a final +Inf bucket, the sum and the count
+                series = self._series[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["buckets"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, dict(values, buckets=list(values["buckets"]))) for key, values in self._series.items())
+        lines = self._header()
+        for key, values in series:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), values["buckets"]):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(upper_bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {values['count']}")
+        return lines
+
+
+REVIEW_DURATION_SECONDS = Histogram("review_duration_seconds", "Duration of a complete review, from text extraction to the saved report.", ["analysis_mode"])
+REVIEWS_TOTAL = Counter("reviews_total", "Reviews run, by analysis mode and outcome (success or failure).", ["analysis_mode", "outcome"])
+REVIEW_STAGE_SECONDS = Histogram("review_stage_duration_seconds", "Duration of each stage of the review pipeline.", ["stage"])
+REVIEW_STAGE_FAILURES = Counter("review_stage_failures_total", "Review pipeline stages that failed.", ["stage"])
+OPENAI_TOKENS = Counter("openai_tokens_total", "OpenAI tokens used by the AI analysis, by model and kind (prompt, completion, or cached: the part of prompt served from the prompt cache).", ["model", "kind"])
+AI_JSON_DECODE_FAILURES = Counter("ai_json_decode_failures_total", "AI replies that were not valid JSON, by analysis step (single, map or reduce).", ["step"])
+ADMIN_QUERY_SECONDS = Histogram("admin_query_duration_seconds", "Duration of the admin pages' database, Storage and search queries.", ["query"])
+ADMIN_QUERY_FAILURES = Counter("admin_query_failures_total", "Admin page queries that raised an error.", ["query"])
+
+
+class _Timing:
+    """Handle yielded by timed(); call fail() to count the timed block as failed without raising."""
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+@contextlib.contextmanager
+def timed(histogram, failures, **labels):
+    """Observes the duration of the enclosed block in histogram, and counts it in failures if it raises or calls fail()."""
+    timing = _Timing()
+    started = time.perf_counter()
+    try:
+        yield timing
+    except Exception:
+        timing.failed = True
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+        if timing.failed:
+            failures.inc(**labels)
+
+
+def track_stage(stage):
+    """Times one stage of the review pipeline (see the STAGE_* names)."""
+    return timed(REVIEW_STAGE_SECONDS, REVIEW_STAGE_FAILURES, stage=stage)
+
+
+def track_admin_query(query):
+    """Times one admin page query, e.g. 'list_users'."""
+    return timed(ADMIN_QUERY_SECONDS, ADMIN_QUERY_FAILURES, query=query)
+
+
+def record_token_usage(usage, model):
+    """Counts the prompt, completion and cached prompt tokens of an OpenAI response's usage (ignored if the API returned none)."""
+    if usage is None:
+        return
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    OPENAI_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    OPENAI_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+    OPENAI_TOKENS.inc(getattr(prompt_details, "cached_tokens", None) or 0, model=model, kind="cached")
+
+
+def render_metrics():
+    """Returns every metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes arrive every few seconds; keep them out of the application log
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server():
+    """
+    Starts the /metrics endpoint on config.METRICS_PORT (0 disables it). Safe to call on every rerun;
+    only the first call does anything. If the port is taken (e.g. by another app process), the error
+    is logged and the app runs without the endpoint.
+    """
+    global _server
+    if _server is not None or config.METRICS_PORT <= 0:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            server = ThreadingHTTPServer((config.METRICS_BIND_ADDRESS, config.METRICS_PORT), _MetricsRequestHandler)
+        except OSError as e:
+            logger.error("Could not start the metrics endpoint on %s:%s: %s", config.METRICS_BIND_ADDRESS, config.METRICS_PORT, e)
+            # Do not retry on every rerun
+            _server = False
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        _server = server
+        logger.info("Serving metrics on http://%s:%s/metrics", config.METRICS_BIND_ADDRESS, config.METRICS_PORT)
@@ -0,0 +1,234 @@
+# --- OpenAI Rate Limiting ---
+# Process-wide guard around every OpenAI request: token buckets for requests per minute
+# and tokens per minute, a cap on concurrent requests, and retries with jittered
+# exponential backoff that honours the server's Retry-After header. All sessions and
+# background jobs share one limiter, so bursts are smoothed instead of turning into 429s.
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _retryable_errors():
+    """
+    Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses.
+    openai is imported here rather than at the top because it is slow to import and
+    this module is loaded on every page; an except clause only evaluates this on an error.
+    """
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at per_minute / 60 units per second, holding at most
+    per_minute units. reserve() takes units immediately (the balance may go negative) and
+    returns how long the caller must wait before using them, which keeps callers in FIFO order.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate_per_second = per_minute / 60.0
+        self._available = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def reserve(self, amount):
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill_locked()
+            self._available -= amount
+            if self._available >= 0:
+                return 0.0
+            return -self._available / self.rate_per_second
+
+    def adjust(self, delta):
+        """Corrects an earlier reservation once the real cost is known (positive delta = more was used)."""
+        with self._lock:
+            self._refill_locked()
+            self._available = min(self.capacity, self._available - delta)
+
+
+def _retry_after_seconds(error):
+    """Reads Retry-After (or OpenAI's retry-after-ms) from an API error's response, if present."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class OpenAIRateLimiter:
+    """Request/token rate limiting, concurrency cap and retry/backoff for OpenAI calls."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, max_retries, backoff_base_seconds, backoff_max_seconds):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.counters = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "throttled": 0,
+            "throttle_wait_seconds": 0.0,
+            "retries": 0,
+            "rate_limit_errors": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _reserve(self, estimated_tokens):
+        wait_seconds = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimated_tokens))
+        if wait_seconds > 0:
+            self._count("throttled")
+            self._count("throttle_wait_seconds", wait_seconds)
+        return wait_seconds
+
+    def _backoff_seconds(self, attempt, error):
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_seconds)
+        # "Full jitter": a random delay up to the exponential backoff ceiling
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt)))
+
+    def _reconcile(self, response, estimated_tokens):
+        usage = getattr(response, 'usage', None)
+        total_tokens = getattr(usage, 'total_tokens', None)
+        if total_tokens is not None:
+            self.token_bucket.adjust(total_tokens - estimated_tokens)
+
+    def _on_retryable_error(self, attempt, error):
+        import openai
+        if isinstance(error, openai.RateLimitError):
+            self._count("rate_limit_errors")
+        if attempt >= self.max_retries:
+            self._count("failed")
+            return None
+        self._count("retries")
+        delay = self._backoff_seconds(attempt, error)
+        logger.debug("%s on attempt %s, retrying in %.1fs.", type(error).__name__, attempt + 1, delay)
+        return delay
+
+    def call(self, request_fn, estimated_tokens):
+        """Runs request_fn() under the limits, retrying retryable errors. Returns its result or raises the last error."""
+        self._count("requests")
+        attempt = 0
+        while True:
+            wait_seconds = self._reserve(estimated_tokens)
+            if wait_seconds > 0:
+                time.sleep(wait_seconds)
+            with self._slots:
+                with self._lock:
+                    self._in_flight += 1
+                try:
+                    response = request_fn()
+                except _retryable_errors() as e:
+                    delay = self._on_retryable_error(attempt, e)
+                    if delay is None:
+                        raise
+                except Exception:
+                    self._count("failed")
+                    raise
+                else:
+                    self._count("succeeded")
+                    self._reconcile(response, estimated_tokens)
+                    return response
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+            time.sleep(delay)
+            attempt += 1
+
+    async def _acquire_slot_async(self):
+        # The semaphore is shared with threads, so poll it instead of blocking the event loop
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+
+    async def call_async(self, request_coro_fn, estimated_tokens):
+        """Async counterpart of call(): awaits request_coro_fn() under the same process-wide limits."""
+        self._count("requests")
+        attempt = 0
+        while True:
+            wait_seconds = self._reserve(estimated_tokens)
+            if wait_seconds > 0:
+                await asyncio.sleep(wait_seconds)
+            await self._acquire_slot_async()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                response = await request_coro_fn()
+            except _retryable_errors() as e:
+                delay = self._on_retryable_error(attempt, e)
+                if delay is None:
+                    raise
+            except Exception:
+                self._count("failed")
+                raise
+            else:
+                self._count("succeeded")
+                self._reconcile(response, estimated_tokens)
+                return response
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._slots.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = self._in_flight
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_openai_rate_limiter():
+    """Returns the process-wide OpenAIRateLimiter, creating it on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = OpenAIRateLimiter(
+                    requests_per_minute=config.OPENAI_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=config.OPENAI_TOKENS_PER_MINUTE,
+                    max_concurrency=config.OPENAI_MAX_CONCURRENCY,
+                    max_retries=config.OPENAI_MAX_RETRIES,
+                    backoff_base_seconds=config.OPENAI_BACKOFF_BASE_SECONDS,
+                    backoff_max_seconds=config.OPENAI_BACKOFF_MAX_SECONDS
+                )
+    return _rate_limiter
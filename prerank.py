@@ -0,0 +1,85 @@
+# --- Local CV Pre-Ranker ---
+# Scores extracted CV texts against the JD text with Okapi BM25, computed with NumPy over
+# a document-term matrix restricted to the JD's vocabulary. Ranking a few hundred CVs
+# takes milliseconds, so only the most relevant CVs need to be sent to the (slow, billed) LLM.
+import re
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves etc per within across using use used also well able must shall may
+job role candidate candidates position company work working years year experience required requirements responsibilities
+""".split())
+
+
+def tokenize(text):
+    """Lowercases text and splits it into word tokens (keeping terms like c++, c#, .net, node.js), dropping stopwords."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def bm25_scores(query_text, documents):
+    """
+    Returns a NumPy array with the BM25 score of each document text against query_text.
+    Query terms are weighted by how often they occur in the query (log-damped), so skills the
+    JD repeats count for more.
+    """
+    if not documents:
+        return np.zeros(0)
+
+    query_tokens = tokenize(query_text)
+    vocabulary = {}
+    for token in query_tokens:
+        vocabulary.setdefault(token, len(vocabulary))
+    if not vocabulary:
+        return np.zeros(len(documents))
+
+    query_ids = np.fromiter((vocabulary[token] for token in query_tokens), dtype=np.int64)
+    query_weights = np.log1p(np.bincount(query_ids, minlength=len(vocabulary)))
+
+    term_frequencies = np.zeros((len(documents), len(vocabulary)), dtype=np.float64)
+    document_lengths = np.zeros(len(documents), dtype=np.float64)
+    for row, document in enumerate(documents):
+        document_tokens = tokenize(document or "")
+        document_lengths[row] = len(document_tokens)
+        token_ids = [vocabulary[token] for token in document_tokens if token in vocabulary]
+        if token_ids:
+            term_frequencies[row] = np.bincount(np.asarray(token_ids, dtype=np.int64), minlength=len(vocabulary))
+
+    num_documents = len(documents)
+    document_frequencies = (term_frequencies > 0).sum(axis=0)
+    idf = np.log1p((num_documents - document_frequencies + 0.5) / (document_frequencies + 0.5))
+
+    average_length = document_lengths.mean() or 1.0
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * document_lengths / average_length)
+    saturated = term_frequencies * (BM25_K1 + 1) / (term_frequencies + length_norm[:, None])
+    return saturated @ (idf * query_weights)
+
+
+def prerank_candidates(jd_text, all_candidates_data):
+    """
+    Scores every CV in all_candidates_data (dicts with 'filename' and 'text') against the JD.
+    Returns a list of {'filename', 'Pre-Score', 'Pre-Rank'} dicts sorted best first, where
+    Pre-Score is scaled so the best CV scores 100.
+    """
+    raw_scores = bm25_scores(jd_text, [cv_item['text'] for cv_item in all_candidates_data])
+    max_score = raw_scores.max() if raw_scores.size else 0.0
+    scaled_scores = raw_scores / max_score * 100 if max_score > 0 else raw_scores
+    order = np.argsort(-scaled_scores, kind='stable')
+    return [
+        {
+            'filename': all_candidates_data[idx]['filename'],
+            'Pre-Score': round(float(scaled_scores[idx]), 1),
+            'Pre-Rank': rank + 1,
+        }
+        for rank, idx in enumerate(order)
+    ]
@@ -0,0 +1,235 @@
+# --- Hot-Path Profiler ---
+# Times every page rendered by main() and every Supabase (database, Storage, Auth) and OpenAI
+# request in named spans, and keeps the most recent durations of each span in memory so the
+# admin performance page can show percentiles. Spans opened while a page renders are also
+# attached to that rerun, giving a per-rerun breakdown. An admin can ask for a full cProfile
+# capture of the next rerun of a page.
+import collections
+import contextlib
+import contextvars
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SPAN_PAGE = "page"
+SPAN_SUPABASE = "supabase"
+SPAN_STORAGE = "storage"
+SPAN_AUTH = "auth"
+SPAN_OPENAI = "openai"
+
+CAPTURE_ANY_PAGE = None
+PROFILE_STATS_LINES = 60
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames in these files are plumbing, not call sites
+_PLUMBING_FILES = {os.path.join(_REPO_DIR, name) for name in ("profiler.py", "clients.py", "openai_limiter.py")}
+
+# Spans of the rerun being rendered in the current thread (None outside a page)
+_current_rerun = contextvars.ContextVar("current_rerun", default=None)
+
+
+def caller_name(skip=1):
+    """Returns the name of the nearest function in this repository that led to the current call (e.g. 'review_reports_page')."""
+    frame = sys._getframe(skip + 1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_REPO_DIR) and "site-packages" not in filename and filename not in _PLUMBING_FILES and frame.f_code.co_name not in ("<lambda>", "<module>", "<listcomp>", "<genexpr>"):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "unknown"
+
+
+class Profiler:
+    """Rolling per-span durations, recent rerun breakdowns and on-demand cProfile captures. Thread-safe."""
+
+    def __init__(self, window_size, recent_reruns, enabled=True):
+        self.enabled = enabled
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._recent_reruns = collections.deque(maxlen=recent_reruns)
+        self._capture_page = None
+        self._capture_requested = False
+        self.last_capture = None
+
+    def record(self, kind, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            durations = self._durations.get((kind, name))
+            if durations is None:
+                durations = self._durations[(kind, name)] = collections.deque(maxlen=self.window_size)
+            durations.append(seconds * 1000)
+        rerun_spans = _current_rerun.get()
+        if rerun_spans is not None and kind != SPAN_PAGE:
+            rerun_spans.append((kind, name, seconds * 1000))
+
+    @contextlib.contextmanager
+    def span(self, kind, name):
+        """Times the enclosed block as one span of the given kind ('supabase', 'openai', ...) and name (the call site)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - started)
+
+    def request_capture(self, page=CAPTURE_ANY_PAGE):
+        """Asks for a cProfile capture of the next rerun of page (any page if None)."""
+        with self._lock:
+            self._capture_requested = True
+            self._capture_page = page
+
+    def cancel_capture(self):
+        with self._lock:
+            self._capture_requested = False
+
+    def capture_pending(self):
+        """Returns (requested, page) of the pending capture request."""
+        with self._lock:
+            return self._capture_requested, self._capture_page
+
+    def _claim_capture(self, page):
+        with self._lock:
+            if self._capture_requested and self._capture_page in (CAPTURE_ANY_PAGE, page):
+                self._capture_requested = False
+                return True
+            return False
+
+    @contextlib.contextmanager
+    def page(self, page_name):
+        """Times one page render, collects the spans it opens, and runs it under cProfile if a capture was requested."""
+        if not self.enabled:
+            yield
+            return
+        rerun_spans = []
+        token = _current_rerun.set(rerun_spans)
+        profile = cProfile.Profile() if self._claim_capture(page_name) else None
+        started = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+            _current_rerun.reset(token)
+            self.record(SPAN_PAGE, page_name, elapsed)
+            with self._lock:
+                self._recent_reruns.append({
+                    "at": datetime.now(),
+                    "page": page_name,
+                    "total_ms": elapsed * 1000,
+                    "spans": rerun_spans,
+                })
+            if profile is not None:
+                self._store_capture(page_name, profile, elapsed)
+
+    def _store_capture(self, page_name, profile, elapsed):
+        stats_text = io.StringIO()
+        pstats.Stats(profile, stream=stats_text).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+        profile.create_stats()
+        self.last_capture = {
+            "page": page_name,
+            "captured_at": datetime.now(),
+            "total_ms": elapsed * 1000,
+            "stats_text": stats_text.getvalue(),
+            # Same format as cProfile's dump_stats(), readable by pstats and snakeviz
+            "prof_bytes": marshal.dumps(profile.stats),
+        }
+        logger.debug("Captured a cProfile dump of '%s' (%.0f ms).", page_name, elapsed * 1000)
+
+    def summary(self, kinds=None):
+        """Returns one row per span (optionally only of the given kinds) with its count and p50/p95/p99/max in ms, slowest p95 first."""
+        with self._lock:
+            snapshot = [(kind, name, np.fromiter(durations, dtype=np.float64)) for (kind, name), durations in self._durations.items() if kinds is None or kind in kinds]
+        rows = []
+        for kind, name, durations in snapshot:
+            p50, p95, p99 = (float(value) for value in np.percentile(durations, [50, 95, 99]))
+            rows.append({"kind": kind, "name": name, "count": len(durations), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": float(durations.max())})
+        rows.sort(key=lambda row: -row["p95_ms"])
+        return rows
+
+    def recent_reruns(self):
+        """Returns the most recent page renders, newest first, each with its total and per-kind span times."""
+        with self._lock:
+            reruns = list(self._recent_reruns)
+        rows = []
+        for rerun in reversed(reruns):
+            per_kind = collections.Counter()
+            for kind, _, duration_ms in rerun["spans"]:
+                per_kind[kind] += duration_ms
+            rows.append({
+                "at": rerun["at"],
+                "page": rerun["page"],
+                "total_ms": rerun["total_ms"],
+                "spans": len(rerun["spans"]),
+                **{f"{kind}_ms": per_kind.get(kind, 0.0) for kind in (SPAN_SUPABASE, SPAN_STORAGE, SPAN_AUTH, SPAN_OPENAI)},
+            })
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._recent_reruns.clear()
+
+
+def _supabase_span(request):
+    """Maps a Supabase HTTP request to (kind, name), e.g. ('supabase', 'GET jd_cv_reports @ review_reports_page')."""
+    path_parts = request.url.path.strip("/").split("/")
+    service = path_parts[0] if path_parts else ""
+    if service == "rest":
+        kind, target = SPAN_SUPABASE, "/".join(path_parts[2:4])
+    elif service == "storage":
+        kind, target = SPAN_STORAGE, "/".join(path_parts[2:4])
+    elif service == "auth":
+        kind, target = SPAN_AUTH, "/".join(path_parts[2:3])
+    else:
+        kind, target = SPAN_SUPABASE, request.url.path
+    return kind, f"{request.method} {target} @ {caller_name(skip=2)}"
+
+
+class ProfiledTransport(httpx.BaseTransport):
+    """httpx transport that times every Supabase request, including reading the response body, as a profiler span."""
+
+    def __init__(self, transport, profiler):
+        self._transport = transport
+        self._profiler = profiler
+
+    def handle_request(self, request):
+        kind, name = _supabase_span(request)
+        with self._profiler.span(kind, name):
+            response = self._transport.handle_request(request)
+            response.read()
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """Returns the process-wide Profiler, creating it on first use."""
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = Profiler(config.PROFILER_WINDOW_SIZE, config.PROFILER_RECENT_RERUNS, enabled=config.PROFILER_ENABLED)
+    return _profiler
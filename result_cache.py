@@ -0,0 +1,101 @@
+# --- AI Result Cache ---
+# Memoizes parsed comparative-analysis results in memory, keyed by a fingerprint of
+# everything that determines the answer (JD/CV texts, model, temperature, prompt version...),
+# so re-running an identical review after a page refresh returns instantly without another
+# billed OpenAI call. Shared by all sessions of the server process.
+import collections
+import copy
+import hashlib
+import json
+import threading
+import time
+
+import config
+
+
+def make_fingerprint(**inputs):
+    """Builds a stable SHA-256 fingerprint from JSON-serializable keyword arguments."""
+    canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries also expire after ttl_seconds."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns a copy of the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate what they get back, so never hand out the stored object
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_analysis_result_cache = None
+_analysis_result_cache_lock = threading.Lock()
+
+
+def get_analysis_result_cache():
+    """Returns the process-wide cache of AI analysis results, creating it on first use."""
+    global _analysis_result_cache
+    if _analysis_result_cache is None:
+        with _analysis_result_cache_lock:
+            if _analysis_result_cache is None:
+                _analysis_result_cache = TTLCache(config.RESULT_CACHE_MAX_ENTRIES, config.RESULT_CACHE_TTL_SECONDS)
+    return _analysis_result_cache
+
+
+_docx_report_cache = None
+_docx_report_cache_lock = threading.Lock()
+
+
+def get_docx_report_cache():
+    """Returns the process-wide cache of rendered DOCX reports (bytes), creating it on first use."""
+    global _docx_report_cache
+    if _docx_report_cache is None:
+        with _docx_report_cache_lock:
+            if _docx_report_cache is None:
+                _docx_report_cache = TTLCache(config.DOCX_CACHE_MAX_ENTRIES, config.DOCX_CACHE_TTL_SECONDS)
+    return _docx_report_cache
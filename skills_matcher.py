@@ -0,0 +1,192 @@
+# --- Skills Matcher ---
+# Builds the criteria comparison table (✅/❌/⚠️ per JD requirement and candidate) locally
+# and deterministically. The JD's requirements are the taxonomy skills it mentions; every
+# CV is then scanned once with an Aho-Corasick automaton holding all skill aliases, so the
+# cost grows with the text length, not with the number of skills.
+import functools
+import re
+from collections import deque
+
+# Bump when SKILLS_TAXONOMY changes, so saved AI results built on the old table are not reused
+SKILLS_TAXONOMY_VERSION = "1"
+
+FIT = "✅"
+PARTIAL_FIT = "⚠️"
+NO_FIT = "❌"
+
+# Criteria label -> aliases that count as direct evidence, and related terms that count as partial evidence
+SKILLS_TAXONOMY = {
+    # Education
+    "Education: MBA / PGDM (HR)": {"aliases": ["mba hr", "mba in hr", "mba human resource", "mba human resources", "mba in human resource", "mba in human resources", "pgdm hr", "pgdm in hr", "pgdbm hr", "mhrm", "masters in human resource", "master of human resource"], "related": ["mba", "pgdm", "msw", "mlw"]},
+    "Education: MBA / PGDM": {"aliases": ["mba", "pgdm", "pgdbm", "master of business administration"], "related": ["bba", "bms"]},
+    "Education: Engineering Degree": {"aliases": ["b tech", "btech", "b e", "bachelor of engineering", "bachelor of technology", "m tech", "mtech"], "related": ["diploma in engineering", "bsc", "mca", "bca"]},
+    "Education: CA / CMA / CFA": {"aliases": ["chartered accountant", "ca final", "cma", "icwa", "cfa"], "related": ["ca inter", "company secretary", "m com", "mcom"]},
+    # Human resources and talent acquisition
+    "Recruitment / Talent Acquisition": {"aliases": ["talent acquisition", "recruitment", "recruiting", "recruiter", "end to end recruitment", "full cycle recruitment"], "related": ["hiring", "sourcing", "screening", "staffing", "headhunting", "executive search"]},
+    "Sourcing (Job Portals / LinkedIn)": {"aliases": ["naukri", "linkedin recruiter", "monster", "job portals", "boolean search", "headhunting", "sourcing"], "related": ["linkedin", "referrals", "campus hiring"]},
+    "Campus Hiring": {"aliases": ["campus hiring", "campus recruitment", "campus drives", "university hiring"], "related": ["fresher hiring", "internship"]},
+    "HR Business Partnering": {"aliases": ["hrbp", "hr business partner", "business partnering"], "related": ["generalist", "employee relations"]},
+    "Payroll & Compliance": {"aliases": ["payroll", "statutory compliance", "pf", "esic", "labour law", "labour laws", "labor law"], "related": ["compensation", "attendance", "time office"]},
+    "Compensation & Benefits": {"aliases": ["compensation and benefits", "c&b", "compensation", "benefits administration", "salary benchmarking"], "related": ["payroll", "rewards"]},
+    "Performance Management": {"aliases": ["performance management", "pms", "appraisal", "appraisals", "kra", "okr", "okrs"], "related": ["goal setting", "feedback"]},
+    "Employee Relations / Engagement": {"aliases": ["employee relations", "employee engagement", "industrial relations", "grievance handling"], "related": ["retention", "exit interviews", "culture"]},
+    "Learning & Development": {"aliases": ["learning and development", "l&d", "training and development", "training needs analysis", "tna"], "related": ["training", "coaching", "mentoring"]},
+    "Onboarding": {"aliases": ["onboarding", "on boarding", "induction"], "related": ["joining formalities", "documentation"]},
+    "HRMS / HRIS": {"aliases": ["hrms", "hris", "workday", "successfactors", "darwinbox", "keka", "greythr", "zoho people", "oracle hcm"], "related": ["ats", "excel"]},
+    "SAP HR / HCM": {"aliases": ["sap hr", "sap hcm", "sap successfactors", "successfactors"], "related": ["sap"]},
+    # Technology
+    "Python": {"aliases": ["python"], "related": ["django", "flask", "fastapi", "pandas"]},
+    "Java": {"aliases": ["java", "j2ee", "spring boot"], "related": ["kotlin", "scala"]},
+    "JavaScript / TypeScript": {"aliases": ["javascript", "typescript", "node js", "nodejs", "react", "angular", "vue"], "related": ["html", "css", "jquery"]},
+    ".NET / C#": {"aliases": ["c#", "dot net", "asp net", "net core"], "related": ["vb net"]},
+    "SQL / Databases": {"aliases": ["sql", "mysql", "postgresql", "postgres", "oracle database", "sql server", "pl sql"], "related": ["mongodb", "nosql", "database"]},
+    "Cloud (AWS / Azure / GCP)": {"aliases": ["aws", "amazon web services", "azure", "gcp", "google cloud"], "related": ["cloud", "kubernetes", "docker"]},
+    "DevOps / CI-CD": {"aliases": ["devops", "ci cd", "jenkins", "kubernetes", "docker", "terraform", "github actions"], "related": ["git", "linux", "ansible"]},
+    "Data Analysis / BI": {"aliases": ["data analysis", "data analytics", "power bi", "tableau", "looker"], "related": ["excel", "sql", "reporting", "dashboards"]},
+    "Machine Learning / AI": {"aliases": ["machine learning", "deep learning", "artificial intelligence", "nlp", "computer vision", "tensorflow", "pytorch", "scikit learn"], "related": ["data science", "statistics", "python"]},
+    "SAP (ERP)": {"aliases": ["sap fico", "sap mm", "sap sd", "sap pp", "sap abap", "s 4hana", "s4hana", "sap erp"], "related": ["sap", "erp", "oracle apps"]},
+    "Software Testing / QA": {"aliases": ["software testing", "quality assurance", "qa", "selenium", "test automation", "manual testing"], "related": ["testing", "jira"]},
+    # Finance, sales and operations
+    "Accounting & Finance": {"aliases": ["accounting", "accounts payable", "accounts receivable", "general ledger", "financial reporting", "finalisation of accounts", "finalization of accounts"], "related": ["tally", "finance", "audit"]},
+    "Taxation (GST / TDS)": {"aliases": ["gst", "tds", "income tax", "direct tax", "indirect tax", "taxation"], "related": ["tax", "compliance"]},
+    "Audit": {"aliases": ["internal audit", "statutory audit", "audit"], "related": ["sox", "internal controls", "risk"]},
+    "Sales / Business Development": {"aliases": ["business development", "sales", "b2b sales", "key account management", "lead generation"], "related": ["client acquisition", "revenue", "targets", "crm"]},
+    "Marketing": {"aliases": ["digital marketing", "marketing", "seo", "sem", "social media marketing", "brand management"], "related": ["content", "campaigns", "google ads"]},
+    "Customer Service": {"aliases": ["customer service", "customer support", "customer success", "client servicing"], "related": ["call center", "bpo", "helpdesk"]},
+    "Supply Chain / Procurement": {"aliases": ["supply chain", "procurement", "purchase", "vendor management", "logistics", "inventory management"], "related": ["warehouse", "sourcing"]},
+    "Project Management": {"aliases": ["project management", "pmp", "prince2", "project manager", "program management"], "related": ["agile", "scrum", "stakeholder management"]},
+    "Agile / Scrum": {"aliases": ["agile", "scrum", "scrum master", "kanban"], "related": ["jira", "sprint"]},
+    "Team Leadership": {"aliases": ["team lead", "team leader", "team management", "people management", "managed a team", "leading a team"], "related": ["mentoring", "supervised", "leadership"]},
+    "Stakeholder Management": {"aliases": ["stakeholder management", "client management", "stakeholder engagement"], "related": ["communication", "coordination"]},
+    "MS Excel / Office": {"aliases": ["advanced excel", "ms excel", "excel", "vlookup", "pivot tables", "ms office"], "related": ["powerpoint", "word", "google sheets"]},
+    "Communication Skills": {"aliases": ["communication skills", "excellent communication", "verbal and written communication"], "related": ["presentation", "interpersonal"]},
+}
+
+_NORMALIZE_PATTERN = re.compile(r"[^a-z0-9+#&]+")
+
+
+def normalize_text(text):
+    """Lowercases text and collapses everything except letters, digits, +, # and & into single spaces, padded with one space each side."""
+    return f" {_NORMALIZE_PATTERN.sub(' ', (text or '').lower()).strip()} "
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton: finds all occurrences of many patterns in one left-to-right pass over a text."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+    def add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(pattern), value))
+
+    def build(self):
+        """Computes the failure links; call once after all patterns were added."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+        return self
+
+    def iter_matches(self, text):
+        """Yields (start, end, value) for every pattern occurrence in text."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._outputs[state]:
+                yield position + 1 - length, position + 1, value
+
+
+@functools.lru_cache(maxsize=1)
+def _get_taxonomy_automaton():
+    """Builds (once per process) the automaton over every normalized taxonomy alias, padded so matches are whole words."""
+    automaton = AhoCorasick()
+    for criteria, terms in SKILLS_TAXONOMY.items():
+        for evidence_kind in ("aliases", "related"):
+            for term in terms[evidence_kind]:
+                automaton.add(normalize_text(term), (criteria, evidence_kind, term))
+    return automaton.build()
+
+
+def scan_text(text):
+    """
+    Scans text for every taxonomy term. Returns {criteria: {"aliases": [...], "related": [...], "first_position": int}}
+    with the distinct terms found, for each criteria with at least one match.
+    """
+    # Leftmost-longest: a term inside a longer matched term ("mba" in "mba in hr") does not count separately.
+    # Patterns are space-padded, so neighbouring words share one space; compare spans without it.
+    matches = sorted(_get_taxonomy_automaton().iter_matches(normalize_text(text)), key=lambda match: (match[0], match[0] - match[1]))
+    found = {}
+    kept_span = (0, 0)
+    for start, end, (criteria, evidence_kind, term) in matches:
+        # The same term may belong to several criteria; those matches share the kept span
+        if (start, end) != kept_span:
+            if start + 1 < kept_span[1] - 1:
+                continue
+            kept_span = (start, end)
+        entry = found.setdefault(criteria, {"aliases": [], "related": [], "first_position": start})
+        if term not in entry[evidence_kind]:
+            entry[evidence_kind].append(term)
+    return found
+
+
+def extract_jd_criteria(jd_text, max_criteria):
+    """Returns the taxonomy criteria the JD asks for (named directly), in order of first mention, at most max_criteria."""
+    jd_matches = scan_text(jd_text)
+    direct_matches = [(entry["first_position"], criteria) for criteria, entry in jd_matches.items() if entry["aliases"]]
+    return [criteria for _, criteria in sorted(direct_matches)][:max_criteria]
+
+
+def build_criteria_matrix(jd_text, candidates, max_criteria=15):
+    """
+    Builds the criteria comparison for candidates, a list of (candidate_name, cv_text) pairs.
+    Returns (rows, evidence): rows have the same shape as the AI's "criteria_observations"
+    ({"Criteria": ..., "<candidate name>": "✅/⚠️/❌"}); evidence maps each candidate name to
+    {criteria: [matched terms]} for the criteria where something was found. rows is empty
+    when the JD names no taxonomy skill.
+    """
+    jd_criteria = extract_jd_criteria(jd_text, max_criteria)
+    if not jd_criteria:
+        return [], {}
+
+    candidate_matches = {candidate_name: scan_text(cv_text) for candidate_name, cv_text in candidates}
+    rows = []
+    for criteria in jd_criteria:
+        row = {"Criteria": criteria}
+        for candidate_name, matches in candidate_matches.items():
+            entry = matches.get(criteria)
+            if entry and entry["aliases"]:
+                row[candidate_name] = FIT
+            elif entry and entry["related"]:
+                row[candidate_name] = PARTIAL_FIT
+            else:
+                row[candidate_name] = NO_FIT
+        rows.append(row)
+
+    evidence = {
+        candidate_name: {
+            criteria: matches[criteria]["aliases"] + matches[criteria]["related"]
+            for criteria in jd_criteria if criteria in matches
+        }
+        for candidate_name, matches in candidate_matches.items()
+    }
+    return rows, evidence
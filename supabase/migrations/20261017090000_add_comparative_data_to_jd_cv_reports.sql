@@ -0,0 +1,12 @@
+-- Stores the complete structured AI result of each review, so past reports can be shown
+-- in the app and re-rendered as DOCX without another OpenAI call.
+-- JSONB values are compressed by Postgres (TOAST) once they exceed ~2 kB; lz4 is faster
+-- than the default pglz for both compression and reads (Postgres 14+).
+ALTER TABLE public.jd_cv_reports
+    ADD COLUMN IF NOT EXISTS comparative_data jsonb;
+
+ALTER TABLE public.jd_cv_reports
+    ALTER COLUMN comparative_data SET COMPRESSION lz4;
+
+COMMENT ON COLUMN public.jd_cv_reports.comparative_data IS
+    'Full comparative analysis returned by the AI (candidate_evaluations, criteria_observations, additional_observations_text, final_shortlist_recommendation). NULL for reports saved before this column existed.';
@@ -0,0 +1,17 @@
+-- Indexes for the paged report lists (review_reports_page, admin report management).
+-- Lists are ordered by (review_date, id) descending and paged with a keyset cursor on the
+-- same columns, so each page is a short index range scan however large the table grows.
+
+-- A user's own reports
+CREATE INDEX IF NOT EXISTS jd_cv_reports_user_review_date_idx
+    ON public.jd_cv_reports (user_uid, review_date DESC, id DESC);
+
+-- All reports (admin views)
+CREATE INDEX IF NOT EXISTS jd_cv_reports_review_date_idx
+    ON public.jd_cv_reports (review_date DESC, id DESC);
+
+-- "Job Description name contains" filters (ILIKE '%...%') use trigram indexes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS jd_cv_reports_jd_filename_trgm_idx
+    ON public.jd_cv_reports USING gin (jd_filename gin_trgm_ops);
@@ -0,0 +1,6 @@
+-- Index for the "Uploader email contains" filter of the admin report grid (ILIKE '%...%').
+-- Bulk deletion filters on the primary key (id IN (...)), which needs no extra index.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS jd_cv_reports_user_email_trgm_idx
+    ON public.jd_cv_reports USING gin (user_email gin_trgm_ops);
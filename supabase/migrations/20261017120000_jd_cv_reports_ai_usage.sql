@@ -0,0 +1,77 @@
+-- Records the OpenAI usage of each review with its report, and rolls it up in the database
+-- for the admin AI usage page, so totals never require loading the report rows.
+
+ALTER TABLE public.jd_cv_reports
+    ADD COLUMN IF NOT EXISTS ai_model text,
+    ADD COLUMN IF NOT EXISTS ai_prompt_tokens integer,
+    ADD COLUMN IF NOT EXISTS ai_completion_tokens integer,
+    ADD COLUMN IF NOT EXISTS ai_cached_tokens integer,
+    ADD COLUMN IF NOT EXISTS ai_seconds double precision;
+
+COMMENT ON COLUMN public.jd_cv_reports.ai_model IS
+    'OpenAI model of the analysis. NULL for reports saved before usage was recorded.';
+COMMENT ON COLUMN public.jd_cv_reports.ai_prompt_tokens IS
+    'Prompt tokens of all OpenAI requests of the analysis (0 when the result came from the cache).';
+COMMENT ON COLUMN public.jd_cv_reports.ai_cached_tokens IS
+    'Part of ai_prompt_tokens served from the OpenAI prompt cache (billed at a discount).';
+COMMENT ON COLUMN public.jd_cv_reports.ai_seconds IS
+    'Wall time of the AI analysis in seconds.';
+
+-- Date-range rollups are answered from this index alone (index-only scan)
+CREATE INDEX IF NOT EXISTS jd_cv_reports_ai_usage_idx
+    ON public.jd_cv_reports (review_date)
+    INCLUDE (user_email, jd_filename, ai_model, ai_prompt_tokens, ai_completion_tokens, ai_cached_tokens, ai_seconds)
+    WHERE ai_model IS NOT NULL;
+
+-- Usage per user (email), day (UTC), model or job description, optionally within [date_from, date_to)
+CREATE OR REPLACE FUNCTION public.ai_usage_rollup(
+    group_by text,
+    date_from timestamptz DEFAULT NULL,
+    date_to timestamptz DEFAULT NULL
+)
+RETURNS TABLE (
+    group_key text,
+    reviews bigint,
+    prompt_tokens bigint,
+    completion_tokens bigint,
+    cached_tokens bigint,
+    total_seconds double precision,
+    avg_seconds double precision,
+    p95_seconds double precision
+)
+LANGUAGE plpgsql
+STABLE
+SET search_path = public
+AS $$
+BEGIN
+    IF group_by NOT IN ('user', 'day', 'model', 'jd') THEN
+        RAISE EXCEPTION 'group_by must be one of user, day, model, jd (got %)', group_by;
+    END IF;
+    RETURN QUERY
+    SELECT
+        -- Cast so the result matches the declared text column even if a source column is varchar
+        (CASE group_by
+            WHEN 'user' THEN r.user_email::text
+            WHEN 'day' THEN to_char(r.review_date AT TIME ZONE 'UTC', 'YYYY-MM-DD')
+            WHEN 'model' THEN r.ai_model::text
+            ELSE r.jd_filename::text
+        END)::text,
+        count(*),
+        coalesce(sum(r.ai_prompt_tokens), 0)::bigint,
+        coalesce(sum(r.ai_completion_tokens), 0)::bigint,
+        coalesce(sum(r.ai_cached_tokens), 0)::bigint,
+        coalesce(sum(r.ai_seconds), 0),
+        avg(r.ai_seconds),
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY r.ai_seconds)
+    FROM public.jd_cv_reports r
+    WHERE r.ai_model IS NOT NULL
+        AND (date_from IS NULL OR r.review_date >= date_from)
+        AND (date_to IS NULL OR r.review_date < date_to)
+    GROUP BY 1
+    ORDER BY 1;
+END;
+$$;
+
+-- Admin only: the service role key is used by the admin pages
+REVOKE ALL ON FUNCTION public.ai_usage_rollup(text, timestamptz, timestamptz) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.ai_usage_rollup(text, timestamptz, timestamptz) TO service_role;
@@ -0,0 +1,189 @@
+# --- Prompt Token Budget ---
+# Keeps the comparative-analysis prompt inside a configurable token budget. The budget
+# (minus the fixed system prompt/overhead) is split between the JD and the CVs; each
+# document that does not fit its share is trimmed paragraph by paragraph, dropping the
+# least relevant sections (hobbies, references, personal details...) first.
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate if tiktoken is not installed
+    tiktoken = None
+
+# Average characters per token for English text with the GPT-4o tokenizer, used when tiktoken is unavailable
+APPROX_CHARS_PER_TOKEN = 4
+
+TRIMMED_MARKER = "[... less relevant content trimmed to fit the prompt budget ...]"
+
+# Section headings and the priority of the paragraphs that follow them (higher is kept first)
+SECTION_PRIORITIES = [
+    (re.compile(r'\b(experience|employment|work history|career history|professional background)\b', re.I), 5),
+    (re.compile(r'\b(skills|competenc|expertise|technical|tools)\b', re.I), 5),
+    (re.compile(r'\b(summary|profile|objective|about me)\b', re.I), 4),
+    (re.compile(r'\b(responsibilit|requirement|qualification|key result|role)\b', re.I), 4),
+    (re.compile(r'\b(education|academic|certification|training)\b', re.I), 3),
+    (re.compile(r'\b(projects?|achievements?|awards?)\b', re.I), 3),
+    (re.compile(r'\b(languages?|location)\b', re.I), 2),
+    (re.compile(r'\b(hobbies|interests|references|declaration|personal (details|information)|father|marital|date of birth)\b', re.I), 0),
+]
+DEFAULT_PRIORITY = 2
+MAX_HEADING_LENGTH = 60
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.error("Could not load tiktoken encoding, using estimate instead: %s", e)
+    return _encoding
+
+
+def count_tokens(text):
+    """Counts the tokens in text (exact with tiktoken, otherwise a character-based estimate)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / APPROX_CHARS_PER_TOKEN)
+
+
+def _split_paragraphs(text):
+    """Splits text into paragraphs on blank lines, falling back to single lines for extractors that emit no blank lines."""
+    paragraphs = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
+    if len(paragraphs) <= 1:
+        paragraphs = [line for line in text.split('\n') if line.strip()]
+    return paragraphs
+
+
+def _heading_priority(paragraph):
+    first_line = paragraph.strip().split('\n', 1)[0]
+    if len(first_line) > MAX_HEADING_LENGTH:
+        return None
+    for pattern, priority in SECTION_PRIORITIES:
+        if pattern.search(first_line):
+            return priority
+    return None
+
+
+def _head_within_budget(text, max_tokens):
+    """Returns the longest head of text (found by shrinking a character estimate) that fits in max_tokens."""
+    head_chars = max(0, max_tokens) * APPROX_CHARS_PER_TOKEN
+    while head_chars > 0 and count_tokens(text[:head_chars]) > max_tokens:
+        head_chars = int(head_chars * 0.9)
+    return text[:head_chars]
+
+
+def trim_to_budget(text, max_tokens):
+    """
+    Trims text to at most max_tokens by dropping the lowest-priority paragraphs first.
+    Kept paragraphs stay in their original order. Returns (trimmed_text, used_tokens).
+    """
+    total_tokens = count_tokens(text)
+    if total_tokens <= max_tokens:
+        return text, total_tokens
+    if max_tokens <= 0:
+        return "", 0
+
+    paragraphs = _split_paragraphs(text)
+    scored = []
+    current_priority = DEFAULT_PRIORITY
+    for position, paragraph in enumerate(paragraphs):
+        heading_priority = _heading_priority(paragraph)
+        if heading_priority is not None:
+            current_priority = heading_priority
+        # The opening paragraph usually holds the candidate's name/headline or the JD title
+        priority = max(current_priority, 4) if position == 0 else current_priority
+        scored.append((priority, position, paragraph, count_tokens(paragraph)))
+
+    marker_tokens = count_tokens(TRIMMED_MARKER)
+    if marker_tokens + 1 >= max_tokens:
+        # Too small a budget for the marker and any content: keep what fits of the head, unmarked
+        trimmed_text = _head_within_budget(text, max_tokens)
+        return trimmed_text, count_tokens(trimmed_text)
+    remaining = max_tokens - marker_tokens
+    kept_positions = set()
+    for priority, position, paragraph, paragraph_tokens in sorted(scored, key=lambda item: (-item[0], item[1])):
+        # +1 for the paragraph separator added when the kept paragraphs are joined back together
+        if paragraph_tokens + 1 <= remaining:
+            kept_positions.add(position)
+            remaining -= paragraph_tokens + 1
+
+    kept_paragraphs = [paragraph for _, position, paragraph, _ in scored if position in kept_positions]
+    if kept_paragraphs:
+        trimmed_text = "\n\n".join(kept_paragraphs + [TRIMMED_MARKER])
+        return trimmed_text, count_tokens(trimmed_text)
+
+    # Even the smallest paragraph is too long: keep the head of the text
+    head_chars = max(0, remaining) * APPROX_CHARS_PER_TOKEN
+    while True:
+        trimmed_text = f"{text[:head_chars]}\n\n{TRIMMED_MARKER}"
+        used_tokens = count_tokens(trimmed_text)
+        if used_tokens <= max_tokens:
+            return trimmed_text, used_tokens
+        if head_chars == 0:
+            trimmed_text = _head_within_budget(text, max_tokens)
+            return trimmed_text, count_tokens(trimmed_text)
+        head_chars = int(head_chars * 0.9)
+
+
+def _fair_shares(sizes, budget):
+    """Max-min fair split of budget: small documents get everything they need, large ones share the rest equally."""
+    shares = [0] * len(sizes)
+    remaining_budget = budget
+    remaining = sorted(range(len(sizes)), key=lambda idx: sizes[idx])
+    while remaining:
+        equal_share = remaining_budget // len(remaining)
+        idx = remaining[0]
+        if sizes[idx] <= equal_share:
+            shares[idx] = sizes[idx]
+            remaining_budget -= sizes[idx]
+            remaining.pop(0)
+        else:
+            for idx in remaining:
+                shares[idx] = equal_share
+            break
+    return shares
+
+
+def apply_prompt_budget(jd_text, cv_items, budget_tokens, reserved_tokens, jd_share):
+    """
+    Fits the JD and CV texts into budget_tokens (of which reserved_tokens are already used by the
+    system prompt and prompt scaffolding). The JD may use at most jd_share of the available tokens;
+    whatever it leaves unused goes to the CVs.
+    Returns (jd_text, cv_items, usage_rows) where cv_items are copies with trimmed 'text' and
+    usage_rows describe the original/used/dropped tokens per document.
+    """
+    available = max(0, budget_tokens - reserved_tokens)
+    jd_tokens = count_tokens(jd_text)
+    jd_limit = min(jd_tokens, int(available * jd_share))
+    trimmed_jd_text, jd_used = trim_to_budget(jd_text, jd_limit)
+
+    cv_tokens = [count_tokens(cv_item['text']) for cv_item in cv_items]
+    cv_limits = _fair_shares(cv_tokens, max(0, available - jd_used))
+
+    usage_rows = [{
+        "Document": "Job Description",
+        "Original Tokens": jd_tokens,
+        "Used Tokens": jd_used,
+        "Dropped Tokens": max(0, jd_tokens - jd_used),
+    }]
+    trimmed_cv_items = []
+    for cv_item, original_tokens, limit in zip(cv_items, cv_tokens, cv_limits):
+        trimmed_text, used_tokens = trim_to_budget(cv_item['text'], limit)
+        trimmed_cv_items.append({**cv_item, 'text': trimmed_text})
+        usage_rows.append({
+            "Document": cv_item['filename'],
+            "Original Tokens": original_tokens,
+            "Used Tokens": used_tokens,
+            "Dropped Tokens": max(0, original_tokens - used_tokens),
+        })
+    return trimmed_jd_text, trimmed_cv_items, usage_rows
@@ -0,0 +1,293 @@
+# --- User Deletion Cascade ---
+# Deletes a user and everything they own: their report files in Storage, their rows in
+# jd_cv_reports, their CVs in the candidate search index (compacted so nothing stays on
+# disk), their duplicate-detection fingerprints, their background analysis jobs, their
+# profile in 'users' and finally their Supabase Auth account. The
+# storage prefix is listed once and removed in large batches; the independent steps run
+# concurrently. Progress is persisted in SQLite, so an interrupted cascade (closed tab,
+# server restart, transient error) can be resumed from the admin page and skips the steps
+# that already finished.
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import config
+from analysis_jobs import get_job_runner
+from dedup import get_fingerprint_store
+from vector_index import get_candidate_index
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BUCKET = "app-files"
+STORAGE_LIST_PAGE_SIZE = 1000
+
+STEP_STORAGE_FILES = "storage_files"
+STEP_REPORTS = "reports"
+STEP_CANDIDATE_INDEX = "candidate_index"
+STEP_FINGERPRINTS = "dedup_fingerprints"
+STEP_ANALYSIS_JOBS = "analysis_jobs"
+STEP_PROFILE = "profile"
+STEP_AUTH_USER = "auth_user"
+# The auth account goes last: until it is deleted, the user can still be found and the cascade retried
+DELETION_STEPS = (STEP_STORAGE_FILES, STEP_REPORTS, STEP_CANDIDATE_INDEX, STEP_FINGERPRINTS, STEP_ANALYSIS_JOBS, STEP_PROFILE, STEP_AUTH_USER)
+STEP_LABELS = {
+    STEP_STORAGE_FILES: "Report files in Storage",
+    STEP_REPORTS: "Report records",
+    STEP_CANDIDATE_INDEX: "Candidate search entries",
+    STEP_FINGERPRINTS: "Duplicate-detection fingerprints",
+    STEP_ANALYSIS_JOBS: "Analysis jobs",
+    STEP_PROFILE: "User profile",
+    STEP_AUTH_USER: "Login account",
+}
+
+DELETION_STATUS_RUNNING = "running"
+DELETION_STATUS_FAILED = "failed"
+DELETION_STATUS_DONE = "done"
+
+
+class UserDeletionInProgress(Exception):
+    """Raised when a cascade is started for a user whose deletion is already running."""
+
+
+class UserDeletionStore:
+    """SQLite-backed progress records of user deletion cascades, one per user. Safe to use from several threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_deletions (
+                    user_uid TEXT PRIMARY KEY,
+                    user_email TEXT,
+                    status TEXT NOT NULL,
+                    completed_steps TEXT NOT NULL DEFAULT '[]',
+                    files_total INTEGER NOT NULL DEFAULT 0,
+                    files_deleted INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    started_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return contextlib.closing(conn)
+
+    def _row_to_record(self, row):
+        record = dict(row)
+        record['completed_steps'] = json.loads(record['completed_steps'])
+        return record
+
+    def get(self, user_uid):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM user_deletions WHERE user_uid = ?", (user_uid,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def start(self, user_uid, user_email, stale_after_seconds):
+        """
+        Creates the progress record of a new cascade, or marks an existing unfinished one as running again.
+        Raises UserDeletionInProgress if the record is running and was updated in the last stale_after_seconds.
+        """
+        now = datetime.now().isoformat()
+        stale_before = datetime.fromtimestamp(time.time() - stale_after_seconds).isoformat()
+        with self._write_lock, self._connect() as conn, conn:
+            claimed = conn.execute(
+                "INSERT INTO user_deletions (user_uid, user_email, status, started_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_uid) DO UPDATE SET status = excluded.status, error = NULL, updated_at = excluded.updated_at "
+                "WHERE user_deletions.status != ? OR user_deletions.updated_at < ?",
+                (user_uid, user_email, DELETION_STATUS_RUNNING, now, now, DELETION_STATUS_RUNNING, stale_before)
+            ).rowcount
+        if not claimed:
+            raise UserDeletionInProgress(f"The deletion of {user_email} is already running.")
+        return self.get(user_uid)
+
+    def update(self, user_uid, **fields):
+        if 'completed_steps' in fields:
+            fields['completed_steps'] = json.dumps(fields['completed_steps'])
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._write_lock, self._connect() as conn, conn:
+            conn.execute(f"UPDATE user_deletions SET {assignments} WHERE user_uid = ?", (*fields.values(), user_uid))
+
+    def list_unfinished(self, stale_after_seconds):
+        """
+        Returns cascades that failed, or were interrupted while running (no progress for stale_after_seconds),
+        most recent first. Cascades still running are left out, so they cannot be resumed a second time.
+        """
+        stale_before = datetime.fromtimestamp(time.time() - stale_after_seconds).isoformat()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM user_deletions WHERE status != ? AND (status != ? OR updated_at < ?) ORDER BY updated_at DESC",
+                (DELETION_STATUS_DONE, DELETION_STATUS_RUNNING, stale_before)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+
+def list_user_report_files(service_client, user_uid):
+    """Lists every file under the user's report prefix in Storage (paged by STORAGE_LIST_PAGE_SIZE)."""
+    prefix = f"jd_cv_reports/{user_uid}"
+    paths = []
+    offset = 0
+    while True:
+        entries = service_client.storage.from_(STORAGE_BUCKET).list(prefix, {"limit": STORAGE_LIST_PAGE_SIZE, "offset": offset})
+        # Folder placeholders have no id
+        paths.extend(f"{prefix}/{entry['name']}" for entry in entries if entry.get('id'))
+        if len(entries) < STORAGE_LIST_PAGE_SIZE:
+            return paths
+        offset += STORAGE_LIST_PAGE_SIZE
+
+
+class UserDeletionCascade:
+    """Runs (or resumes) the deletion of one user with the service role client."""
+
+    def __init__(self, service_client, store, user_uid, user_email, max_workers, remove_batch_size, stale_after_seconds):
+        self.service_client = service_client
+        self.store = store
+        self.user_uid = user_uid
+        self.user_email = user_email
+        self.max_workers = max_workers
+        self.remove_batch_size = remove_batch_size
+        self.stale_after_seconds = stale_after_seconds
+        self._lock = threading.Lock()
+        self._completed_steps = []
+        self._files_deleted = 0
+
+    def _complete_step(self, step):
+        with self._lock:
+            self._completed_steps.append(step)
+            self.store.update(self.user_uid, completed_steps=self._completed_steps)
+
+    def _remove_file_batch(self, batch):
+        self.service_client.storage.from_(STORAGE_BUCKET).remove(batch)
+        with self._lock:
+            self._files_deleted += len(batch)
+            self.store.update(self.user_uid, files_deleted=self._files_deleted)
+        return len(batch)
+
+    def _delete_reports(self):
+        self.service_client.table('jd_cv_reports').delete().eq('user_uid', self.user_uid).execute()
+
+    def _remove_from_candidate_index(self):
+        candidate_index = get_candidate_index()
+        removed = candidate_index.remove_user(self.user_uid)
+        # Flagged rows keep their snippets and vectors on disk until the index is compacted
+        candidate_index.compact()
+        logger.info("Removed %s CV(s) of user %s from the candidate index.", removed, self.user_uid)
+
+    def _delete_fingerprints(self):
+        deleted = get_fingerprint_store().delete_user(self.user_uid)
+        logger.info("Deleted %s CV fingerprint(s) of user %s.", deleted, self.user_uid)
+
+    def _delete_analysis_jobs(self):
+        deleted = get_job_runner().store.delete_user(self.user_uid)
+        logger.info("Deleted %s analysis job(s) of user %s.", deleted, self.user_uid)
+
+    def _delete_profile(self):
+        self.service_client.table('users').delete().eq('id', self.user_uid).execute()
+
+    def run(self, on_progress=None):
+        """
+        Runs the steps not completed yet. on_progress(fraction, message) is called from the calling
+        thread as work finishes. Returns the final progress record; raises the first step error after
+        recording it (the cascade can then be resumed). Raises UserDeletionInProgress, without touching
+        the record, if another cascade of the same user is running.
+        """
+        record = self.store.start(self.user_uid, self.user_email, self.stale_after_seconds)
+        self._completed_steps = list(record['completed_steps'])
+        self._files_deleted = record['files_deleted']
+        started = time.perf_counter()
+
+        def report(message):
+            if on_progress is not None:
+                done_units = len(self._completed_steps) + (self._files_deleted / max(files_total, 1) if STEP_STORAGE_FILES not in self._completed_steps else 0)
+                on_progress(min(done_units / len(DELETION_STEPS), 1.0), message)
+
+        files_total = record['files_total']
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="user-deletion") as executor:
+                futures = {}
+                if STEP_STORAGE_FILES not in self._completed_steps:
+                    # Files deleted by an interrupted run are simply no longer listed
+                    paths = list_user_report_files(self.service_client, self.user_uid)
+                    files_total = self._files_deleted + len(paths)
+                    self.store.update(self.user_uid, files_total=files_total)
+                    for batch_start in range(0, len(paths), self.remove_batch_size):
+                        batch = paths[batch_start:batch_start + self.remove_batch_size]
+                        futures[executor.submit(self._remove_file_batch, batch)] = STEP_STORAGE_FILES
+                    if not paths:
+                        self._complete_step(STEP_STORAGE_FILES)
+                if STEP_REPORTS not in self._completed_steps:
+                    futures[executor.submit(self._delete_reports)] = STEP_REPORTS
+                if STEP_CANDIDATE_INDEX not in self._completed_steps:
+                    futures[executor.submit(self._remove_from_candidate_index)] = STEP_CANDIDATE_INDEX
+                if STEP_FINGERPRINTS not in self._completed_steps:
+                    futures[executor.submit(self._delete_fingerprints)] = STEP_FINGERPRINTS
+                if STEP_ANALYSIS_JOBS not in self._completed_steps:
+                    futures[executor.submit(self._delete_analysis_jobs)] = STEP_ANALYSIS_JOBS
+                if STEP_PROFILE not in self._completed_steps:
+                    futures[executor.submit(self._delete_profile)] = STEP_PROFILE
+                report(f"Deleting {files_total - self._files_deleted} file(s) and the user's records")
+
+                pending_file_batches = sum(1 for step in futures.values() if step == STEP_STORAGE_FILES)
+                for future in as_completed(futures):
+                    future.result()
+                    step = futures[future]
+                    if step == STEP_STORAGE_FILES:
+                        pending_file_batches -= 1
+                        if pending_file_batches:
+                            report(f"Deleted {self._files_deleted} of {files_total} file(s)")
+                            continue
+                    self._complete_step(step)
+                    report(f"{STEP_LABELS[step]} deleted")
+
+            if STEP_AUTH_USER not in self._completed_steps:
+                self.service_client.auth.admin.delete_user(self.user_uid)
+                self._complete_step(STEP_AUTH_USER)
+                report(f"{STEP_LABELS[STEP_AUTH_USER]} deleted")
+        except Exception as e:
+            self.store.update(self.user_uid, status=DELETION_STATUS_FAILED, error=str(e))
+            logger.error("Deletion of user %s stopped: %s", self.user_uid, e)
+            raise
+
+        self.store.update(self.user_uid, status=DELETION_STATUS_DONE)
+        logger.info("User %s deleted (%s file(s)) in %.1fs.", self.user_uid, files_total, time.perf_counter() - started)
+        return self.store.get(self.user_uid)
+
+
+_deletion_store = None
+_deletion_store_lock = threading.Lock()
+
+
+def get_user_deletion_store():
+    """Returns the process-wide UserDeletionStore, creating it on first use."""
+    global _deletion_store
+    if _deletion_store is None:
+        with _deletion_store_lock:
+            if _deletion_store is None:
+                _deletion_store = UserDeletionStore(config.USER_DELETION_STORE_PATH)
+    return _deletion_store
+
+
+def delete_user_cascade(service_client, user_uid, user_email, on_progress=None):
+    """Deletes (or finishes deleting) a user and all their data. See UserDeletionCascade.run."""
+    return UserDeletionCascade(
+        service_client,
+        get_user_deletion_store(),
+        user_uid,
+        user_email,
+        max_workers=config.USER_DELETION_CONCURRENCY,
+        remove_batch_size=config.STORAGE_REMOVE_BATCH_SIZE,
+        stale_after_seconds=config.USER_DELETION_STALE_SECONDS
+    ).run(on_progress=on_progress)
@@ -0,0 +1,283 @@
+# --- Candidate Vector Index ---
+# Keeps every processed CV searchable after its report is written. Each CV text is turned
+# into a fixed-size embedding locally (feature hashing of words and word pairs, no model or
+# network call), stored as one row of a float32 matrix in a memory-mapped file, with the
+# candidate's details in a SQLite metadata table. New CVs are appended; removed rows are
+# only flagged until compact() rewrites the matrix without them.
+import contextlib
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import config
+from prerank import tokenize
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_CHARS = 300
+
+
+@functools.lru_cache(maxsize=200000)
+def _hash_feature(feature):
+    """Maps a feature string to a stable 64-bit integer (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def embed_text(text, dim):
+    """
+    Returns the L2-normalized float32 embedding of text: unigrams and bigrams hashed into dim
+    signed buckets, weighted by log term frequency. Similar texts get a high dot product.
+    """
+    tokens = tokenize(text or "")
+    features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((_hash_feature(feature) for feature in features), dtype=np.uint64, count=len(features))
+    buckets = (hashes % np.uint64(dim)).astype(np.int64)
+    signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0)
+    np.add.at(vector, buckets, signs)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CandidateVectorIndex:
+    """Append-only on-disk vector index of CV embeddings with a SQLite metadata table. Thread-safe."""
+
+    def __init__(self, index_dir, dim):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.vectors_path = os.path.join(index_dir, "vectors.f32")
+        self.db_path = os.path.join(index_dir, "metadata.sqlite3")
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._memmap = None
+        self._memmap_rows = 0
+        with self._connect() as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidates (
+                    row_id INTEGER PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    candidate_name TEXT,
+                    user_uid TEXT,
+                    user_email TEXT,
+                    jd_filename TEXT,
+                    snippet TEXT,
+                    added_at TEXT NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (content_hash, user_uid)
+                )
+            """)
+            self._migrate_per_user_key(conn)
+        self._check_vectors_file()
+
+    def _migrate_per_user_key(self, conn):
+        """Rebuilds tables created when content_hash was unique across all users (the row IDs are kept)."""
+        table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'candidates'").fetchone()['sql']
+        if "UNIQUE (content_hash, user_uid)" in table_sql:
+            return
+        conn.execute("ALTER TABLE candidates RENAME TO candidates_old")
+        conn.execute(table_sql.replace("content_hash TEXT NOT NULL UNIQUE", "content_hash TEXT NOT NULL").replace(
+            "deleted INTEGER NOT NULL DEFAULT 0", "deleted INTEGER NOT NULL DEFAULT 0,\n                    UNIQUE (content_hash, user_uid)"
+        ))
+        conn.execute("INSERT INTO candidates SELECT * FROM candidates_old")
+        conn.execute("DROP TABLE candidates_old")
+        logger.info("Candidate index metadata migrated to per-user content keys.")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return contextlib.closing(conn)
+
+    def _stored_rows(self):
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _check_vectors_file(self):
+        """Drops metadata rows whose vectors never made it to disk (e.g. a crash between the two writes)."""
+        stored_rows = self._stored_rows()
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM candidates WHERE row_id >= ?", (stored_rows,))
+
+    def _vectors(self):
+        """Returns a read-only memmap over all stored rows, reopened only when rows were added."""
+        stored_rows = self._stored_rows()
+        if stored_rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self._memmap is None or self._memmap_rows != stored_rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(stored_rows, self.dim))
+            self._memmap_rows = stored_rows
+        return self._memmap
+
+    def add(self, candidates, user_uid=None, user_email=None, jd_filename=None):
+        """
+        Appends CVs (dicts with 'filename', 'text' and optionally 'candidate_name') to the index.
+        Each user gets their own row for a CV, so removing one user's data leaves other users'
+        copies searchable. CVs whose exact text the user already has indexed are skipped, and
+        ones flagged as removed are restored. Returns the number of rows added or restored.
+        """
+        with self._lock:
+            now = datetime.now().isoformat()
+            with self._connect() as conn, conn:
+                new_candidates = []
+                restored = 0
+                seen_hashes = set()
+                for candidate in candidates:
+                    content_hash = hashlib.sha256(candidate['text'].encode('utf-8')).hexdigest()
+                    if content_hash in seen_hashes:
+                        continue
+                    seen_hashes.add(content_hash)
+                    existing = conn.execute("SELECT row_id, deleted FROM candidates WHERE content_hash = ? AND user_uid IS ?", (content_hash, user_uid)).fetchone()
+                    if existing is None:
+                        new_candidates.append((content_hash, candidate))
+                    elif existing['deleted']:
+                        # Same text, so the stored vector is still valid; only the details change
+                        conn.execute(
+                            "UPDATE candidates SET deleted = 0, filename = ?, candidate_name = ?, user_email = ?, jd_filename = ?, added_at = ? WHERE row_id = ?",
+                            (candidate['filename'], candidate.get('candidate_name'), user_email, jd_filename, now, existing['row_id'])
+                        )
+                        restored += 1
+            if not new_candidates:
+                return restored
+
+            vectors = np.vstack([embed_text(candidate['text'], self.dim) for _, candidate in new_candidates]).astype(np.float32)
+            first_row = self._stored_rows()
+            with open(self.vectors_path, 'ab') as vectors_file:
+                vectors_file.write(vectors.tobytes())
+                vectors_file.flush()
+                os.fsync(vectors_file.fileno())
+
+            with self._connect() as conn, conn:
+                conn.executemany(
+                    "INSERT INTO candidates (row_id, content_hash, filename, candidate_name, user_uid, user_email, jd_filename, snippet, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            first_row + offset,
+                            content_hash,
+                            candidate['filename'],
+                            candidate.get('candidate_name'),
+                            user_uid,
+                            user_email,
+                            jd_filename,
+                            " ".join(candidate['text'].split())[:SNIPPET_CHARS],
+                            now,
+                        )
+                        for offset, (content_hash, candidate) in enumerate(new_candidates)
+                    ]
+                )
+            return len(new_candidates) + restored
+
+    def search(self, query_text, top_k=20):
+        """Returns up to top_k indexed candidates most similar to query_text, as metadata dicts with a 'similarity' (0-1)."""
+        query_vector = embed_text(query_text, self.dim)
+        with self._lock:
+            vectors = self._vectors()
+            with self._connect() as conn:
+                deleted_rows = [row['row_id'] for row in conn.execute("SELECT row_id FROM candidates WHERE deleted = 1")]
+            if len(vectors) == 0 or not query_vector.any():
+                return []
+            scores = np.asarray(vectors @ query_vector)
+            if deleted_rows:
+                scores[np.asarray(deleted_rows, dtype=np.int64)] = -np.inf
+            top_k = min(top_k, len(scores) - len(deleted_rows))
+            if top_k <= 0:
+                return []
+            top_rows = np.argpartition(-scores, top_k - 1)[:top_k]
+            top_rows = top_rows[np.argsort(-scores[top_rows], kind='stable')]
+
+            with self._connect() as conn:
+                placeholders = ", ".join("?" for _ in top_rows)
+                rows = conn.execute(f"SELECT * FROM candidates WHERE row_id IN ({placeholders})", [int(row) for row in top_rows]).fetchall()
+        metadata_by_row = {row['row_id']: dict(row) for row in rows}
+        results = []
+        for row in top_rows:
+            metadata = metadata_by_row.get(int(row))
+            if metadata is not None:
+                metadata['similarity'] = float(scores[row])
+                results.append(metadata)
+        return results
+
+    def remove(self, row_ids):
+        """Flags rows as deleted; they stop appearing in searches and are dropped by the next compact()."""
+        with self._lock, self._connect() as conn, conn:
+            conn.executemany("UPDATE candidates SET deleted = 1 WHERE row_id = ?", [(row_id,) for row_id in row_ids])
+
+    def remove_user(self, user_uid):
+        """Flags every CV indexed from the user's reviews as deleted. Returns the number of rows flagged."""
+        with self._lock, self._connect() as conn, conn:
+            return conn.execute("UPDATE candidates SET deleted = 1 WHERE user_uid = ? AND deleted = 0", (user_uid,)).rowcount
+
+    def remove_report(self, user_uid, jd_filename, cv_filenames):
+        """
+        Flags the CVs of one report (matched on its user, JD and CV filenames, since the index
+        does not store report IDs) as deleted. Returns the number of rows flagged.
+        """
+        if not cv_filenames:
+            return 0
+        placeholders = ", ".join("?" for _ in cv_filenames)
+        with self._lock, self._connect() as conn, conn:
+            return conn.execute(
+                f"UPDATE candidates SET deleted = 1 WHERE user_uid = ? AND jd_filename = ? AND filename IN ({placeholders}) AND deleted = 0",
+                (user_uid, jd_filename, *cv_filenames)
+            ).rowcount
+
+    def compact(self):
+        """Rewrites the vector file without deleted rows and renumbers the metadata. Returns the number of rows dropped."""
+        with self._lock:
+            vectors = self._vectors()
+            with self._connect() as conn:
+                kept_rows = [row['row_id'] for row in conn.execute("SELECT row_id FROM candidates WHERE deleted = 0 ORDER BY row_id")]
+            dropped = len(vectors) - len(kept_rows)
+            if dropped == 0:
+                return 0
+
+            tmp_path = self.vectors_path + ".compact"
+            with open(tmp_path, 'wb') as tmp_file:
+                if kept_rows:
+                    tmp_file.write(np.ascontiguousarray(vectors[np.asarray(kept_rows, dtype=np.int64)]).tobytes())
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            with self._connect() as conn, conn:
+                conn.execute("DELETE FROM candidates WHERE deleted = 1")
+                # Two passes so the new row IDs never collide with old ones still in the table
+                conn.executemany("UPDATE candidates SET row_id = ? WHERE row_id = ?", [(-(new_row + 1), old_row) for new_row, old_row in enumerate(kept_rows)])
+                conn.execute("UPDATE candidates SET row_id = -row_id - 1")
+                self._memmap = None
+                os.replace(tmp_path, self.vectors_path)
+            logger.info("Compaction dropped %s row(s), %s remain.", dropped, len(kept_rows))
+            return dropped
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            active, deleted = conn.execute("SELECT COALESCE(SUM(deleted = 0), 0), COALESCE(SUM(deleted = 1), 0) FROM candidates").fetchone()
+        return {
+            "active": active,
+            "deleted": deleted,
+            "dim": self.dim,
+            "size_bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0,
+        }
+
+
+_candidate_index = None
+_candidate_index_lock = threading.Lock()
+
+
+def get_candidate_index():
+    """Returns the process-wide CandidateVectorIndex, creating it on first use."""
+    global _candidate_index
+    if _candidate_index is None:
+        with _candidate_index_lock:
+            if _candidate_index is None:
+                _candidate_index = CandidateVectorIndex(config.CANDIDATE_INDEX_DIR, config.CANDIDATE_INDEX_DIM)
+    return _candidate_index
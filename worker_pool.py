@@ -0,0 +1,200 @@
+# --- Shared Worker Pool ---
+# One process pool per server process, shared by every Streamlit session, for the
+# CPU-bound (GIL-holding) stages: PDF/DOCX text extraction and DOCX report rendering.
+# Submissions go through a bounded queue so a burst of large reviews cannot pile up
+# unbounded work; per-job timings and queue depth are kept for the admin dashboard.
+import collections
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPoolBusy(Exception):
+    """Raised when the pool's queue stays full for longer than the submit timeout."""
+
+
+def _run_timed_job(fn, args, kwargs):
+    """Runs inside the worker process and reports how long the job itself took."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class WorkerPool:
+    """
+    Process pool with a bounded submission queue and per-job timing.
+    submit() returns a concurrent.futures.Future resolving to the job's return value.
+    """
+
+    def __init__(self, max_workers, max_pending, submit_timeout):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._recent_jobs = collections.deque(maxlen=config.WORKER_POOL_TIMING_WINDOW)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' avoids forking the multi-threaded Streamlit server process
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info("Started process pool with %s workers.", self.max_workers)
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Outside the lock: cancelling the queued jobs runs their on_done callbacks, which take it
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, job_kind, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) on the pool. fn must be a picklable module-level function."""
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            raise WorkerPoolBusy(f"Worker pool queue is full ({self.max_pending} pending jobs). Please try again shortly.")
+
+        outer_future = Future()
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+
+        def on_done(inner_future):
+            total_seconds = time.perf_counter() - submitted_at
+            run_seconds = None
+            try:
+                if inner_future.cancelled():
+                    # Queued jobs are cancelled when a broken pool is shut down (see _reset_executor)
+                    error = CancelledError("The job was cancelled because the worker pool was restarted.")
+                else:
+                    error = inner_future.exception()
+                    if error is None:
+                        result, run_seconds = inner_future.result()
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._slots.release()
+
+            with self._lock:
+                if error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._recent_jobs.append({
+                    "kind": job_kind,
+                    "ok": error is None,
+                    "run_seconds": run_seconds,
+                    "wait_seconds": (total_seconds - run_seconds) if run_seconds is not None else None,
+                    "total_seconds": total_seconds,
+                })
+
+            if error is None:
+                outer_future.set_result(result)
+            else:
+                if isinstance(error, BrokenProcessPool):
+                    logger.error("Process pool broken, it will be restarted: %s", error)
+                    self._reset_executor()
+                outer_future.set_exception(error)
+
+        try:
+            try:
+                inner_future = self._get_executor().submit(_run_timed_job, fn, args, kwargs)
+            except BrokenProcessPool:
+                self._reset_executor()
+                inner_future = self._get_executor().submit(_run_timed_job, fn, args, kwargs)
+        except Exception:
+            # Neither attempt queued the job, so on_done will never release its slot
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+        inner_future.add_done_callback(on_done)
+        return outer_future
+
+    def map(self, job_kind, fn, arg_tuples, timeout=None):
+        """
+        Fans out fn over a list of argument tuples and returns results in order. Failed jobs yield
+        their exception, and jobs not finished within timeout seconds (of the call) a TimeoutError.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        futures = [self.submit(job_kind, fn, *args) for args in arg_tuples]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic()) if deadline is not None else None))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        """Returns queue depth and per-job-kind timing aggregates over the recent job window."""
+        with self._lock:
+            in_flight = self._in_flight
+            recent_jobs = list(self._recent_jobs)
+            completed = self._completed
+            failed = self._failed
+
+        by_kind = {}
+        for job in recent_jobs:
+            kind_stats = by_kind.setdefault(job["kind"], {"jobs": 0, "failed": 0, "run_seconds": [], "wait_seconds": []})
+            kind_stats["jobs"] += 1
+            if not job["ok"]:
+                kind_stats["failed"] += 1
+            if job["run_seconds"] is not None:
+                kind_stats["run_seconds"].append(job["run_seconds"])
+                kind_stats["wait_seconds"].append(job["wait_seconds"])
+
+        timings = []
+        for kind, kind_stats in sorted(by_kind.items()):
+            run_seconds = kind_stats["run_seconds"]
+            wait_seconds = kind_stats["wait_seconds"]
+            timings.append({
+                "Job Type": kind,
+                "Jobs": kind_stats["jobs"],
+                "Failed": kind_stats["failed"],
+                "Avg Run (s)": round(sum(run_seconds) / len(run_seconds), 3) if run_seconds else None,
+                "Max Run (s)": round(max(run_seconds), 3) if run_seconds else None,
+                "Avg Queue Wait (s)": round(sum(wait_seconds) / len(wait_seconds), 3) if wait_seconds else None,
+            })
+
+        return {
+            "workers": self.max_workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.max_workers),
+            "max_pending": self.max_pending,
+            "completed": completed,
+            "failed": failed,
+            "timings": timings,
+        }
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Returns the process-wide WorkerPool, creating it on first use."""
+    global _worker_pool
+    if _worker_pool is None:
+        with _worker_pool_lock:
+            if _worker_pool is None:
+                _worker_pool = WorkerPool(
+                    max_workers=config.WORKER_POOL_SIZE,
+                    max_pending=config.WORKER_POOL_MAX_PENDING,
+                    submit_timeout=config.WORKER_POOL_SUBMIT_TIMEOUT_SECONDS
+                )
+    return _worker_pool